@@ -12,11 +12,19 @@ db_client = None
 db = None
 jwt = None
 
-def create_app(config_class=Config):
-    """Create and configure the Flask application."""
+def create_app(config_class=Config, start_workers=True):
+    """
+    Create and configure the Flask application.
+    With start_workers=False no background threads are started (outbox,
+    delivery, reconciler, change stream), for scripts and run_worker.py.
+    """
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Encode ObjectId/datetime natively in JSON responses
+    from .utils.json_provider import MongoJSONProvider
+    app.json = MongoJSONProvider(app)
+    
     # Initialize extensions
     CORS(app, resources={
         r"/api/*": {
@@ -35,10 +43,31 @@ def create_app(config_class=Config):
     db = db_client.get_database()
     
     # Create indexes
-    _create_indexes()
+    _create_indexes(app.config)
+    
+    from .services.autocomplete_service import AutocompleteService
+    AutocompleteService.init_app(app)
+    
+    from .services.counter_buffer import CounterBuffer
+    CounterBuffer.init_app(app)
+    
+    from .services.outbox_dispatcher import OutboxDispatcher
+    OutboxDispatcher.init_app(app, workers=None if start_workers else 0)
+    
+    from .services.delivery_service import DeliveryService
+    DeliveryService.init_app(app, workers=None if start_workers else 0)
+    
+    from .services.stats_reconciler import StatsReconciler
+    StatsReconciler.init_app(app, interval=None if start_workers else 0)
+    
+    from .services.event_bus import EventBus
+    EventBus.init_app(app, source=None if start_workers else 'local')
+    
+    from .services.notification_service import NotificationService
+    NotificationService.init_app(app)
     
     # Register blueprints
-    from .routes import auth, issues, government, ngo, admin, public
+    from .routes import auth, issues, government, ngo, admin, public, notifications, stream
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(issues.bp, url_prefix='/api/issues')
@@ -46,6 +75,8 @@ def create_app(config_class=Config):
     app.register_blueprint(ngo.bp, url_prefix='/api/ngo')
     app.register_blueprint(admin.bp, url_prefix='/api/admin')
     app.register_blueprint(public.bp, url_prefix='/api')
+    app.register_blueprint(notifications.bp, url_prefix='/api/notifications')
+    app.register_blueprint(stream.bp, url_prefix='/api/stream')
     
     # Error handlers
     from .utils.error_handlers import register_error_handlers
@@ -63,11 +94,16 @@ def create_app(config_class=Config):
     def health():
         return {'status': 'healthy'}
     
+    @app.route('/metrics')
+    def get_metrics():
+        from .utils import metrics
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+    
     return app
 
-def _create_indexes():
+def _create_indexes(config):
     """Create database indexes for performance."""
-    from pymongo import ASCENDING, DESCENDING, GEO2D
+    from pymongo import ASCENDING, DESCENDING, GEO2D, GEOSPHERE, TEXT
     from pymongo.errors import OperationFailure
     
     try:
@@ -88,33 +124,164 @@ def _create_indexes():
             pass
         
         # Issues indexes
+        # GeoJSON index for nearby search, crisis and map queries
+        try:
+            db.issues.create_index([
+                ('geo', GEOSPHERE),
+                ('is_crisis', ASCENDING),
+                ('category', ASCENDING),
+                ('status', ASCENDING)
+            ])
+        except OperationFailure:
+            pass
+        
+        # Flat (2d) index for map viewports, which are lat/lng rectangles
+        # (see Issue.bbox_query). The bounds reach a little past 180 so that
+        # points on the antimeridian can be indexed.
+        try:
+            db.issues.create_index(
+                [
+                    ('geo.coordinates', GEO2D),
+                    ('is_crisis', ASCENDING),
+                    ('category', ASCENDING),
+                    ('status', ASCENDING)
+                ],
+                min=-180, max=181
+            )
+        except OperationFailure:
+            pass
+        
+        # Feed indexes: each list filter followed by (created_at, _id) so that
+        # keyset pages are read straight off the index in sort order
+        feed_prefixes = [
+            [],
+            [('category', ASCENDING)],
+            [('location.district', ASCENDING)],
+            [('status', ASCENDING)],
+            [('priority', ASCENDING)],
+            [('is_crisis', ASCENDING)],
+            [('location.district', ASCENDING), ('category', ASCENDING)],
+            [('location.district', ASCENDING), ('status', ASCENDING)],
+            [('user_id', ASCENDING)],
+            [('tagged_ministries', ASCENDING)],
+            [('tagged_ministries', ASCENDING), ('status', ASCENDING)],
+            [('ngo_claim.ngo_id', ASCENDING)]
+        ]
+        for prefix in feed_prefixes:
+            try:
+                db.issues.create_index(prefix + [('created_at', DESCENDING), ('_id', DESCENDING)])
+            except OperationFailure:
+                pass
+        
+        # Crisis heatmap: only open crisis issues are indexed, so district
+        # counts stay cheap no matter how large the collection grows ($in in
+        # a partial filter needs MongoDB 6.0)
+        from .models.issue import Issue
+        try:
+            db.issues.create_index(
+                [
+                    ('status', ASCENDING),
+                    ('location.district', ASCENDING),
+                    ('category', ASCENDING),
+                    ('priority', ASCENDING)
+                ],
+                name='open_crisis_heatmap',
+                partialFilterExpression=Issue.OPEN_CRISIS
+            )
+        except OperationFailure:
+            pass
+        
+        # Full-text search over pre-tokenized terms (see Issue.search_terms).
+        # default_language 'none' disables English-only stemming and stop
+        # words so Sinhala and Tamil terms are indexed as-is.
+        try:
+            db.issues.create_index(
+                [('search.title', TEXT), ('search.place', TEXT), ('search.body', TEXT)],
+                name='issue_text_search',
+                weights={'search.title': 5, 'search.place': 3, 'search.body': 1},
+                default_language='none',
+                language_override='search_language'
+            )
+        except OperationFailure:
+            pass
+        
+        # Verifications indexes: one document per (issue, user), and the
+        # reverse order for "which of these issues has this user verified"
+        try:
+            db.verifications.create_index(
+                [('issue_id', ASCENDING), ('user_id', ASCENDING)], unique=True
+            )
+        except OperationFailure:
+            pass
+        
         try:
-            db.issues.create_index([('location.coordinates', GEO2D)])
+            db.verifications.create_index([('user_id', ASCENDING), ('issue_id', ASCENDING)])
         except OperationFailure:
             pass
         
+        # Outbox: only issues with pending events are indexed, so claiming
+        # the next due event stays cheap
         try:
-            db.issues.create_index([('category', ASCENDING)])
+            db.issues.create_index(
+                [('outbox.next_attempt_at', ASCENDING)],
+                name='outbox_due',
+                partialFilterExpression={'outbox.next_attempt_at': {'$exists': True}}
+            )
         except OperationFailure:
             pass
         
+        # Ministry inbox: newest entries of one ministry, and unread counts
+        # (entries after an officer's watermark)
         try:
-            db.issues.create_index([('status', ASCENDING)])
+            db.ministry_inbox.create_index([
+                ('ministry_id', ASCENDING),
+                ('created_at', DESCENDING),
+                ('_id', DESCENDING)
+            ])
         except OperationFailure:
             pass
         
+        # Delivery queue: due jobs per channel, and the oldest job for the lag gauge
         try:
-            db.issues.create_index([('created_at', DESCENDING)])
+            db.deliveries.create_index([('channel', ASCENDING), ('next_attempt_at', ASCENDING)])
         except OperationFailure:
             pass
         
         try:
-            db.issues.create_index([('user_id', ASCENDING)])
+            db.deliveries.create_index([('created_at', ASCENDING)])
         except OperationFailure:
             pass
         
+        # Latency sketches are fetched by _id, or listed per metric and dimension
         try:
-            db.issues.create_index([('is_crisis', ASCENDING)])
+            db.latency_sketches.create_index([
+                ('metric', ASCENDING),
+                ('dimension', ASCENDING),
+                ('ministry_id', ASCENDING)
+            ])
+        except OperationFailure:
+            pass
+        
+        # Leaderboard pages and rank lookups, read in ranking order (see Leaderboard.SORT)
+        try:
+            db.leaderboard.create_index([
+                ('kind', ASCENDING),
+                ('window', ASCENDING),
+                ('score', DESCENDING),
+                ('entity_id', ASCENDING)
+            ])
+        except OperationFailure:
+            pass
+        
+        # Daily leaderboard counters, summed per entity over the last 30 days.
+        # Days outside every window expire.
+        try:
+            db.leaderboard_daily.create_index([('kind', ASCENDING), ('entity_id', ASCENDING), ('day', ASCENDING)])
+        except OperationFailure:
+            pass
+        
+        try:
+            db.leaderboard_daily.create_index([('day', ASCENDING)], expireAfterSeconds=40 * 86400)
         except OperationFailure:
             pass
         
@@ -127,8 +294,35 @@ def _create_indexes():
         except OperationFailure:
             pass
         
+        # Unread filter and the unread recount. Replaces the standalone read
+        # index, which migrate.py drops.
+        try:
+            db.notifications.create_index([
+                ('user_id', ASCENDING),
+                ('read', ASCENDING),
+                ('created_at', DESCENDING)
+            ])
+        except OperationFailure:
+            pass
+        
+        # Open digest lookup (see Notification.digest)
+        try:
+            db.notifications.create_index(
+                [('user_id', ASCENDING), ('type', ASCENDING), ('issue_id', ASCENDING), ('digest_until', DESCENDING)],
+                partialFilterExpression={'digest_until': {'$exists': True}}
+            )
+        except OperationFailure:
+            pass
+        
+        # Retention: read notifications expire NOTIFICATION_READ_TTL_DAYS after
+        # they were read. migrate.py updates the expiry when the setting changes.
         try:
-            db.notifications.create_index([('read', ASCENDING)])
+            db.notifications.create_index(
+                [('read_at', ASCENDING)],
+                name='read_ttl',
+                expireAfterSeconds=config['NOTIFICATION_READ_TTL_DAYS'] * 86400,
+                partialFilterExpression={'read': True}
+            )
         except OperationFailure:
             pass
         
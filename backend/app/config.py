@@ -17,6 +17,7 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_QUERY_STRING_NAME = 'token'  # Only the event stream reads tokens from the query string
     
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:19006').split(',')
@@ -31,17 +32,42 @@ class Config:
     CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET', '')
     
     # Firebase
-    FIREBASE_SERVER_KEY = os.getenv('FIREBASE_SERVER_KEY', '')
+    FIREBASE_CREDENTIALS = os.getenv('FIREBASE_CREDENTIALS', '')  # Service account JSON file; empty uses application default credentials
+    FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID', '')  # Defaults to the service account's project
+    PUSH_BATCH_SIZE = 100  # Device tokens per multicast call (sent concurrently, one request each; FCM allows 500)
+    PUSH_MAX_TOKENS = 10  # Devices registered per user
+    PUSH_RATE_PER_SECOND = 500
     
     # Email
     EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
     EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
     EMAIL_USER = os.getenv('EMAIL_USER', '')
     EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD', '')
+    EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
+    EMAIL_FROM = os.getenv('EMAIL_FROM', '')  # Defaults to EMAIL_USER
+    EMAIL_RATE_PER_SECOND = 10
     
     # SMS Gateway
     SMS_API_KEY = os.getenv('SMS_API_KEY', '')
     SMS_API_URL = os.getenv('SMS_API_URL', '')
+    SMS_RATE_PER_SECOND = 5
+    
+    # Notification retention and digests
+    NOTIFICATION_READ_TTL_DAYS = int(os.getenv('NOTIFICATION_READ_TTL_DAYS', 30))  # Read ones are deleted after this
+    NOTIFICATION_DIGEST_WINDOW = 3600  # Seconds a digest collects repeats (0 disables digests)
+    NOTIFICATION_DIGEST_TYPES = ['status_updated', 'comment_added']
+    
+    # Push/email/SMS delivery (see DeliveryService). Channels are off unless
+    # listed, e.g. DELIVERY_CHANNELS=push,email,sms
+    DELIVERY_CHANNELS = [c.strip() for c in os.getenv('DELIVERY_CHANNELS', '').split(',') if c.strip()]
+    DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', 2))  # Threads per channel
+    DELIVERY_BATCH_SIZE = 50  # Messages claimed by a worker at a time
+    DELIVERY_POLL_INTERVAL = 1.0
+    DELIVERY_LEASE_SECONDS = 120  # Renewed before each send, so it only needs to outlast one
+    DELIVERY_MAX_ATTEMPTS = 6
+    DELIVERY_BACKOFF_BASE = 5.0
+    DELIVERY_BACKOFF_MAX = 3600
+    DELIVERY_TIMEOUT = 10  # Seconds per SMTP/HTTP call
     
     # Google Maps
     GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
@@ -49,10 +75,64 @@ class Config:
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
+    PAGE_TOTAL_CAP = 10000  # Stop counting list totals beyond this many matches
+    
+    # Map clustering
+    MAP_GRID_SIZE = 4  # Grid cells per map tile width at each zoom level
+    MAP_POINTS_MIN_ZOOM = 15  # Return individual issues from this zoom in
+    MAP_MAX_CLUSTERS = 300
+    MAP_MAX_POINTS = 500
+    MAP_MAX_VIEWPORT_TILES = 8  # Widest/tallest bbox accepted, in map tiles at the requested zoom
+    
+    # Autocomplete
+    AUTOCOMPLETE_REFRESH_SECONDS = 300  # Full rebuild interval (picks up other workers' writes)
+    AUTOCOMPLETE_MAX_ISSUES = 50000  # Most-verified issues kept in the index
+    
+    # Duplicate detection
+    DUPLICATE_RADIUS_M = 150  # Reports of the same category this close may be duplicates
+    DUPLICATE_WINDOW_HOURS = 48
+    DUPLICATE_SUGGEST_THRESHOLD = 0.35  # Estimated text similarity to show an issue as a possible duplicate
     
     # Verification
     MIN_VERIFICATION_COUNT = 3  # Minimum upvotes to mark as verified
     
+    # Write-behind verification counts (see CounterBuffer)
+    COUNTER_WRITE_BEHIND = os.getenv('COUNTER_WRITE_BEHIND', 'false').lower() == 'true'
+    COUNTER_FLUSH_INTERVAL = 0.5  # Seconds between flushes
+    COUNTER_JOURNAL_DIR = os.getenv('COUNTER_JOURNAL_DIR', 'var/counter-journal')
+    
+    # Outbox dispatcher (see OutboxDispatcher). Set OUTBOX_WORKERS=0 on the
+    # web servers when the side effects are handled by run_worker.py instead.
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 1))
+    OUTBOX_POLL_INTERVAL = 1.0  # Seconds a worker sleeps when no event is due
+    OUTBOX_LEASE_SECONDS = 60  # A claimed event is retried if not handled within this time
+    OUTBOX_MAX_ATTEMPTS = 8  # ...before it is moved to outbox_dead
+    OUTBOX_BACKOFF_BASE = 2.0  # Seconds before the first retry, doubling after each failure
+    OUTBOX_BACKOFF_MAX = 600
+    
+    # Ministry and NGO performance counter reconciliation and leaderboard
+    # rebuild (see StatsReconciler). Set STATS_RECONCILE_INTERVAL=0 on the web
+    # servers when run_worker.py is used.
+    STATS_RECONCILE_INTERVAL = int(os.getenv('STATS_RECONCILE_INTERVAL', 3600))
+    
+    # Public NGO profiles may be cached by browsers and proxies for this long
+    NGO_PROFILE_MAX_AGE = 60
+    
+    # Largest leaderboard page (?limit=)
+    LEADERBOARD_MAX_LIMIT = 100
+    
+    # Public aggregates (/stats, /leaderboard, /ministries) are recomputed at
+    # most this often per process, and may be cached as long by clients
+    PUBLIC_SNAPSHOT_TTL = int(os.getenv('PUBLIC_SNAPSHOT_TTL', 60))
+    
+    # Server-sent events (see EventBus). EVENT_STREAM_SOURCE is auto,
+    # change_stream (needs a replica set) or local (single process only).
+    EVENT_STREAM_SOURCE = os.getenv('EVENT_STREAM_SOURCE', 'auto')
+    EVENT_BUFFER_SIZE = 2000  # Recent events kept for clients resuming with Last-Event-ID
+    EVENT_MAX_QUEUED = 500  # Undelivered events per client before it is told to resync
+    EVENT_KEEPALIVE_SECONDS = 15
+    EVENT_MAX_ISSUE_SUBSCRIPTIONS = 50
+    
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE = 60
     RATE_LIMIT_PER_HOUR = 1000
@@ -70,7 +150,13 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
-    MONGO_URI = 'mongodb://localhost:27017/civiklink_test'
+    MONGO_URI = os.getenv('TEST_MONGO_URI', 'mongodb://localhost:27017/civiklink_test')
+    
+    # Tests drive the workers themselves
+    OUTBOX_WORKERS = 0
+    DELIVERY_WORKERS = 0
+    STATS_RECONCILE_INTERVAL = 0
+    EVENT_STREAM_SOURCE = 'local'
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,95 @@
+"""
+Delivery model and helper functions.
+"""
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from app import db
+
+class Delivery:
+    """
+    Queue of push, email and SMS messages waiting to be sent. Workers of
+    DeliveryService claim jobs with a lease, and renew it before each send,
+    so a job whose worker dies is sent again once the lease expires.
+    """
+    
+    CHANNELS = ['push', 'email', 'sms']
+    
+    @staticmethod
+    def enqueue_many(jobs):
+        """Queue jobs ({channel, user_id, to, title, body}). Returns the number queued."""
+        if not jobs:
+            return 0
+        
+        now = datetime.utcnow()
+        for job in jobs:
+            job.update({'attempts': 0, 'created_at': now, 'next_attempt_at': now})
+        return len(db.deliveries.insert_many(jobs, ordered=False).inserted_ids)
+    
+    @staticmethod
+    def claim(channel, limit, lease_seconds):
+        """Claim up to limit due jobs of a channel, oldest first."""
+        now = datetime.utcnow()
+        jobs = []
+        while len(jobs) < limit:
+            job = db.deliveries.find_one_and_update(
+                {'channel': channel, 'next_attempt_at': {'$lte': now}},
+                {
+                    '$set': {'next_attempt_at': now + timedelta(seconds=lease_seconds)},
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('next_attempt_at', ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            jobs.append(job)
+        return jobs
+    
+    @staticmethod
+    def renew(jobs, lease_seconds):
+        """
+        Extend the lease on claimed jobs, right before sending them. Returns
+        the jobs still held: one whose lease ran out may have been claimed
+        again (its attempts moved on), and is left to that worker.
+        """
+        if not jobs:
+            return []
+        
+        claims = [{'_id': job['_id'], 'attempts': job['attempts']} for job in jobs]
+        result = db.deliveries.update_many(
+            {'$or': claims},
+            {'$set': {'next_attempt_at': datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+        if result.matched_count == len(jobs):
+            return jobs
+        held = {doc['_id'] for doc in db.deliveries.find({'$or': claims}, {'_id': 1})}
+        return [job for job in jobs if job['_id'] in held]
+    
+    @staticmethod
+    def ack(job_ids):
+        """Remove sent jobs."""
+        if job_ids:
+            db.deliveries.delete_many({'_id': {'$in': list(job_ids)}})
+    
+    @staticmethod
+    def retry(job_id, delay_seconds, error):
+        """Schedule another attempt of a failed job."""
+        db.deliveries.update_one(
+            {'_id': job_id},
+            {'$set': {
+                'next_attempt_at': datetime.utcnow() + timedelta(seconds=delay_seconds),
+                'last_error': error
+            }}
+        )
+    
+    @staticmethod
+    def dead_letter(job, error):
+        """Move a job that cannot be sent to the delivery_dead collection."""
+        db.delivery_dead.insert_one(dict(job, last_error=error, failed_at=datetime.utcnow()))
+        Delivery.ack([job['_id']])
+    
+    @staticmethod
+    def oldest_pending():
+        """Get the creation time of the oldest queued job, or None."""
+        job = db.deliveries.find_one({}, {'created_at': 1}, sort=[('created_at', ASCENDING)])
+        return job['created_at'] if job else None
@@ -1,9 +1,19 @@
 """
 Issue model and helper functions.
 """
+import time
 from datetime import datetime
 from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
 from app import db
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter, facet_page
+from app.utils.text import tokenize
+from app.utils import minhash
+from app.models.verification import Verification, VerificationConflict
+from app.models.outbox import Outbox
+from app.models.ministry import Ministry
+from app.models.ngo import NGO
+from app.models.leaderboard import Leaderboard
 
 class Issue:
     """Issue model for citizen-reported problems."""
@@ -11,6 +21,36 @@ class Issue:
     CATEGORIES = ['water', 'electricity', 'road', 'flood', 'waste', 'other']
     STATUSES = ['pending', 'verified', 'in_progress', 'solved', 'rejected']
     PRIORITIES = ['low', 'medium', 'high', 'critical']
+    OPEN_STATUSES = ['pending', 'verified', 'in_progress']
+    OPEN_CRISIS = {'is_crisis': True, 'status': {'$in': OPEN_STATUSES}}  # What the crisis heatmap counts
+    
+    # Fields the ministry and NGO counters and the leaderboard depend on (see sync_stats)
+    STATS_FIELDS = {
+        'status': 1, 'category': 1, 'location.district': 1, 'tagged_ministries': 1,
+        'solution_verified': 1, 'ngo_claim.ngo_id': 1, 'ngo_claim.claimed_at': 1, 'created_at': 1
+    }
+    STATS_ROOTS = {'status', 'category', 'location', 'tagged_ministries', 'solution_verified', 'ngo_claim', 'created_at'}
+    
+    # Write-behind counter batch ids remembered per issue (see apply_counter_batch)
+    COUNTER_BATCH_HISTORY = 20
+    
+    # Newest-first order with _id as tie-breaker, used by keyset pagination
+    FEED_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
+    
+    # Fields selectable through sparse fieldsets (?fields=)
+    FIELDS = [
+        'user_id', 'title', 'description', 'category', 'location', 'images',
+        'tagged_ministries', 'verification_count', 'verified_by_me',
+        'status', 'priority', 'is_crisis', 'government_response', 'ngo_claim',
+        'solution_verified', 'verified_at', 'created_at', 'updated_at'
+    ]
+    
+    # Compact list view for feeds
+    CARD_FIELDS = [
+        'user_id', 'title', 'description', 'category', 'location', 'images',
+        'verification_count', 'verified_by_me', 'status', 'priority', 'is_crisis',
+        'created_at'
+    ]
     
     @staticmethod
     def create(data, user_id):
@@ -25,10 +65,14 @@ class Issue:
                 'district': data['location']['district'],
                 'coordinates': data['location']['coordinates']  # [lat, lng]
             },
+            'geo': Issue.to_point(data['location']['coordinates']),
+            'search': Issue.search_terms(
+                data['title'], data['description'], data['location']['address']
+            ),
+            'dedupe': Issue.fingerprint(data['title'], data['description']),
             'images': data.get('images', []),
             'tagged_ministries': data.get('tagged_ministries', []),
             'verification_count': 0,
-            'verified_by': [],
             'status': 'pending',
             'priority': data.get('priority', 'medium'),
             'is_crisis': False,
@@ -37,7 +81,9 @@ class Issue:
             'solution_verified': False,
             'verified_at': None,
             'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
+            'updated_at': datetime.utcnow(),
+            'stats_counted': {},
+            'outbox': [Outbox.event('issue_created'), Outbox.event('stats_changed')]
         }
         
         result = db.issues.insert_one(issue_data)
@@ -53,11 +99,52 @@ class Issue:
             return None
     
     @staticmethod
-    def get_all(filters=None, skip=0, limit=20, sort_by='created_at', sort_order=-1):
-        """Get all issues with optional filters."""
+    def get_all(filters=None, skip=0, limit=20, sort_by='created_at', sort_order=-1,
+                fields=None, viewer_id=None):
+        """
+        Get all issues with optional filters.
+        When fields is given only those fields are fetched and returned.
+        """
         query = filters or {}
-        cursor = db.issues.find(query).sort(sort_by, sort_order).skip(skip).limit(limit)
-        return [Issue.to_dict(issue) for issue in cursor]
+        projection = Issue.projection(fields, viewer_id)
+        cursor = db.issues.find(query, projection).sort(sort_by, sort_order).skip(skip).limit(limit)
+        return Issue.serialize_many(cursor, fields, viewer_id)
+    
+    @staticmethod
+    def get_after(filters=None, cursor=None, limit=20, fields=None, viewer_id=None):
+        """
+        Get a newest-first page of issues following an opaque cursor.
+        Returns (issues, next_cursor); next_cursor is None on the last page.
+        Raises ValueError if the cursor is malformed.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        query = keyset_filter(filters or {}, after)
+        
+        projection = Issue.projection(fields, viewer_id)
+        if projection is not None:
+            projection['created_at'] = 1  # Needed to build the next cursor
+        
+        # Fetch one extra document to know whether another page exists
+        docs = list(db.issues.find(query, projection).sort(Issue.FEED_SORT).limit(limit + 1))
+        
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]['created_at'], docs[-1]['_id'])
+        
+        return Issue.serialize_many(docs, fields, viewer_id), next_cursor
+    
+    @staticmethod
+    def page(filters=None, skip=0, limit=20, fields=None, viewer_id=None, total_cap=None):
+        """
+        Get a newest-first page of issues together with the total in one query.
+        Returns (issues, total, capped); see facet_page for the total semantics.
+        """
+        projection = Issue.projection(fields, viewer_id, aggregate=bool(filters))
+        docs, total, capped = facet_page(
+            db.issues, filters or {}, Issue.FEED_SORT, skip, limit, projection, total_cap
+        )
+        return Issue.serialize_many(docs, fields, viewer_id), total, capped
     
     @staticmethod
     def count(filters=None):
@@ -66,49 +153,249 @@ class Issue:
         return db.issues.count_documents(query)
     
     @staticmethod
-    def update(issue_id, data):
-        """Update issue data."""
+    def update(issue_id, data, event=None):
+        """
+        Update issue data. An outbox event, if given, is recorded in the same
+        write, along with stats_changed if a counted field changes. The first
+        change to solved sets resolved_at.
+        """
         try:
+            # Keep the search terms in step with the text they are built from
+            if 'title' in data:
+                data['search.title'] = ' '.join(tokenize(data['title']))
+            if 'description' in data:
+                data['search.body'] = ' '.join(tokenize(data['description']))
+            if 'title' in data or 'description' in data:
+                current = db.issues.find_one({'_id': ObjectId(issue_id)}, {'title': 1, 'description': 1})
+                if current:
+                    data['dedupe'] = Issue.fingerprint(
+                        data.get('title', current.get('title')),
+                        data.get('description', current.get('description'))
+                    )
+            
             data['updated_at'] = datetime.utcnow()
-            result = db.issues.update_one(
-                {'_id': ObjectId(issue_id)},
-                {'$set': data}
-            )
-            return result.modified_count > 0
+            update = {'$set': data}
+            if data.get('status') == 'solved':
+                update['$min'] = {'resolved_at': data['updated_at']}
+            events = [event] if event else []
+            if any(field.split('.')[0] in Issue.STATS_ROOTS for field in data):
+                events.append(Outbox.event('stats_changed'))
+            if events:
+                update['$push'] = {'outbox': {'$each': events}}
+            result = db.issues.update_one({'_id': ObjectId(issue_id)}, update)
+            return result.matched_count > 0
         except:
             return False
     
     @staticmethod
-    def add_verification(issue_id, user_id):
-        """Add user verification to issue."""
+    def _count_stages(user, delta, legacy_delta, now, min_count):
+        """
+        Update pipeline that applies a verification change to the issue's
+        denormalized count and promotes a pending issue reaching min_count.
+        A user still listed in the legacy verified_by array is pulled from it
+        and legacy_delta is applied instead of delta.
+        """
+        verified_by = {'$ifNull': ['$verified_by', []]}
+        legacy = {'$in': [user, verified_by]}
+        count = {'$add': [
+            {'$ifNull': ['$verification_count', 0]},
+            {'$cond': [legacy, legacy_delta, delta]}
+        ]}
+        promote = {'$and': [
+            {'$eq': ['$status', 'pending']},
+            {'$gt': [{'$cond': [legacy, legacy_delta, delta]}, 0]},
+            {'$gte': [count, min_count]}
+        ]}
+        return [{'$set': {
+            'verified_by': {'$cond': [
+                legacy, {'$filter': {'input': verified_by, 'cond': {'$ne': ['$$this', user]}}}, '$verified_by'
+            ]},
+            'verification_count': count,
+            'status': {'$cond': [promote, 'verified', '$status']},
+            'community_verified_at': {'$cond': [promote, now, '$community_verified_at']},
+            'outbox': Issue._event_if(promote, 'issue_verified', 'stats_changed'),
+            'updated_at': now
+        }}]
+    
+    @staticmethod
+    def _event_if(condition, *event_types):
+        """Pipeline expression appending outbox events when condition holds."""
+        events = [{'$literal': Outbox.event(event_type)} for event_type in event_types]
+        return {'$cond': [
+            condition,
+            {'$concatArrays': [{'$ifNull': ['$outbox', []]}, events]},
+            '$outbox'
+        ]}
+    
+    @staticmethod
+    def _apply_count(issue_id, user, delta, legacy_delta, min_count, extra=None, match=None):
+        """
+        Run _count_stages in one atomic write and derive the stored result from
+        the pre-image. Returns (issue, change, legacy, promoted), or None if the
+        issue does not exist (or does not match the extra conditions in match).
+        """
+        now = datetime.utcnow()
+        stages = Issue._count_stages(user, delta, legacy_delta, now, min_count)
+        if extra:
+            stages[0]['$set'].update(extra)
+        
+        before = db.issues.find_one_and_update(
+            {**(match or {}), '_id': issue_id}, stages, return_document=ReturnDocument.BEFORE
+        )
+        if not before:
+            return None
+        
+        legacy = user in (before.get('verified_by') or [])
+        change = legacy_delta if legacy else delta
+        count = before.get('verification_count', 0) + change
+        issue = dict(before, verification_count=count, updated_at=now)
+        if legacy:
+            issue['verified_by'] = [u for u in before['verified_by'] if u != user]
+        
+        promoted = before.get('status') == 'pending' and change > 0 and count >= min_count
+        if promoted:
+            issue.update(status='verified', community_verified_at=now)
+        return issue, change, legacy, promoted
+    
+    @staticmethod
+    def toggle_verification(issue_id, user_id, min_count, buffer=None):
+        """
+        Add the user's verification, or remove it if already present.
+        The verifications collection decides which (its unique index makes
+        concurrent taps safe) and the issue count changes in one atomic write.
+        With a write-behind buffer (see CounterBuffer) the count change is
+        buffered instead, and promotion happens when it is flushed.
+        Returns (issue, added, promoted), or (None, False, False) if the issue
+        does not exist. Raises VerificationConflict if every attempt lost its
+        race, without having changed anything.
+        """
         try:
-            result = db.issues.update_one(
-                {'_id': ObjectId(issue_id)},
-                {
-                    '$addToSet': {'verified_by': ObjectId(user_id)},
-                    '$inc': {'verification_count': 1},
-                    '$set': {'updated_at': datetime.utcnow()}
-                }
-            )
-            return result.modified_count > 0
+            issue_id, user = ObjectId(issue_id), ObjectId(user_id)
         except:
-            return False
+            return None, False, False
+        
+        # A concurrent tap by the same user can undo our add/remove between
+        # the two steps; retry so every tap still toggles exactly once
+        for _ in range(3):
+            if Verification.add(issue_id, user):
+                if buffer:
+                    issue = Issue._buffer_count(issue_id, 1, buffer)
+                    if issue is None:
+                        Verification.remove(issue_id, user)
+                        return None, False, False
+                    return issue, True, False
+                
+                result = Issue._apply_count(issue_id, user, 1, -1, min_count)
+                if result is None:
+                    Verification.remove(issue_id, user)
+                    return None, False, False
+                issue, change, legacy, promoted = result
+                if legacy:
+                    # Already verified before the migration: this tap removes it
+                    Verification.remove(issue_id, user)
+                return issue, change > 0, promoted
+            
+            if Verification.remove(issue_id, user):
+                if buffer:
+                    return Issue._buffer_count(issue_id, -1, buffer), False, False
+                
+                result = Issue._apply_count(issue_id, user, -1, -1, min_count)
+                if result is None:
+                    return None, False, False
+                return result[0], False, False
+        
+        raise VerificationConflict(issue_id)
+    
+    @staticmethod
+    def _buffer_count(issue_id, delta, buffer):
+        """
+        Buffer a count change and return the issue with its count as this
+        process sees it, or None if the issue does not exist.
+        """
+        issue = db.issues.find_one({'_id': issue_id})
+        if not issue:
+            return None
+        buffer.add(issue_id, delta)
+        issue['verification_count'] = issue.get('verification_count', 0) + buffer.pending(issue_id)
+        return issue
     
     @staticmethod
-    def remove_verification(issue_id, user_id):
-        """Remove user verification from issue."""
+    def apply_counter_batch(deltas, batch_id, min_count):
+        """
+        Apply buffered verification_count deltas ({issue_id: delta}) in one
+        bulk write, promoting pending issues that reach min_count.
+        Idempotent: each issue remembers the last batch ids applied to it, so
+        replaying a batch after a crash does not count it twice.
+        Returns the issues promoted by this batch (_id and user_id).
+        """
+        now = Issue._stored_now()
+        ids = []
+        requests = []
+        for issue_id, delta in deltas.items():
+            if not delta:
+                continue
+            ids.append(ObjectId(issue_id))
+            count = {'$add': [{'$ifNull': ['$verification_count', 0]}, delta]}
+            promote = {'$and': [{'$eq': ['$status', 'pending']}, {'$gte': [count, min_count]}]}
+            requests.append(UpdateOne(
+                {'_id': ids[-1], 'counter_batches': {'$ne': batch_id}},
+                [{'$set': {
+                    'verification_count': count,
+                    'status': {'$cond': [promote, 'verified', '$status']},
+                    'community_verified_at': {'$cond': [promote, now, '$community_verified_at']},
+                    'outbox': Issue._event_if(promote, 'issue_verified', 'stats_changed'),
+                    'counter_batches': {'$slice': [
+                        {'$concatArrays': [{'$ifNull': ['$counter_batches', []]}, [batch_id]]},
+                        -Issue.COUNTER_BATCH_HISTORY
+                    ]},
+                    'updated_at': now
+                }}]
+            ))
+        
+        if not requests:
+            return []
+        db.issues.bulk_write(requests, ordered=False)
+        
+        return list(db.issues.find({'_id': {'$in': ids}, 'community_verified_at': now}, {'user_id': 1}))
+    
+    @staticmethod
+    def _stored_now():
+        """Current UTC time truncated to the millisecond precision MongoDB stores."""
+        now = datetime.utcnow()
+        return now.replace(microsecond=now.microsecond // 1000 * 1000)
+    
+    @staticmethod
+    def merge_report(issue_id, user_id, min_count, category=None):
+        """
+        Fold a duplicate report into an existing open issue (of the report's
+        category, if given) as a verification. Counts once per user.
+        Returns (issue, promoted) with the updated issue, or (None, False) if
+        there is no such issue.
+        """
         try:
-            result = db.issues.update_one(
-                {'_id': ObjectId(issue_id)},
-                {
-                    '$pull': {'verified_by': ObjectId(user_id)},
-                    '$inc': {'verification_count': -1},
-                    '$set': {'updated_at': datetime.utcnow()}
-                }
-            )
-            return result.modified_count > 0
+            issue_id, user = ObjectId(issue_id), ObjectId(user_id)
         except:
-            return False
+            return None, False
+        
+        now = datetime.utcnow()
+        extra = {
+            'duplicate_reports': {'$add': [{'$ifNull': ['$duplicate_reports', 0]}, 1]},
+            'last_reported_at': now
+        }
+        match = {'status': {'$in': Issue.OPEN_STATUSES}}
+        if category:
+            match['category'] = category
+        # A legacy verifier's report keeps their verification (now stored as a document)
+        delta = 1 if Verification.add(issue_id, user) else 0
+        result = Issue._apply_count(issue_id, user, delta, 0, min_count, extra, match)
+        if result is None:
+            if delta:
+                Verification.remove(issue_id, user)
+            return None, False
+        
+        issue, change, legacy, promoted = result
+        issue.update(duplicate_reports=issue.get('duplicate_reports', 0) + 1, last_reported_at=now)
+        return issue, promoted
     
     @staticmethod
     def add_government_response(issue_id, ministry_id, message, action_taken):
@@ -128,10 +415,19 @@ class Issue:
                         'government_response': response_data,
                         'status': 'in_progress',
                         'updated_at': datetime.utcnow()
-                    }
+                    },
+                    '$min': {'first_responded_at': response_data['responded_at']},
+                    '$push': {'outbox': {'$each': [
+                        Outbox.event(
+                            'government_responded',
+                            ministry_id=ObjectId(ministry_id),
+                            responded_at=response_data['responded_at']
+                        ),
+                        Outbox.event('stats_changed')
+                    ]}}
                 }
             )
-            return result.modified_count > 0
+            return result.matched_count > 0
         except:
             return False
     
@@ -153,10 +449,14 @@ class Issue:
                         'ngo_claim': claim_data,
                         'status': 'in_progress',
                         'updated_at': datetime.utcnow()
-                    }
+                    },
+                    '$push': {'outbox': {'$each': [
+                        Outbox.event('ngo_claimed', ngo_id=ObjectId(ngo_id)),
+                        Outbox.event('stats_changed')
+                    ]}}
                 }
             )
-            return result.modified_count > 0
+            return result.matched_count > 0
         except:
             return False
     
@@ -164,11 +464,89 @@ class Issue:
     def delete(issue_id):
         """Delete an issue."""
         try:
-            result = db.issues.delete_one({'_id': ObjectId(issue_id)})
-            return result.deleted_count > 0
+            issue = db.issues.find_one_and_delete(
+                {'_id': ObjectId(issue_id)}, projection=dict(Issue.STATS_FIELDS, stats_counted=1)
+            )
+            Verification.delete_for_issue(issue_id)
+            if issue:
+                # No document is left to carry a stats_changed event, so take
+                # back what the counters hold for it here (see sync_stats)
+                counted = issue.pop('stats_counted', None)
+                if counted is None:
+                    counted = Issue._stats_view(issue)  # From before stats_counted: counted as it is
+                if counted:
+                    Issue._record_transition(counted, None, refresh_leaderboard=False)
+            return issue is not None
         except:
             return False
     
+    @staticmethod
+    def sync_stats(issue_id):
+        """
+        Bring the ministry and NGO counters in step with an issue (the
+        stats_changed outbox handler).
+        
+        stats_counted holds the STATS_FIELDS values the counters currently
+        include ({} for none yet). It is moved to the current values by a
+        compare-and-set before the counters are adjusted by the difference,
+        so a retried or concurrent event applies each change once. A process
+        dying between the two leaves the counters short, which the stats
+        reconciler repairs. Issues from before stats_counted existed only
+        record their current values. Returns False if the issue is gone.
+        """
+        issue = db.issues.find_one({'_id': ObjectId(issue_id)}, dict(Issue.STATS_FIELDS, stats_counted=1))
+        if not issue:
+            return False
+        
+        legacy = 'stats_counted' not in issue
+        counted = issue.pop('stats_counted', None)
+        current = Issue._stats_view(issue)
+        if counted == current:
+            return True
+        
+        result = db.issues.update_one(
+            {'_id': issue['_id'], 'stats_counted': {'$exists': False} if legacy else counted},
+            {'$set': {'stats_counted': current}}
+        )
+        if result.modified_count and not legacy:
+            Issue._record_transition(counted or None, current)
+        return True
+    
+    @staticmethod
+    def _stats_view(issue):
+        """The STATS_FIELDS values of an issue, in a fixed layout so that equal values compare equal in MongoDB."""
+        claim = issue.get('ngo_claim') or {}
+        return {
+            'status': issue.get('status'),
+            'category': issue.get('category'),
+            'location': {'district': (issue.get('location') or {}).get('district')},
+            'tagged_ministries': issue.get('tagged_ministries') or [],
+            'solution_verified': issue.get('solution_verified', False),
+            'ngo_claim': {'ngo_id': claim['ngo_id'], 'claimed_at': claim.get('claimed_at')} if claim.get('ngo_id') else None,
+            'created_at': issue.get('created_at')
+        }
+    
+    @staticmethod
+    def _record_transition(before, after, refresh_leaderboard=True):
+        """
+        Adjust the ministry and NGO counters and the leaderboard for an issue
+        that changed from before to after (see _stats_view; None for a new or
+        deleted issue). Without refresh_leaderboard only its daily counters
+        change and the entries catch up at the next rebuild.
+        """
+        same_scope = before and after and all(
+            before.get(field) == after.get(field) for field in ('category', 'location', 'tagged_ministries')
+        )
+        if same_scope:
+            Ministry.record_transition(after, before.get('status'), after.get('status'))
+        else:
+            if before:
+                Ministry.record_transition(before, before.get('status'), None)
+            if after:
+                Ministry.record_transition(after, None, after.get('status'))
+        NGO.record_transition(before, after)
+        Leaderboard.record_transition(before, after, refresh_leaderboard)
+    
     @staticmethod
     def to_dict(issue):
         """Convert issue document to dictionary."""
@@ -176,37 +554,528 @@ class Issue:
             return None
         
         return {
-            'id': str(issue['_id']),
-            'user_id': str(issue['user_id']),
+            'id': issue['_id'],
+            'user_id': issue['user_id'],
             'title': issue['title'],
             'description': issue['description'],
             'category': issue['category'],
             'location': issue['location'],
             'images': issue.get('images', []),
-            'tagged_ministries': [str(m) for m in issue.get('tagged_ministries', [])],
+            'tagged_ministries': issue.get('tagged_ministries', []),
             'verification_count': issue.get('verification_count', 0),
-            'verified_by': [str(u) for u in issue.get('verified_by', [])],
             'status': issue['status'],
             'priority': issue.get('priority', 'medium'),
             'is_crisis': issue.get('is_crisis', False),
             'government_response': issue.get('government_response'),
             'ngo_claim': issue.get('ngo_claim'),
             'solution_verified': issue.get('solution_verified', False),
-            'verified_at': issue['verified_at'].isoformat() if issue.get('verified_at') else None,
-            'created_at': issue['created_at'].isoformat(),
-            'updated_at': issue['updated_at'].isoformat()
+            'verified_at': issue.get('verified_at'),
+            'created_at': issue['created_at'],
+            'updated_at': issue['updated_at']
         }
     
     @staticmethod
-    def search_nearby(lat, lng, radius_km=5, filters=None):
-        """Search issues near a location."""
-        query = filters or {}
+    def projection(fields, viewer_id=None, aggregate=False):
+        """
+        Build a MongoDB projection for a sparse fieldset (None means all fields).
+        Set aggregate for use in a $project stage rather than find().
+        """
+        if fields is None:
+            return None
+        
+        projection = {field: 1 for field in fields if field != 'verified_by_me'}
+        if 'verified_by_me' in fields and viewer_id:
+            # Only the viewer's own entry of a legacy verified_by array
+            # (issues not yet drained by migrate.py)
+            if aggregate:
+                projection['verified_by'] = {'$filter': {
+                    'input': {'$ifNull': ['$verified_by', []]},
+                    'cond': {'$eq': ['$$this', ObjectId(viewer_id)]}
+                }}
+            else:
+                projection['verified_by'] = {'$elemMatch': {'$eq': ObjectId(viewer_id)}}
+        return projection
+    
+    @staticmethod
+    def serialize(issue, fields=None, viewer_id=None, verified_ids=()):
+        """
+        Serialize an issue, restricted to fields when given.
+        verified_ids holds the issue ids the viewer has verified (see serialize_many);
+        the full view includes verified_by_me when there is a viewer.
+        """
+        if fields is None:
+            data = Issue.to_dict(issue)
+            if viewer_id:
+                data['verified_by_me'] = Issue._verified_by(issue, viewer_id, verified_ids)
+            return data
+        
+        data = {'id': issue['_id']}
+        for field in fields:
+            if field == 'verified_by_me':
+                data[field] = bool(viewer_id) and Issue._verified_by(issue, viewer_id, verified_ids)
+            else:
+                data[field] = issue.get(field)
+        return data
+    
+    @staticmethod
+    def serialize_many(issues, fields=None, viewer_id=None):
+        """Serialize a page of issues, looking up verified_by_me for all of them in one query."""
+        issues = list(issues)
+        verified_ids = set()
+        if viewer_id and (fields is None or 'verified_by_me' in fields):
+            verified_ids = Verification.verified_ids(viewer_id, [issue['_id'] for issue in issues])
+        return [Issue.serialize(issue, fields, viewer_id, verified_ids) for issue in issues]
+    
+    @staticmethod
+    def is_verified_by(issue, user_id):
+        """Check whether a user has verified an issue."""
+        return Issue._verified_by(issue, user_id, ()) or Verification.exists(issue['_id'], user_id)
+    
+    @staticmethod
+    def _verified_by(issue, viewer_id, verified_ids):
+        return issue['_id'] in verified_ids or ObjectId(viewer_id) in (issue.get('verified_by') or [])
+    
+    @staticmethod
+    def to_card_dict(issue, viewer_id=None):
+        """Convert issue document to the compact card used by list views."""
+        verified_ids = Verification.verified_ids(viewer_id, [issue['_id']]) if viewer_id else ()
+        return Issue.serialize(issue, Issue.CARD_FIELDS, viewer_id, verified_ids)
+    
+    @staticmethod
+    def search_terms(title, description, address=None):
+        """Build the normalized, pre-tokenized text indexed for full-text search."""
+        return {
+            'title': ' '.join(tokenize(title)),
+            'body': ' '.join(tokenize(description)),
+            'place': ' '.join(tokenize(address))
+        }
+    
+    @staticmethod
+    def search(text, filters=None, skip=0, limit=20, fields=None, viewer_id=None, total_cap=None):
+        """
+        Full-text search over title, description and address, most relevant first.
+        Filters are applied in the same query. Returns (issues, total, capped).
+        Raises ValueError if the text contains no searchable words.
+        """
+        terms = tokenize(text)
+        if not terms:
+            raise ValueError('Search query has no searchable words')
+        
+        query = dict(filters or {})
+        query['$text'] = {'$search': ' '.join(terms)}
+        sort = [('score', {'$meta': 'textScore'}), ('created_at', DESCENDING)]
+        
+        projection = Issue.projection(fields, viewer_id, aggregate=True)
+        docs, total, capped = facet_page(
+            db.issues, query, sort, skip, limit, projection, total_cap
+        )
+        return Issue.serialize_many(docs, fields, viewer_id), total, capped
+    
+    @staticmethod
+    def fingerprint(title, description):
+        """Build the MinHash signature and LSH band keys used to detect duplicate reports."""
+        sig = minhash.signature(f'{title or ""} {description or ""}')
+        if sig is None:
+            return None
+        return {'minhash': sig, 'bands': minhash.bands(sig)}
+    
+    @staticmethod
+    def find_similar(data, radius_m, since, viewer_id=None, limit=20):
+        """
+        Find open issues that may duplicate a new report: same category, within
+        radius_m metres, created since the given time and sharing at least one
+        LSH band. Returns [(issue, similarity)] with raw card fields and
+        distance_m, most similar first.
+        """
+        fingerprint = Issue.fingerprint(data['title'], data['description'])
+        if fingerprint is None:
+            return []
+        
+        pipeline = [{
+            '$geoNear': {
+                'near': Issue.to_point(data['location']['coordinates']),
+                'key': 'geo',
+                'distanceField': 'distance_m',
+                'maxDistance': float(radius_m),
+                'spherical': True,
+                'query': {
+                    'category': data['category'],
+                    'status': {'$in': Issue.OPEN_STATUSES},
+                    'created_at': {'$gte': since},
+                    'dedupe.bands': {'$in': fingerprint['bands']}
+                }
+            }
+        }, {
+            '$limit': limit
+        }]
+        projection = Issue.projection(Issue.CARD_FIELDS, viewer_id, aggregate=True)
+        projection.update({'distance_m': 1, 'dedupe.minhash': 1})
+        pipeline.append({'$project': projection})
+        
+        matches = []
+        for issue in db.issues.aggregate(pipeline):
+            score = minhash.similarity(fingerprint['minhash'], issue.pop('dedupe')['minhash'])
+            matches.append((issue, score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+    
+    @staticmethod
+    def to_point(coordinates):
+        """Convert [lat, lng] coordinates to a GeoJSON Point (which is [lng, lat])."""
+        lat, lng = coordinates
+        return {'type': 'Point', 'coordinates': [float(lng), float(lat)]}
+    
+    @staticmethod
+    def search_nearby(lat, lng, radius_km=5, filters=None, skip=0, limit=20,
+                      fields=None, viewer_id=None, total_cap=None):
+        """
+        Search issues near a location, nearest first.
+        Each issue carries distance_m. Returns (issues, total).
+        """
+        pipeline = [{
+            '$geoNear': {
+                'near': Issue.to_point([lat, lng]),
+                'key': 'geo',
+                'distanceField': 'distance_m',
+                'maxDistance': float(radius_km) * 1000,
+                'spherical': True,
+                'query': filters or {}
+            }
+        }]
+        if total_cap:
+            pipeline.append({'$limit': max(total_cap, skip + limit)})
+        
+        items = [{'$skip': skip}, {'$limit': limit}]
+        projection = Issue.projection(fields, viewer_id, aggregate=True)
+        if projection is not None:
+            items.append({'$project': dict(projection, distance_m=1)})
+        
+        pipeline.append({'$facet': {'items': items, 'total': [{'$count': 'n'}]}})
+        result = next(db.issues.aggregate(pipeline))
         
-        # Add geospatial query
-        query['location.coordinates'] = {
-            '$near': [float(lat), float(lng)],
-            '$maxDistance': radius_km / 111.12  # Convert km to degrees (approximate)
+        issues = Issue.serialize_many(result['items'], fields, viewer_id)
+        for issue, doc in zip(issues, result['items']):
+            issue['distance_m'] = round(doc['distance_m'], 1)
+        
+        total = result['total'][0]['n'] if result['total'] else 0
+        return issues, total
+    
+    @staticmethod
+    def crisis_counts(breakdown=False):
+        """
+        Count open crisis issues per district in the database.
+        With breakdown, also count per category and priority (same round trip).
+        Served by the partial index on open crisis issues.
+        """
+        match = Issue.OPEN_CRISIS
+        facets = {'district': [{'$group': {'_id': '$location.district', 'count': {'$sum': 1}}}]}
+        if breakdown:
+            facets['category'] = [{'$group': {'_id': '$category', 'count': {'$sum': 1}}}]
+            facets['priority'] = [{'$group': {'_id': '$priority', 'count': {'$sum': 1}}}]
+        
+        result = next(db.issues.aggregate([{'$match': match}, {'$facet': facets}]))
+        return {
+            name: {group['_id']: group['count'] for group in groups}
+            for name, groups in result.items()
         }
+    
+    @staticmethod
+    def bbox_query(bbox, filters=None):
+        """
+        Build a query for issues inside a (west, south, east, north) box.
+        Uses a flat $box on the 2d index over geo.coordinates: a viewport is
+        bounded by lines of latitude and longitude, which a GeoJSON polygon's
+        geodesic edges do not follow, and a polygon 180 degrees or more wide
+        is degenerate.
+        """
+        west, south, east, north = bbox
+        query = dict(filters or {})
+        query['geo.coordinates'] = {'$geoWithin': {'$box': [[west, south], [east, north]]}}
+        return query
+    
+    @staticmethod
+    def map_clusters(bbox, cell_size, filters=None, max_clusters=300):
+        """
+        Aggregate issues inside a bounding box into square grid cells of
+        cell_size degrees. Each cluster has a count, centroid and
+        category/priority breakdown, so the result size depends on the
+        viewport and zoom, not on how many issues are in view.
+        Returns (clusters, total, truncated): the largest max_clusters
+        clusters, the number of issues in the box and whether clusters were
+        left out.
+        """
+        cell = lambda axis: {'$floor': {'$divide': [axis, cell_size]}}
+        lng = {'$arrayElemAt': ['$geo.coordinates', 0]}
+        lat = {'$arrayElemAt': ['$geo.coordinates', 1]}
         
-        cursor = db.issues.find(query).limit(50)
-        return [Issue.to_dict(issue) for issue in cursor]
+        pipeline = [
+            {'$match': Issue.bbox_query(bbox, filters)},
+            {'$project': {'category': 1, 'priority': 1, 'lng': lng, 'lat': lat}},
+            # Count per (cell, category, priority) first so each cell keeps a
+            # small, bounded breakdown list
+            {'$group': {
+                '_id': {
+                    'x': cell('$lng'),
+                    'y': cell('$lat'),
+                    'category': '$category',
+                    'priority': '$priority'
+                },
+                'count': {'$sum': 1},
+                'lng': {'$sum': '$lng'},
+                'lat': {'$sum': '$lat'}
+            }},
+            {'$group': {
+                '_id': {'x': '$_id.x', 'y': '$_id.y'},
+                'count': {'$sum': '$count'},
+                'lng': {'$sum': '$lng'},
+                'lat': {'$sum': '$lat'},
+                'breakdown': {'$push': {
+                    'category': '$_id.category',
+                    'priority': '$_id.priority',
+                    'count': '$count'
+                }}
+            }},
+            {'$facet': {
+                'clusters': [{'$sort': {'count': -1}}, {'$limit': max_clusters}],
+                'totals': [{'$group': {'_id': None, 'issues': {'$sum': '$count'}, 'cells': {'$sum': 1}}}]
+            }}
+        ]
+        
+        result = next(db.issues.aggregate(pipeline))
+        totals = result['totals'][0] if result['totals'] else {'issues': 0, 'cells': 0}
+        
+        clusters = []
+        for group in result['clusters']:
+            categories = {}
+            priorities = {}
+            for part in group['breakdown']:
+                categories[part['category']] = categories.get(part['category'], 0) + part['count']
+                priorities[part['priority']] = priorities.get(part['priority'], 0) + part['count']
+            
+            x, y = int(group['_id']['x']), int(group['_id']['y'])
+            clusters.append({
+                'id': f'{x}:{y}',
+                'count': group['count'],
+                'centroid': [group['lat'] / group['count'], group['lng'] / group['count']],  # [lat, lng]
+                'bounds': [x * cell_size, y * cell_size, (x + 1) * cell_size, (y + 1) * cell_size],
+                'categories': categories,
+                'priorities': priorities
+            })
+        return clusters, totals['issues'], totals['cells'] > len(clusters)
+    
+    @staticmethod
+    def map_points(bbox, filters=None, limit=500):
+        """
+        Get individual issues inside a bounding box as lightweight map points.
+        Returns (points, truncated).
+        """
+        projection = {'title': 1, 'category': 1, 'priority': 1, 'status': 1,
+                      'is_crisis': 1, 'location.coordinates': 1}
+        docs = list(db.issues.find(Issue.bbox_query(bbox, filters), projection).limit(limit + 1))
+        
+        points = [{
+            'id': doc['_id'],
+            'title': doc['title'],
+            'category': doc['category'],
+            'priority': doc.get('priority', 'medium'),
+            'status': doc['status'],
+            'is_crisis': doc.get('is_crisis', False),
+            'coordinates': doc['location']['coordinates']  # [lat, lng]
+        } for doc in docs[:limit]]
+        return points, len(docs) > limit
+    
+    @staticmethod
+    def _backfill(field, query, projection, build, batch_size=500, pause=0.0):
+        """
+        Set a derived field on issues that do not have it yet.
+        Walks the collection in _id order in small batches so it can run
+        against a live database. build(issue) returns the value, or None to
+        skip the issue. Returns the number of issues updated.
+        """
+        updated = 0
+        last_id = None
+        
+        while True:
+            batch_query = dict(query, **{field: {'$exists': False}})
+            if last_id is not None:
+                batch_query['_id'] = {'$gt': last_id}
+            
+            batch = list(db.issues.find(batch_query, projection).sort('_id', 1).limit(batch_size))
+            if not batch:
+                return updated
+            last_id = batch[-1]['_id']
+            
+            requests = []
+            for issue in batch:
+                value = build(issue)
+                if value is not None:
+                    requests.append(UpdateOne(
+                        {'_id': issue['_id'], field: {'$exists': False}},
+                        {'$set': {field: value}}
+                    ))
+            
+            if requests:
+                updated += db.issues.bulk_write(requests, ordered=False).modified_count
+            if pause:
+                time.sleep(pause)
+    
+    @staticmethod
+    def backfill_geo(batch_size=500, pause=0.0):
+        """Add GeoJSON points to issues created before the geo field existed."""
+        def build(issue):
+            try:
+                return Issue.to_point(issue['location']['coordinates'])
+            except (TypeError, ValueError):
+                return None  # Leave malformed coordinates for manual review
+        
+        return Issue._backfill(
+            'geo', {'location.coordinates.1': {'$exists': True}},
+            {'location.coordinates': 1}, build, batch_size, pause
+        )
+    
+    @staticmethod
+    def backfill_first_response(batch_size=500, pause=0.0):
+        """
+        Set first_responded_at on issues answered before it was recorded. Only
+        the latest response was kept, so its time is the best estimate.
+        """
+        def build(issue):
+            return issue['government_response'].get('responded_at')
+        
+        return Issue._backfill(
+            'first_responded_at', {'government_response.responded_at': {'$exists': True}},
+            {'government_response.responded_at': 1}, build, batch_size, pause
+        )
+    
+    @staticmethod
+    def backfill_resolved_at(batch_size=500, pause=0.0):
+        """
+        Set resolved_at on issues solved before it was recorded, from when the
+        reporter confirmed the fix or else the last update.
+        """
+        def build(issue):
+            return issue.get('verified_at') or issue.get('updated_at')
+        
+        return Issue._backfill(
+            'resolved_at', {'status': 'solved'}, {'verified_at': 1, 'updated_at': 1}, build, batch_size, pause
+        )
+    
+    @staticmethod
+    def claim_latency(issue_id, metric):
+        """
+        Mark an issue's response or resolution time as recorded. Returns True
+        for the one caller that should record it, so retried outbox events
+        never count a duration twice.
+        """
+        result = db.issues.update_one(
+            {'_id': ObjectId(issue_id), 'latency_observed': {'$ne': metric}},
+            {'$addToSet': {'latency_observed': metric}}
+        )
+        return result.modified_count > 0
+    
+    @staticmethod
+    def backfill_search(batch_size=500, pause=0.0):
+        """Add search terms to issues created before the search field existed."""
+        def build(issue):
+            return Issue.search_terms(
+                issue.get('title'), issue.get('description'),
+                issue.get('location', {}).get('address')
+            )
+        
+        return Issue._backfill(
+            'search', {}, {'title': 1, 'description': 1, 'location.address': 1},
+            build, batch_size, pause
+        )
+    
+    @staticmethod
+    def backfill_dedupe(batch_size=500, pause=0.0):
+        """Add duplicate-detection fingerprints to issues created before they existed."""
+        def build(issue):
+            return Issue.fingerprint(issue.get('title'), issue.get('description'))
+        
+        return Issue._backfill(
+            'dedupe', {}, {'title': 1, 'description': 1}, build, batch_size, pause
+        )
+    
+    @staticmethod
+    def drain_verifications(batch_size=500, pause=0.0):
+        """
+        Move legacy verified_by arrays into the verifications collection.
+        verification_count already includes these users, so it is left alone.
+        Entries are copied before they are pulled, so it can run while users
+        are verifying. Returns the number of verifications moved.
+        """
+        moved = 0
+        last_id = None
+        
+        while True:
+            query = {'verified_by.0': {'$exists': True}}
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            
+            batch = list(db.issues.find(query, {'verified_by': 1}).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+            
+            for issue in batch:
+                users = issue['verified_by']
+                Verification.add_many(issue['_id'], users)
+                before = db.issues.find_one_and_update(
+                    {'_id': issue['_id']},
+                    {'$pullAll': {'verified_by': users}},
+                    projection={'verified_by': 1},
+                    return_document=ReturnDocument.BEFORE
+                )
+                # Users a concurrent toggle already pulled have been counted out
+                # by it; drop the copies made from our stale read
+                remaining = set((before or {}).get('verified_by') or [])
+                for user in users:
+                    if user not in remaining:
+                        Verification.remove(issue['_id'], user)
+                moved += len(remaining & set(users))
+            
+            if pause:
+                time.sleep(pause)
+        
+        db.issues.update_many({'verified_by': {'$size': 0}}, {'$unset': {'verified_by': ''}})
+        return moved
+    
+    
+    @staticmethod
+    def reconcile_verifications(settle=1.0):
+        """
+        Recount verification_count from the verifications collection and
+        correct issues that drifted (the verification and the count are
+        separate writes). A mismatch is only corrected if neither the count
+        nor the recount changed after settle seconds, so taps in flight are
+        not mistaken for drift. Issues with legacy verified_by entries are
+        left to drain_verifications. Returns
+        {issue_id: {'verification_count': (stored, actual)}} for the issues
+        that were corrected.
+        """
+        actual = {row['_id']: row['n'] for row in db.verifications.aggregate([
+            {'$group': {'_id': '$issue_id', 'n': {'$sum': 1}}}
+        ])}
+        
+        suspects = {}
+        for issue in db.issues.find({'verified_by.0': {'$exists': False}}, {'verification_count': 1}):
+            stored = issue.get('verification_count') or 0
+            if stored != actual.get(issue['_id'], 0):
+                suspects[issue['_id']] = (stored, actual.get(issue['_id'], 0))
+        if not suspects:
+            return {}
+        
+        time.sleep(settle)
+        drift = {}
+        for issue_id, (stored, counted) in suspects.items():
+            if Verification.count_for_issue(issue_id) != counted:
+                continue
+            # Only if no count change landed since it was read
+            result = db.issues.update_one(
+                {'_id': issue_id, 'verification_count': stored if stored else {'$in': [0, None]}},
+                {'$set': {'verification_count': counted}}
+            )
+            if result.modified_count:
+                drift[str(issue_id)] = {'verification_count': (stored, counted)}
+        return drift
@@ -0,0 +1,130 @@
+"""
+Latency model - Streaming time-to-response and time-to-resolution quantiles.
+"""
+from pymongo import UpdateOne
+from app import db
+from app.utils import sketch
+
+class LatencyStats:
+    """
+    Quantile sketches (see app.utils.sketch) of how long issues take to get a
+    first government response and to be resolved.
+    
+    There is one document per metric and scope. The scope is a ministry
+    (ministry_id, or None for all ministries), optionally narrowed to one
+    district or category. Each document holds the bucket counts, count and
+    sum. Recording a duration $incs a fixed number of documents, and any
+    number of workers can record into the same one.
+    """
+    
+    METRICS = ['response', 'resolution']
+    DIMENSIONS = ['all', 'district', 'category']
+    QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+    
+    @staticmethod
+    def observe(metric, seconds, ministry_ids, district=None, category=None):
+        """Record one duration (seconds) in each of its scopes (see _scopes), in one bulk write."""
+        seconds = max(seconds, 0)
+        inc = {f'buckets.{sketch.bucket(seconds)}': 1, 'count': 1, 'sum': seconds}
+        requests = [
+            UpdateOne({'_id': LatencyStats._id(**key)}, {'$inc': inc, '$setOnInsert': key}, upsert=True)
+            for key in LatencyStats._scopes(metric, ministry_ids, district, category)
+        ]
+        db.latency_sketches.bulk_write(requests, ordered=False)
+    
+    @staticmethod
+    def seed():
+        """
+        Build the sketches from the issue history, measuring the same instants
+        as the outbox dispatcher (first_responded_at, resolved_at). Only runs
+        while there are none yet, and marks what it recorded as observed (see
+        Issue.claim_latency), so nothing is counted twice. Returns the number
+        of durations recorded.
+        """
+        if db.latency_sketches.count_documents({}, limit=1):
+            return 0
+        
+        sketches = {}
+        observed = 0
+        recorded = {metric: [] for metric in LatencyStats.METRICS}
+        fields = {'created_at': 1, 'first_responded_at': 1, 'resolved_at': 1,
+                  'tagged_ministries': 1, 'government_response.ministry_id': 1,
+                  'location.district': 1, 'category': 1}
+        query = {'$or': [{'first_responded_at': {'$ne': None}}, {'resolved_at': {'$ne': None}}]}
+        for issue in db.issues.find(query, fields):
+            district, category = (issue.get('location') or {}).get('district'), issue.get('category')
+            durations = []
+            if issue.get('first_responded_at') and (issue.get('government_response') or {}).get('ministry_id'):
+                durations.append(('response', issue['first_responded_at'], [issue['government_response']['ministry_id']]))
+            if issue.get('resolved_at'):
+                durations.append(('resolution', issue['resolved_at'], issue.get('tagged_ministries', [])))
+            
+            for metric, at, ministry_ids in durations:
+                seconds = max((at - issue['created_at']).total_seconds(), 0)
+                bucket = sketch.bucket(seconds)
+                for key in LatencyStats._scopes(metric, ministry_ids, district, category):
+                    doc = sketches.setdefault(LatencyStats._id(**key), dict(key, buckets={}, count=0, sum=0))
+                    doc['buckets'][bucket] = doc['buckets'].get(bucket, 0) + 1
+                    doc['count'] += 1
+                    doc['sum'] += seconds
+                recorded[metric].append(issue['_id'])
+                observed += 1
+        
+        if sketches:
+            db.latency_sketches.insert_many(
+                [dict(doc, _id=_id) for _id, doc in sketches.items()], ordered=False
+            )
+        for metric, issue_ids in recorded.items():
+            if issue_ids:
+                db.issues.update_many({'_id': {'$in': issue_ids}}, {'$addToSet': {'latency_observed': metric}})
+        return observed
+    
+    @staticmethod
+    def summary(metric, ministry_id=None, dimension='all', value=None):
+        """Count, mean and quantiles (in seconds) of a metric for one scope."""
+        doc = db.latency_sketches.find_one({'_id': LatencyStats._id(metric, ministry_id, dimension, value)})
+        return LatencyStats._summarize(doc)
+    
+    @staticmethod
+    def breakdown(metric, dimension, ministry_id=None):
+        """Summaries of a metric by district or category ({value: summary})."""
+        docs = db.latency_sketches.find({'metric': metric, 'ministry_id': ministry_id, 'dimension': dimension})
+        return {doc['value']: LatencyStats._summarize(doc) for doc in docs}
+    
+    @staticmethod
+    def for_ministries(metric, ministry_ids):
+        """Summaries of a metric for several ministries in one query ({ministry_id: summary})."""
+        docs = db.latency_sketches.find({
+            'metric': metric, 'ministry_id': {'$in': list(ministry_ids)}, 'dimension': 'all'
+        })
+        return {doc['ministry_id']: LatencyStats._summarize(doc) for doc in docs}
+    
+    @staticmethod
+    def combined(docs):
+        """Merge sketch documents (e.g. several districts) into one summary."""
+        docs = list(docs)
+        return LatencyStats._summarize({
+            'buckets': sketch.merge(*(doc.get('buckets') for doc in docs)),
+            'count': sum(doc.get('count', 0) for doc in docs),
+            'sum': sum(doc.get('sum', 0) for doc in docs)
+        })
+    
+    @staticmethod
+    def _summarize(doc):
+        count = (doc or {}).get('count', 0)
+        result = {'count': count, 'mean': doc['sum'] / count if count else None}
+        for name, q in LatencyStats.QUANTILES.items():
+            result[name] = sketch.quantile(doc.get('buckets'), q) if count else None
+        return result
+    
+    @staticmethod
+    def _scopes(metric, ministry_ids, district, category):
+        """Sketch keys a duration is recorded in: each ministry and all ministries, overall and by district and category."""
+        for ministry_id in [None] + list(ministry_ids):
+            for dimension, value in [('all', None), ('district', district), ('category', category)]:
+                if dimension == 'all' or value:
+                    yield {'metric': metric, 'ministry_id': ministry_id, 'dimension': dimension, 'value': value}
+    
+    @staticmethod
+    def _id(metric, ministry_id, dimension, value):
+        return f'{metric}:{ministry_id or "*"}:{dimension}:{value or "*"}'
@@ -0,0 +1,325 @@
+"""
+Leaderboard model - Materialized, time-windowed ministry and NGO rankings.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReplaceOne, UpdateOne
+from app import db
+
+class Leaderboard:
+    """
+    Ministries ranked by the share of their issues that were solved, and
+    verified NGOs by the share of their claims that were completed, all time
+    and over the last 30 and 7 days.
+    
+    The outbox dispatcher applies issue changes (see Issue.sync_stats): it
+    $incs per-day counters in leaderboard_daily (issues by the day they were
+    reported, claims by the day they were made) and rewrites the leaderboard
+    entries of the ministries and NGOs they touched. All-time counts come
+    from the performance counters. rebuild() recomputes every
+    entry, which also moves the windows along as days pass; it runs with the
+    stats reconciler.
+    
+    Scores are Bayesian-smoothed: (solved + PRIOR_WEIGHT * prior) /
+    (total + PRIOR_WEIGHT), where prior is the rate of the whole board. A
+    ministry with 2 of 2 issues solved scores close to the average, not
+    above one with 95 of 100.
+    """
+    
+    KINDS = ['ministry', 'ngo']
+    WINDOWS = {'all': None, '30d': 30, '7d': 7}
+    PRIOR_WEIGHT = 10
+    
+    # Ranking order, matching the leaderboard index
+    SORT = [('score', DESCENDING), ('entity_id', ASCENDING)]
+    
+    @staticmethod
+    def record_transition(before, after, refresh=True):
+        """
+        Update the daily counters and, unless refresh is False, the
+        leaderboard entries for an issue that changed from before to after
+        (None for a new or deleted issue). Returns False if an update failed.
+        """
+        deltas = Counter()
+        for issue, sign in [(before, -1), (after, 1)]:
+            for kind, entity_id, day, solved in Leaderboard._contributions(issue):
+                deltas[(kind, entity_id, day, 'total')] += sign
+                deltas[(kind, entity_id, day, 'solved')] += sign * solved
+        deltas = {key: n for key, n in deltas.items() if n}
+        if not deltas:
+            return True
+        
+        try:
+            oldest = Leaderboard._oldest_day()
+            inc = {}
+            for (kind, entity_id, day, field), n in deltas.items():
+                if day and day >= oldest:
+                    inc.setdefault((kind, entity_id, day), {})[field] = n
+            if inc:
+                db.leaderboard_daily.bulk_write([
+                    UpdateOne(
+                        {'_id': f'{kind}:{entity_id}:{day:%Y-%m-%d}'},
+                        {'$inc': fields, '$setOnInsert': {'kind': kind, 'entity_id': entity_id, 'day': day}},
+                        upsert=True
+                    )
+                    for (kind, entity_id, day), fields in inc.items()
+                ], ordered=False)
+        except:
+            return False
+        
+        if not refresh:
+            return True
+        
+        ok = True
+        for kind in Leaderboard.KINDS:
+            entity_ids = {key[1] for key in deltas if key[0] == kind}
+            if entity_ids:
+                ok = Leaderboard.refresh(kind, entity_ids) and ok
+        return ok
+    
+    @staticmethod
+    def refresh(kind, entity_ids):
+        """
+        Recompute the entries of some ministries or NGOs, with the priors of
+        the last rebuild. Returns False if the update failed.
+        """
+        try:
+            entity_ids = [ObjectId(entity_id) for entity_id in entity_ids]
+            priors = {doc['window']: doc['rate'] for doc in db.leaderboard_priors.find({'kind': kind})}
+            entities = Leaderboard._entities(kind, {'_id': {'$in': entity_ids}})
+            counts = Leaderboard._window_counts(kind, entity_ids)
+            
+            requests = []
+            for window in Leaderboard.WINDOWS:
+                for entity_id in entity_ids:
+                    entry = Leaderboard._entry(
+                        kind, window, entity_id, entities.get(entity_id), counts[window].get(entity_id), priors.get(window, 0)
+                    )
+                    if entry:
+                        requests.append(ReplaceOne({'_id': entry['_id']}, entry, upsert=True))
+                    else:
+                        requests.append(DeleteOne({'_id': Leaderboard._id(kind, window, entity_id)}))
+            db.leaderboard.bulk_write(requests, ordered=False)
+            return True
+        except:
+            return False
+    
+    @staticmethod
+    def rebuild():
+        """
+        Recompute the priors and every entry, and drop the entries of
+        ministries and NGOs no longer ranked. Returns the number of
+        ministries and NGOs ranked in any window, by kind.
+        """
+        ranked = {}
+        for kind in Leaderboard.KINDS:
+            entities = Leaderboard._entities(kind, {})
+            counts = Leaderboard._window_counts(kind)
+            
+            entries = []
+            for window in Leaderboard.WINDOWS:
+                totals = [
+                    Leaderboard._counts(window, entity, counts[window].get(entity_id))
+                    for entity_id, entity in entities.items()
+                ]
+                total = sum(t for t, _ in totals)
+                prior = sum(s for _, s in totals) / total if total else 0
+                db.leaderboard_priors.replace_one(
+                    {'_id': f'{kind}:{window}'}, {'kind': kind, 'window': window, 'rate': prior}, upsert=True
+                )
+                for entity_id, entity in entities.items():
+                    entry = Leaderboard._entry(kind, window, entity_id, entity, counts[window].get(entity_id), prior)
+                    if entry:
+                        entries.append(entry)
+            
+            if entries:
+                db.leaderboard.bulk_write(
+                    [ReplaceOne({'_id': entry['_id']}, entry, upsert=True) for entry in entries], ordered=False
+                )
+            db.leaderboard.delete_many({'kind': kind, '_id': {'$nin': [entry['_id'] for entry in entries]}})
+            ranked[kind] = len({entry['entity_id'] for entry in entries})
+        return ranked
+    
+    @staticmethod
+    def seed():
+        """
+        Build the daily counters of the last 30 days from the issue history,
+        as counted so far (see Issue.sync_stats). Only runs while there are
+        none yet, so live updates are never counted twice. Returns the number
+        of daily documents written.
+        """
+        if db.leaderboard_daily.count_documents({}, limit=1):
+            return 0
+        
+        oldest = Leaderboard._oldest_day()
+        fields = {
+            'created_at': 1, 'status': 1, 'solution_verified': 1, 'tagged_ministries': 1, 'ngo_claim': 1,
+            'stats_counted': 1
+        }
+        query = {'$or': [{'created_at': {'$gte': oldest}}, {'ngo_claim.claimed_at': {'$gte': oldest}}]}
+        
+        daily = {}
+        for issue in db.issues.find(query, fields):
+            counted = issue.pop('stats_counted', issue)  # From before stats_counted: as it is
+            for kind, entity_id, day, solved in Leaderboard._contributions(counted):
+                if not day or day < oldest:
+                    continue
+                doc = daily.setdefault(
+                    f'{kind}:{entity_id}:{day:%Y-%m-%d}',
+                    {'kind': kind, 'entity_id': entity_id, 'day': day, 'total': 0, 'solved': 0}
+                )
+                doc['total'] += 1
+                doc['solved'] += solved
+        
+        if daily:
+            db.leaderboard_daily.insert_many([dict(doc, _id=_id) for _id, doc in daily.items()], ordered=False)
+        return len(daily)
+    
+    @staticmethod
+    def top(kind, window='all', limit=10):
+        """The first limit entries of a leaderboard, ranked."""
+        cursor = db.leaderboard.find({'kind': kind, 'window': window}).sort(Leaderboard.SORT).limit(limit)
+        return [Leaderboard.to_dict(entry, rank) for rank, entry in enumerate(cursor, 1)]
+    
+    @staticmethod
+    def rank_of(kind, entity_id, window='all'):
+        """A ministry's or NGO's entry with its rank, or None if it is not ranked."""
+        try:
+            entry = db.leaderboard.find_one({'_id': Leaderboard._id(kind, window, ObjectId(entity_id))})
+        except:
+            return None
+        if not entry:
+            return None
+        
+        ahead = db.leaderboard.count_documents({
+            'kind': kind, 'window': window,
+            '$or': [
+                {'score': {'$gt': entry['score']}},
+                {'score': entry['score'], 'entity_id': {'$lt': entry['entity_id']}}
+            ]
+        })
+        return Leaderboard.to_dict(entry, ahead + 1)
+    
+    @staticmethod
+    def count(kind, window='all'):
+        """Number of ministries or NGOs ranked."""
+        return db.leaderboard.count_documents({'kind': kind, 'window': window})
+    
+    @staticmethod
+    def _contributions(issue):
+        """(kind, entity_id, day, solved) for each ministry and NGO an issue counts towards."""
+        if not issue:
+            return
+        created = issue.get('created_at')
+        solved = 1 if issue.get('status') == 'solved' else 0
+        for ministry_id in issue.get('tagged_ministries') or []:
+            yield 'ministry', ministry_id, Leaderboard._day(created), solved
+        
+        claim = issue.get('ngo_claim') or {}
+        if claim.get('ngo_id'):
+            completed = 1 if solved and issue.get('solution_verified') else 0
+            yield 'ngo', claim['ngo_id'], Leaderboard._day(claim.get('claimed_at')), completed
+    
+    @staticmethod
+    def _entities(kind, query):
+        """Rankable ministries or verified NGOs matching query, with their all-time counts."""
+        if kind == 'ministry':
+            docs = db.ministries.find(query, {'name_en': 1, 'category': 1, 'performance_stats': 1})
+            name, total, solved = 'name_en', 'total_issues', 'solved'
+        else:
+            docs = db.ngos.find(dict(query, verified=True), {'name': 1, 'performance_stats': 1})
+            name, total, solved = 'name', 'total_claimed', 'completed'
+        
+        entities = {}
+        for doc in docs:
+            stats = doc.get('performance_stats') or {}
+            entities[doc['_id']] = {
+                'name': doc[name],
+                'category': doc.get('category'),
+                'all': (stats.get(total, 0), stats.get(solved, 0))
+            }
+        return entities
+    
+    @staticmethod
+    def _window_counts(kind, entity_ids=None):
+        """{window: {entity_id: (total, solved)}} summed from the daily counters (all-time from the entities)."""
+        today = Leaderboard._today()
+        starts = {window: today - timedelta(days=days - 1) for window, days in Leaderboard.WINDOWS.items() if days}
+        match = {'kind': kind, 'day': {'$gte': min(starts.values())}}
+        if entity_ids is not None:
+            match['entity_id'] = {'$in': list(entity_ids)}
+        
+        group = {'_id': '$entity_id'}
+        for window, start in starts.items():
+            in_window = {'$gte': ['$day', start]}
+            group[f'{window}_total'] = {'$sum': {'$cond': [in_window, '$total', 0]}}
+            group[f'{window}_solved'] = {'$sum': {'$cond': [in_window, '$solved', 0]}}
+        
+        counts = {window: {} for window in Leaderboard.WINDOWS}
+        for row in db.leaderboard_daily.aggregate([{'$match': match}, {'$group': group}]):
+            for window in starts:
+                counts[window][row['_id']] = (row[f'{window}_total'], row[f'{window}_solved'])
+        return counts
+    
+    @staticmethod
+    def _entry(kind, window, entity_id, entity, counts, prior):
+        """The leaderboard document of one entity, or None if it has no issues in the window."""
+        if not entity:
+            return None
+        total, solved = Leaderboard._counts(window, entity, counts)
+        if total <= 0:
+            return None
+        
+        entry = {
+            '_id': Leaderboard._id(kind, window, entity_id),
+            'kind': kind,
+            'window': window,
+            'entity_id': entity_id,
+            'name': entity['name'],
+            'total': total,
+            'solved': solved,
+            'resolution_rate': round(solved / total * 100, 2),
+            'score': (solved + Leaderboard.PRIOR_WEIGHT * prior) / (total + Leaderboard.PRIOR_WEIGHT)
+        }
+        if entity.get('category'):
+            entry['category'] = entity['category']
+        return entry
+    
+    @staticmethod
+    def _counts(window, entity, counts):
+        """(total, solved) of an entity in a window: all-time from its performance counters, else its daily sums."""
+        return entity['all'] if window == 'all' else (counts or (0, 0))
+    
+    @staticmethod
+    def to_dict(entry, rank):
+        """Convert a leaderboard entry to a dictionary."""
+        result = {
+            'rank': rank,
+            'id': entry['entity_id'],
+            'name': entry['name'],
+            'total': entry['total'],
+            'solved': entry['solved'],
+            'resolution_rate': entry['resolution_rate'],
+            'score': round(entry['score'] * 100, 2)
+        }
+        if 'category' in entry:
+            result['category'] = entry['category']
+        return result
+    
+    @staticmethod
+    def _id(kind, window, entity_id):
+        return f'{kind}:{window}:{entity_id}'
+    
+    @staticmethod
+    def _day(at):
+        return datetime(at.year, at.month, at.day) if at else None
+    
+    @staticmethod
+    def _today():
+        return Leaderboard._day(datetime.utcnow())
+    
+    @staticmethod
+    def _oldest_day():
+        """First day of the longest window; older days are not kept."""
+        return Leaderboard._today() - timedelta(days=max(d for d in Leaderboard.WINDOWS.values() if d) - 1)
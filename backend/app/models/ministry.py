@@ -1,12 +1,28 @@
 """
 Ministry model and helper functions.
 """
+from collections import Counter
 from datetime import datetime
 from bson import ObjectId
 from app import db
 
 class Ministry:
-    """Ministry/Government department model."""
+    """
+    Ministry/Government department model.
+    
+    performance_stats holds counters of the issues tagged to the ministry:
+    total_issues, pending (still open) and solved, the same three by_category
+    and by_district, and by_status. Issue writes that change an issue's status
+    adjust them with $inc (see record_transition), so reading them is a point
+    read. reconcile_stats recounts them periodically and repairs any drift.
+    """
+    
+    # Statuses counted as pending (same as Issue.OPEN_STATUSES)
+    OPEN_STATUSES = ['pending', 'verified', 'in_progress']
+    
+    # Aggregation stage replacing each issue by the values the counters hold
+    # for it (see Issue.sync_stats); issues from before stats_counted as they are
+    COUNTED_STAGE = {'$replaceRoot': {'newRoot': {'$ifNull': ['$stats_counted', '$$ROOT']}}}
     
     @staticmethod
     def create(data):
@@ -22,8 +38,7 @@ class Ministry:
             'performance_stats': {
                 'total_issues': 0,
                 'solved': 0,
-                'pending': 0,
-                'avg_response_time': 0
+                'pending': 0
             },
             'created_at': datetime.utcnow()
         }
@@ -64,38 +79,136 @@ class Ministry:
             return False
     
     @staticmethod
-    def update_stats(ministry_id):
-        """Update ministry performance statistics."""
+    def record_transition(issue, old_status, new_status):
+        """
+        Move an issue between status counters of each ministry it is tagged
+        to, in one $inc. old_status is None for a new issue and new_status is
+        None for a deleted one. Returns False if the update failed.
+        """
+        ministry_ids = issue.get('tagged_ministries') or []
+        if not ministry_ids or old_status == new_status:
+            return True
+        
+        inc = Counter()
+        category, district = issue.get('category'), (issue.get('location') or {}).get('district')
+        if old_status:
+            Ministry._count(inc, category, district, old_status, -1)
+        if new_status:
+            Ministry._count(inc, category, district, new_status, 1)
+        inc = {field: n for field, n in inc.items() if n}
+        if not inc:
+            return True
+        
         try:
-            # Count issues tagged to this ministry
-            total_issues = db.issues.count_documents({
-                'tagged_ministries': ObjectId(ministry_id)
-            })
-            
-            solved = db.issues.count_documents({
-                'tagged_ministries': ObjectId(ministry_id),
-                'status': 'solved'
-            })
-            
-            pending = db.issues.count_documents({
-                'tagged_ministries': ObjectId(ministry_id),
-                'status': {'$in': ['pending', 'verified', 'in_progress']}
-            })
-            
-            stats = {
-                'performance_stats.total_issues': total_issues,
-                'performance_stats.solved': solved,
-                'performance_stats.pending': pending
-            }
-            
-            db.ministries.update_one(
-                {'_id': ObjectId(ministry_id)},
-                {'$set': stats}
-            )
+            db.ministries.update_many({'_id': {'$in': ministry_ids}}, {'$inc': inc})
             return True
         except:
             return False
     
+    @staticmethod
+    def reconcile_stats():
+        """
+        Recount every ministry's performance counters in one grouped
+        aggregation over issues and correct those that drifted. Issues are
+        counted as of their stats_counted values (see Issue.sync_stats), so
+        changes still waiting in an outbox are not mistaken for drift. A
+        ministry whose counters change while the aggregation runs is left for
+        the next run. Returns {ministry_id: {field: (stored, actual)}} for the
+        ministries that were corrected.
+        """
+        stored = {m['_id']: m.get('performance_stats') for m in db.ministries.find({}, {'performance_stats': 1})}
+        
+        actual = {ministry_id: Counter() for ministry_id in stored}
+        for row in db.issues.aggregate([
+            Ministry.COUNTED_STAGE,
+            {'$match': {'tagged_ministries.0': {'$exists': True}}},
+            {'$unwind': '$tagged_ministries'},
+            {'$group': {
+                '_id': {
+                    'ministry_id': '$tagged_ministries',
+                    'status': '$status',
+                    'category': '$category',
+                    'district': '$location.district'
+                },
+                'n': {'$sum': 1}
+            }}
+        ]):
+            key = row['_id']
+            if key['ministry_id'] in actual:
+                Ministry._count(actual[key['ministry_id']], key.get('category'), key.get('district'),
+                                key.get('status'), row['n'])
+        
+        drift = {}
+        for ministry_id, stats in stored.items():
+            counts = {field: n for field, n in actual[ministry_id].items() if n}
+            current = Ministry._flatten(stats or {}, 'performance_stats')
+            current.pop('performance_stats.avg_response_time', None)  # No longer stored
+            diff = {
+                field: (current.get(field, 0), counts.get(field, 0))
+                for field in set(current) | set(counts)
+                if current.get(field, 0) != counts.get(field, 0)
+            }
+            if not diff:
+                continue
+            
+            fixed = Ministry._nest(counts).get('performance_stats', {})
+            fixed.setdefault('total_issues', 0)
+            fixed.setdefault('pending', 0)
+            fixed.setdefault('solved', 0)
+            # Only if no $inc landed since stats was read
+            result = db.ministries.update_one(
+                {'_id': ministry_id, 'performance_stats': stats if stats is not None else {'$exists': False}},
+                {'$set': {'performance_stats': fixed}}
+            )
+            if result.modified_count:
+                drift[str(ministry_id)] = diff
+        return drift
+    
+    @staticmethod
+    def _count(inc, category, district, status, n):
+        """Add n issues with this category, district and status to the counters in inc."""
+        if not status:
+            return
+        prefixes = ['performance_stats']
+        if category:
+            prefixes.append(f'performance_stats.by_category.{Ministry._key(category)}')
+        if district:
+            prefixes.append(f'performance_stats.by_district.{Ministry._key(district)}')
+        
+        for prefix in prefixes:
+            inc[f'{prefix}.total_issues'] += n
+            if status in Ministry.OPEN_STATUSES:
+                inc[f'{prefix}.pending'] += n
+            elif status == 'solved':
+                inc[f'{prefix}.solved'] += n
+        inc[f'performance_stats.by_status.{Ministry._key(status)}'] += n
+    
+    @staticmethod
+    def _key(value):
+        # Field names cannot contain dots or start with $
+        return str(value).replace('.', '_').lstrip('$')
+    
+    @staticmethod
+    def _flatten(doc, prefix):
+        fields = {}
+        for key, value in doc.items():
+            if isinstance(value, dict):
+                fields.update(Ministry._flatten(value, f'{prefix}.{key}'))
+            elif value:
+                fields[f'{prefix}.{key}'] = value
+        return fields
+    
+    @staticmethod
+    def _nest(fields):
+        doc = {}
+        for field, value in fields.items():
+            *parents, name = field.split('.')
+            node = doc
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node[name] = value
+        return doc
+    
     @staticmethod
     def delete(ministry_id):
         """Delete a ministry."""
@@ -112,14 +225,14 @@ class Ministry:
             return None
         
         return {
-            'id': str(ministry['_id']),
+            'id': ministry['_id'],
             'name_en': ministry['name_en'],
             'name_si': ministry.get('name_si', ''),
             'name_ta': ministry.get('name_ta', ''),
             'category': ministry['category'],
             'contact_email': ministry.get('contact_email'),
             'contact_phone': ministry.get('contact_phone'),
-            'assigned_users': [str(u) for u in ministry.get('assigned_users', [])],
+            'assigned_users': ministry.get('assigned_users', []),
             'performance_stats': ministry.get('performance_stats', {}),
-            'created_at': ministry['created_at'].isoformat()
+            'created_at': ministry['created_at']
         }
@@ -0,0 +1,146 @@
+"""
+Ministry inbox model and helper functions.
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument
+from app import db
+from app.utils.pagination import keyset_filter
+
+class MinistryInbox:
+    """
+    Notifications addressed to a whole ministry. Each is stored once per
+    ministry, not copied to every officer. Officers see the entries together
+    with their personal notifications (see NotificationService.get_feed).
+    
+    Entries are numbered per ministry (ministries.inbox_seq). An officer's
+    read state is a single watermark, users.inbox_read_seq: entries numbered
+    above it are unread, so the unread count is the difference of two
+    counters.
+    """
+    
+    FEED_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
+    
+    @staticmethod
+    def add_many(ministry_ids, notification_type, title, message, issue_id=None):
+        """Add the same entry to several ministry inboxes in one insert. Returns the added entries."""
+        now = datetime.utcnow()
+        issue_id = ObjectId(issue_id) if issue_id else None
+        
+        docs = []
+        for ministry_id in ministry_ids:
+            ministry = db.ministries.find_one_and_update(
+                {'_id': ObjectId(ministry_id)},
+                {'$inc': {'inbox_seq': 1}},
+                projection={'inbox_seq': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if not ministry:
+                continue  # Unknown ministry
+            docs.append({
+                'ministry_id': ministry['_id'],
+                'seq': ministry['inbox_seq'],
+                'type': notification_type,
+                'title': title,
+                'message': message,
+                'issue_id': issue_id,
+                'created_at': now
+            })
+        
+        if docs:
+            db.ministry_inbox.insert_many(docs, ordered=False)
+        return docs
+    
+    @staticmethod
+    def find_for_ministry(ministry_id, limit=20, after=None, after_seq=None):
+        """
+        Get a newest-first page of a ministry inbox following a (created_at, _id)
+        position, optionally only entries numbered above after_seq (unread).
+        """
+        query = {'ministry_id': ObjectId(ministry_id)}
+        if after_seq is not None:
+            query['seq'] = {'$gt': after_seq}
+        cursor = db.ministry_inbox.find(keyset_filter(query, after)).sort(MinistryInbox.FEED_SORT).limit(limit)
+        return list(cursor)
+    
+    @staticmethod
+    def find_by_id(entry_id):
+        """Find an inbox entry by ID."""
+        try:
+            return db.ministry_inbox.find_one({'_id': ObjectId(entry_id)})
+        except:
+            return None
+    
+    @staticmethod
+    def read_seq(user):
+        """
+        Get an officer's read watermark. Officers who never read their inbox
+        start at the last entry created before their account, which is looked
+        up once and stored.
+        """
+        if user.get('inbox_read_seq') is not None:
+            return user['inbox_read_seq']
+        
+        query = {'ministry_id': ObjectId(user['ministry_id'])}
+        if user.get('created_at'):
+            query['created_at'] = {'$lte': user['created_at']}
+        last = db.ministry_inbox.find_one(query, {'seq': 1}, sort=MinistryInbox.FEED_SORT)
+        seq = last.get('seq', 0) if last else 0
+        MinistryInbox.mark_read(user['_id'], seq)
+        return seq
+    
+    @staticmethod
+    def unread_count(user):
+        """Count an officer's unread inbox entries (one point read of the ministry)."""
+        ministry = db.ministries.find_one({'_id': ObjectId(user['ministry_id'])}, {'inbox_seq': 1})
+        if not ministry:
+            return 0
+        return max(ministry.get('inbox_seq', 0) - MinistryInbox.read_seq(user), 0)
+    
+    @staticmethod
+    def mark_read(user_id, seq):
+        """Move an officer's read watermark forward to seq (never backwards)."""
+        try:
+            db.users.update_one({'_id': ObjectId(user_id)}, {'$max': {'inbox_read_seq': seq}})
+            return True
+        except:
+            return False
+    
+    @staticmethod
+    def mark_all_read(user):
+        """Mark every entry currently in the officer's ministry inbox as read."""
+        ministry = db.ministries.find_one({'_id': ObjectId(user['ministry_id'])}, {'inbox_seq': 1})
+        if not ministry:
+            return False
+        return MinistryInbox.mark_read(user['_id'], ministry.get('inbox_seq', 0))
+    
+    @staticmethod
+    def to_dict(entry, user_id, read_seq):
+        """Convert an inbox entry to the notification format for one officer."""
+        return {
+            'id': entry['_id'],
+            'user_id': user_id,
+            'type': entry['type'],
+            'title': entry['title'],
+            'message': entry['message'],
+            'issue_id': entry.get('issue_id'),
+            'read': entry.get('seq', 0) <= read_seq,
+            'count': 1,
+            'created_at': entry['created_at'],
+            'ministry_id': entry['ministry_id']
+        }
+    
+    @staticmethod
+    def to_event(entry):
+        """Convert an inbox entry to a notification event for the whole ministry."""
+        return {
+            'id': entry['_id'],
+            'type': entry['type'],
+            'title': entry['title'],
+            'message': entry['message'],
+            'issue_id': entry.get('issue_id'),
+            'read': False,
+            'count': 1,
+            'created_at': entry['created_at'],
+            'ministry_id': entry['ministry_id']
+        }
@@ -1,12 +1,26 @@
 """
 NGO model and helper functions.
 """
+from collections import Counter
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING
 from app import db
+from app.utils.pagination import facet_page
+from app.models.ministry import Ministry
 
 class NGO:
-    """NGO/Donor organization model."""
+    """
+    NGO/Donor organization model.
+    
+    performance_stats counts the issues an NGO claimed: total_claimed,
+    active (in progress) and completed (solved and confirmed by the
+    reporter), and the success_rate derived from them. The outbox dispatcher
+    adjusts them after issue writes (see Issue.sync_stats and
+    record_transition), so reading a profile never counts issues.
+    """
+    
+    COUNTERS = ['total_claimed', 'active', 'completed']
     
     @staticmethod
     def create(data):
@@ -25,6 +39,7 @@ class NGO:
             'approved_at': None,
             'performance_stats': {
                 'total_claimed': 0,
+                'active': 0,
                 'completed': 0,
                 'success_rate': 0
             },
@@ -50,6 +65,14 @@ class NGO:
         cursor = db.ngos.find(query).skip(skip).limit(limit)
         return [NGO.to_dict(ngo) for ngo in cursor]
     
+    @staticmethod
+    def page(filters=None, skip=0, limit=20, total_cap=None):
+        """Get a page of ngos with the total in one query. Returns (ngos, total, capped)."""
+        docs, total, capped = facet_page(
+            db.ngos, filters or {}, [('_id', ASCENDING)], skip, limit, total_cap=total_cap
+        )
+        return [NGO.to_dict(ngo) for ngo in docs], total, capped
+    
     @staticmethod
     def count(filters=None):
         """Count NGOs with optional filters."""
@@ -87,35 +110,105 @@ class NGO:
             return False
     
     @staticmethod
-    def update_stats(ngo_id):
-        """Update NGO performance statistics."""
-        try:
-            # Count issues claimed by this NGO
-            total_claimed = db.issues.count_documents({
-                'ngo_claim.ngo_id': ObjectId(ngo_id)
-            })
-            
-            completed = db.issues.count_documents({
-                'ngo_claim.ngo_id': ObjectId(ngo_id),
-                'status': 'solved',
-                'solution_verified': True
-            })
-            
-            success_rate = (completed / total_claimed * 100) if total_claimed > 0 else 0
-            
-            stats = {
-                'performance_stats.total_claimed': total_claimed,
-                'performance_stats.completed': completed,
-                'performance_stats.success_rate': round(success_rate, 2)
+    def record_transition(before, after):
+        """
+        Adjust the performance counters of the NGOs whose claimed issue
+        changed from before to after (issue documents with ngo_claim, status
+        and solution_verified; None for a new or deleted issue). Returns
+        False if an update failed.
+        """
+        deltas = {}
+        for issue, sign in [(before, -1), (after, 1)]:
+            ngo_id = ((issue or {}).get('ngo_claim') or {}).get('ngo_id')
+            if not ngo_id:
+                continue
+            counts = deltas.setdefault(ngo_id, Counter())
+            for field, n in NGO._counts(issue).items():
+                counts[field] += sign * n
+        
+        ok = True
+        for ngo_id, counts in deltas.items():
+            counts = {field: n for field, n in counts.items() if n}
+            if not counts:
+                continue
+            try:
+                db.ngos.update_one({'_id': ObjectId(ngo_id)}, NGO._stats_pipeline(counts))
+            except:
+                ok = False
+        return ok
+    
+    @staticmethod
+    def reconcile_stats():
+        """
+        Recount every NGO's performance counters in one grouped aggregation
+        over the issues' counted values and correct those that drifted (see
+        Ministry.reconcile_stats). Returns {ngo_id: {field: (stored, actual)}}
+        for the NGOs that were corrected.
+        """
+        stored = {n['_id']: n.get('performance_stats') or {} for n in db.ngos.find({}, {'performance_stats': 1})}
+        
+        actual = {}
+        for row in db.issues.aggregate([
+            Ministry.COUNTED_STAGE,
+            {'$match': {'ngo_claim.ngo_id': {'$exists': True}}},
+            {'$group': {
+                '_id': {'ngo_id': '$ngo_claim.ngo_id', 'status': '$status', 'solution_verified': '$solution_verified'},
+                'n': {'$sum': 1}
+            }}
+        ]):
+            counts = actual.setdefault(row['_id']['ngo_id'], Counter())
+            for field, n in NGO._counts(row['_id']).items():
+                counts[field] += n * row['n']
+        
+        drift = {}
+        for ngo_id, stats in stored.items():
+            counts = actual.get(ngo_id, Counter())
+            diff = {
+                field: (stats.get(field, 0), counts[field])
+                for field in NGO.COUNTERS
+                if stats.get(field, 0) != counts[field]
             }
+            if not diff:
+                continue
             
-            db.ngos.update_one(
-                {'_id': ObjectId(ngo_id)},
-                {'$set': stats}
-            )
-            return True
-        except:
-            return False
+            fixed = {field: counts[field] for field in NGO.COUNTERS}
+            fixed['success_rate'] = NGO._success_rate(fixed['completed'], fixed['total_claimed'])
+            # Only if no claim changed since stats was read
+            query = {'_id': ngo_id}
+            query.update({f'performance_stats.{field}': stats.get(field) for field in NGO.COUNTERS})
+            result = db.ngos.update_one(query, {'$set': {f'performance_stats.{k}': v for k, v in fixed.items()}})
+            if result.modified_count:
+                drift[str(ngo_id)] = diff
+        return drift
+    
+    @staticmethod
+    def _counts(issue):
+        """Counter contributions of one claimed issue."""
+        return {
+            'total_claimed': 1,
+            'active': 1 if issue.get('status') == 'in_progress' else 0,
+            'completed': 1 if issue.get('status') == 'solved' and issue.get('solution_verified') else 0
+        }
+    
+    @staticmethod
+    def _stats_pipeline(counts):
+        """Update pipeline adding counts to the counters and recomputing success_rate."""
+        added = {
+            f'performance_stats.{field}': {'$add': [{'$ifNull': [f'$performance_stats.{field}', 0]}, n]}
+            for field, n in counts.items()
+        }
+        rate = {'$cond': [
+            {'$gt': ['$performance_stats.total_claimed', 0]},
+            {'$round': [{'$multiply': [
+                {'$divide': ['$performance_stats.completed', '$performance_stats.total_claimed']}, 100
+            ]}, 2]},
+            0
+        ]}
+        return [{'$set': added}, {'$set': {'performance_stats.success_rate': rate}}]
+    
+    @staticmethod
+    def _success_rate(completed, total_claimed):
+        return round(completed / total_claimed * 100, 2) if total_claimed > 0 else 0
     
     @staticmethod
     def delete(ngo_id):
@@ -133,7 +226,7 @@ class NGO:
             return None
         
         return {
-            'id': str(ngo['_id']),
+            'id': ngo['_id'],
             'name': ngo['name'],
             'registration_number': ngo.get('registration_number'),
             'description': ngo.get('description'),
@@ -141,10 +234,10 @@ class NGO:
             'contact_phone': ngo.get('contact_phone'),
             'website': ngo.get('website'),
             'areas_of_work': ngo.get('areas_of_work', []),
-            'admin_users': [str(u) for u in ngo.get('admin_users', [])],
+            'admin_users': ngo.get('admin_users', []),
             'verified': ngo.get('verified', False),
-            'approved_by': str(ngo['approved_by']) if ngo.get('approved_by') else None,
-            'approved_at': ngo['approved_at'].isoformat() if ngo.get('approved_at') else None,
+            'approved_by': ngo.get('approved_by'),
+            'approved_at': ngo.get('approved_at'),
             'performance_stats': ngo.get('performance_stats', {}),
-            'created_at': ngo['created_at'].isoformat()
+            'created_at': ngo['created_at']
         }
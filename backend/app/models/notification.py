@@ -1,12 +1,26 @@
 """
 Notification model and helper functions.
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument
 from app import db
+from app.utils.pagination import keyset_filter
 
 class Notification:
-    """Notification model for user alerts."""
+    """
+    Notification model for user alerts.
+    
+    Each user carries a denormalized unread_notifications count. Every write
+    that creates, reads or deletes an unread notification adjusts it with an
+    atomic $inc, so the badge is a point read (see count_unread).
+    
+    Read notifications expire NOTIFICATION_READ_TTL_DAYS after read_at (a
+    partial TTL index), so only unread and recently read ones are kept.
+    """
+    
+    # Newest-first order with _id as tie-breaker, used by keyset pagination
+    FEED_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
     
     TYPES = [
         'issue_verified',
@@ -33,8 +47,50 @@ class Notification:
         
         result = db.notifications.insert_one(notification_data)
         notification_data['_id'] = result.inserted_id
+        Notification._adjust_unread(user_id, 1)
         return notification_data
     
+    @staticmethod
+    def digest(user_id, notification_type, title, message, issue_id=None, window=3600):
+        """
+        Fold a notification into the user's open digest of the same type and
+        issue, or start one. A digest stays open for window seconds from its
+        first notification. Each update replaces the digest with a new, unread
+        document (new _id and created_at, so it moves to the top of the feed)
+        carrying the new text, the bumped count and replaces: the old _id.
+        Existing documents never change position, so feed cursors stay valid.
+        Returns (notification, added), where added is True when the user has
+        one more unread notification than before.
+        """
+        now = datetime.utcnow()
+        key = {
+            'user_id': ObjectId(user_id),
+            'type': notification_type,
+            'issue_id': ObjectId(issue_id) if issue_id else None
+        }
+        before = db.notifications.find_one_and_delete(
+            dict(key, digest_until={'$gt': now}), sort=[('digest_until', DESCENDING)]
+        )
+        
+        notification = dict(
+            key,
+            title=title,
+            message=message,
+            read=False,
+            count=before.get('count', 1) + 1 if before else 1,
+            created_at=now,
+            digest_until=before['digest_until'] if before else now + timedelta(seconds=window)
+        )
+        if before:
+            notification['replaces'] = before['_id']
+        notification['_id'] = db.notifications.insert_one(notification).inserted_id
+        
+        # Only a new digest, or a read one that is reopened, adds to the count
+        added = before is None or before.get('read', False)
+        if added:
+            Notification._adjust_unread(user_id, 1)
+        return notification, added
+    
     @staticmethod
     def get_user_notifications(user_id, skip=0, limit=20, unread_only=False):
         """Get user notifications."""
@@ -48,28 +104,58 @@ class Notification:
         except:
             return []
     
+    @staticmethod
+    def get_after(user_id, after=None, limit=20, unread_only=False):
+        """Get a newest-first page of a user's notifications following a (created_at, _id) position."""
+        query = {'user_id': ObjectId(user_id)}
+        if unread_only:
+            query['read'] = False
+        cursor = db.notifications.find(keyset_filter(query, after)).sort(Notification.FEED_SORT).limit(limit)
+        return [Notification.to_dict(notif) for notif in cursor]
+    
     @staticmethod
     def count_unread(user_id):
-        """Count unread notifications for a user."""
+        """Count unread notifications for a user (a point read of the user's counter)."""
         try:
-            return db.notifications.count_documents({
-                'user_id': ObjectId(user_id),
-                'read': False
-            })
+            user = db.users.find_one({'_id': ObjectId(user_id)}, {'unread_notifications': 1})
         except:
             return 0
+        if not user:
+            return 0
+        if 'unread_notifications' not in user:
+            return Notification.recount_unread(user_id)
+        return max(user['unread_notifications'], 0)
     
     @staticmethod
-    def mark_as_read(notification_id):
-        """Mark notification as read."""
+    def recount_unread(user_id):
+        """Recount a user's unread notifications and store the result as the counter."""
+        unread = db.notifications.count_documents({'user_id': ObjectId(user_id), 'read': False})
+        db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'unread_notifications': unread}})
+        return unread
+    
+    @staticmethod
+    def mark_as_read(notification_id, user_id=None):
+        """
+        Mark notification as read (only the user's own when user_id is given).
+        Returns False if there is no such notification.
+        """
         try:
-            result = db.notifications.update_one(
-                {'_id': ObjectId(notification_id)},
-                {'$set': {'read': True}}
-            )
-            return result.modified_count > 0
+            query = {'_id': ObjectId(notification_id)}
+            if user_id:
+                query['user_id'] = ObjectId(user_id)
         except:
             return False
+        
+        notification = db.notifications.find_one_and_update(
+            dict(query, read=False),
+            {'$set': {'read': True, 'read_at': datetime.utcnow()}},
+            projection={'user_id': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if notification:
+            Notification._adjust_unread(notification['user_id'], -1)
+            return True
+        return db.notifications.count_documents(query, limit=1) > 0  # Already read
     
     @staticmethod
     def mark_all_as_read(user_id):
@@ -77,21 +163,62 @@ class Notification:
         try:
             result = db.notifications.update_many(
                 {'user_id': ObjectId(user_id), 'read': False},
-                {'$set': {'read': True}}
+                {'$set': {'read': True, 'read_at': datetime.utcnow()}}
             )
+            Notification._adjust_unread(user_id, -result.modified_count)
             return result.modified_count
         except:
             return 0
     
     @staticmethod
-    def delete(notification_id):
-        """Delete a notification."""
+    def delete(notification_id, user_id=None):
+        """Delete a notification (only the user's own when user_id is given)."""
         try:
-            result = db.notifications.delete_one({'_id': ObjectId(notification_id)})
-            return result.deleted_count > 0
+            query = {'_id': ObjectId(notification_id)}
+            if user_id:
+                query['user_id'] = ObjectId(user_id)
+            notification = db.notifications.find_one_and_delete(query, projection={'user_id': 1, 'read': 1})
+            if notification and not notification.get('read'):
+                Notification._adjust_unread(notification['user_id'], -1)
+            return notification is not None
         except:
             return False
     
+    @staticmethod
+    def backfill_unread_counts():
+        """Set unread_notifications on users that do not have it yet. Returns the number updated."""
+        unread = {
+            row['_id']: row['n'] for row in db.notifications.aggregate([
+                {'$match': {'read': False}},
+                {'$group': {'_id': '$user_id', 'n': {'$sum': 1}}}
+            ])
+        }
+        
+        updated = 0
+        for user in db.users.find({'unread_notifications': {'$exists': False}}, {'_id': 1}):
+            # Notifications created since the aggregation $inc the counter
+            # into existence; only set it where it is still missing
+            result = db.users.update_one(
+                {'_id': user['_id'], 'unread_notifications': {'$exists': False}},
+                {'$set': {'unread_notifications': unread.get(user['_id'], 0)}}
+            )
+            updated += result.modified_count
+        return updated
+    
+    @staticmethod
+    def backfill_read_at():
+        """Set read_at on read notifications that lack it, so the retention TTL applies to them."""
+        result = db.notifications.update_many(
+            {'read': True, 'read_at': {'$exists': False}},
+            {'$set': {'read_at': datetime.utcnow()}}
+        )
+        return result.modified_count
+    
+    @staticmethod
+    def _adjust_unread(user_id, delta):
+        if delta:
+            db.users.update_one({'_id': ObjectId(user_id)}, {'$inc': {'unread_notifications': delta}})
+    
     @staticmethod
     def to_dict(notification):
         """Convert notification document to dictionary."""
@@ -99,12 +226,14 @@ class Notification:
             return None
         
         return {
-            'id': str(notification['_id']),
-            'user_id': str(notification['user_id']),
+            'id': notification['_id'],
+            'user_id': notification['user_id'],
             'type': notification['type'],
             'title': notification['title'],
             'message': notification['message'],
-            'issue_id': str(notification['issue_id']) if notification.get('issue_id') else None,
+            'issue_id': notification.get('issue_id'),
             'read': notification.get('read', False),
-            'created_at': notification['created_at'].isoformat()
+            'count': notification.get('count', 1),
+            'replaces': notification.get('replaces'),
+            'created_at': notification['created_at']
         }
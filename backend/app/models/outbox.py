@@ -0,0 +1,105 @@
+"""
+Outbox model and helper functions.
+
+Side effects of an issue change (notifications, stats) are recorded as events
+embedded in the issue's `outbox` array by the same update that makes the
+change, so they are written atomically without a transaction. The outbox
+dispatcher (see OutboxDispatcher) claims due events, runs their handlers and
+removes them.
+"""
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app import db
+
+class Outbox:
+    """Outbox events embedded in issue documents."""
+    
+    TYPES = [
+        'issue_created',
+        'issue_verified',
+        'government_responded',
+        'ngo_claimed',
+        'status_changed',
+        'issue_closed',
+        'stats_changed'
+    ]
+    
+    # Issue fields handed to event handlers along with the event
+    CONTEXT_FIELDS = [
+        'user_id', 'tagged_ministries', 'government_response', 'ngo_claim',
+        'category', 'location.district', 'created_at', 'first_responded_at', 'resolved_at'
+    ]
+    
+    @staticmethod
+    def event(event_type, **payload):
+        """Build an outbox event, due immediately."""
+        now = datetime.utcnow()
+        return {
+            'id': ObjectId(),
+            'type': event_type,
+            'payload': payload,
+            'attempts': 0,
+            'created_at': now,
+            'next_attempt_at': now
+        }
+    
+    @staticmethod
+    def claim(lease_seconds):
+        """
+        Claim one due event by pushing its next attempt past the lease, so other
+        workers skip it. An event whose worker dies becomes due again when the
+        lease expires. Returns (issue, event) or None when nothing is due.
+        """
+        now = datetime.utcnow()
+        projection = {field: 1 for field in Outbox.CONTEXT_FIELDS}
+        projection['outbox'] = 1
+        
+        issue = db.issues.find_one_and_update(
+            {'outbox': {'$elemMatch': {'next_attempt_at': {'$lte': now}}}},
+            {
+                '$set': {'outbox.$.next_attempt_at': now + timedelta(seconds=lease_seconds)},
+                '$inc': {'outbox.$.attempts': 1}
+            },
+            projection=projection,
+            return_document=ReturnDocument.BEFORE
+        )
+        if not issue:
+            return None
+        
+        # The positional update changed the first due event
+        event = next(e for e in issue.pop('outbox') if e['next_attempt_at'] <= now)
+        event['attempts'] += 1
+        return issue, event
+    
+    @staticmethod
+    def ack(issue_id, event_id):
+        """Remove a handled event."""
+        db.issues.update_one({'_id': issue_id}, {'$pull': {'outbox': {'id': event_id}}})
+    
+    @staticmethod
+    def retry(issue_id, event_id, delay_seconds, error):
+        """Schedule another attempt of a failed event."""
+        db.issues.update_one(
+            {'_id': issue_id, 'outbox.id': event_id},
+            {'$set': {
+                'outbox.$.next_attempt_at': datetime.utcnow() + timedelta(seconds=delay_seconds),
+                'outbox.$.last_error': error
+            }}
+        )
+    
+    @staticmethod
+    def dead_letter(issue_id, event, error):
+        """Move an event that keeps failing to the outbox_dead collection."""
+        db.outbox_dead.insert_one(dict(event, issue_id=issue_id, last_error=error, failed_at=datetime.utcnow()))
+        Outbox.ack(issue_id, event['id'])
+    
+    @staticmethod
+    def oldest_pending():
+        """Get the creation time of the oldest event still in an outbox, or None."""
+        result = list(db.issues.aggregate([
+            {'$match': {'outbox.next_attempt_at': {'$exists': True}}},
+            {'$unwind': '$outbox'},
+            {'$group': {'_id': None, 'oldest': {'$min': '$outbox.created_at'}}}
+        ]))
+        return result[0]['oldest'] if result else None
@@ -3,8 +3,10 @@ User model and helper functions.
 """
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.utils.pagination import facet_page
 
 class User:
     """User model for all user types (Citizen, Government, NGO, Admin)."""
@@ -28,7 +30,8 @@ class User:
             'ngo_id': data.get('ngo_id'),
             'created_at': datetime.utcnow(),
             'last_login': None,
-            'status': 'active'
+            'status': 'active',
+            'unread_notifications': 0
         }
         
         result = db.users.insert_one(user_data)
@@ -81,6 +84,29 @@ class User:
         except:
             pass
     
+    @staticmethod
+    def add_push_token(user_id, token, limit=10):
+        """Register a device token for push notifications, keeping the user's limit most recent ones."""
+        try:
+            # Move a known token to the end, so the oldest devices are the ones dropped
+            db.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'fcm_tokens': token}})
+            db.users.update_one(
+                {'_id': ObjectId(user_id)},
+                {'$push': {'fcm_tokens': {'$each': [token], '$slice': -limit}}}
+            )
+            return True
+        except:
+            return False
+    
+    @staticmethod
+    def remove_push_token(user_id, token):
+        """Unregister a device token."""
+        try:
+            result = db.users.update_one({'_id': ObjectId(user_id)}, {'$pull': {'fcm_tokens': token}})
+            return result.modified_count > 0
+        except:
+            return False
+    
     @staticmethod
     def to_dict(user):
         """Convert user document to dictionary (without password)."""
@@ -88,7 +114,7 @@ class User:
             return None
         
         return {
-            'id': str(user['_id']),
+            'id': user['_id'],
             'email': user['email'],
             'full_name': user['full_name'],
             'phone': user.get('phone'),
@@ -96,9 +122,9 @@ class User:
             'profile_pic': user.get('profile_pic'),
             'location': user.get('location', {}),
             'verified': user.get('verified', False),
-            'ministry_id': str(user['ministry_id']) if user.get('ministry_id') else None,
-            'ngo_id': str(user['ngo_id']) if user.get('ngo_id') else None,
-            'created_at': user['created_at'].isoformat() if user.get('created_at') else None,
+            'ministry_id': user.get('ministry_id'),
+            'ngo_id': user.get('ngo_id'),
+            'created_at': user.get('created_at'),
             'status': user.get('status', 'active')
         }
     
@@ -109,6 +135,14 @@ class User:
         cursor = db.users.find(query).skip(skip).limit(limit)
         return [User.to_dict(user) for user in cursor]
     
+    @staticmethod
+    def page(filters=None, skip=0, limit=20, total_cap=None):
+        """Get a page of users with the total in one query. Returns (users, total, capped)."""
+        docs, total, capped = facet_page(
+            db.users, filters or {}, [('_id', ASCENDING)], skip, limit, total_cap=total_cap
+        )
+        return [User.to_dict(user) for user in docs], total, capped
+    
     @staticmethod
     def count(filters=None):
         """Count users with optional filters."""
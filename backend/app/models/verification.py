@@ -0,0 +1,86 @@
+"""
+Verification model and helper functions.
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app import db
+
+class VerificationConflict(Exception):
+    """A verification toggle kept losing races with the same user's other taps."""
+
+class Verification:
+    """
+    Community verification of an issue: one document per (issue, user),
+    kept unique by index. The issue carries a denormalized verification_count.
+    """
+    
+    @staticmethod
+    def add(issue_id, user_id):
+        """Record a verification. Returns False if the user had already verified the issue."""
+        try:
+            db.verifications.insert_one({
+                'issue_id': ObjectId(issue_id),
+                'user_id': ObjectId(user_id),
+                'created_at': datetime.utcnow()
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    @staticmethod
+    def add_many(issue_id, user_ids, created_at=None):
+        """Record verifications from several users, skipping ones that already exist."""
+        if not user_ids:
+            return 0
+        created_at = created_at or datetime.utcnow()
+        docs = [
+            {'issue_id': ObjectId(issue_id), 'user_id': ObjectId(u), 'created_at': created_at}
+            for u in user_ids
+        ]
+        try:
+            return len(db.verifications.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+            return e.details['nInserted']
+    
+    @staticmethod
+    def remove(issue_id, user_id):
+        """Delete a verification. Returns False if there was none."""
+        result = db.verifications.delete_one({
+            'issue_id': ObjectId(issue_id),
+            'user_id': ObjectId(user_id)
+        })
+        return result.deleted_count > 0
+    
+    @staticmethod
+    def exists(issue_id, user_id):
+        """Check whether a user has verified an issue."""
+        try:
+            return db.verifications.count_documents(
+                {'issue_id': ObjectId(issue_id), 'user_id': ObjectId(user_id)}, limit=1
+            ) > 0
+        except:
+            return False
+    
+    @staticmethod
+    def verified_ids(user_id, issue_ids):
+        """Get the subset of issue_ids the user has verified, in one query."""
+        if not user_id or not issue_ids:
+            return set()
+        cursor = db.verifications.find(
+            {'user_id': ObjectId(user_id), 'issue_id': {'$in': list(issue_ids)}},
+            {'issue_id': 1, '_id': 0}
+        )
+        return {doc['issue_id'] for doc in cursor}
+    
+    @staticmethod
+    def count_for_issue(issue_id):
+        """Count verifications of an issue."""
+        return db.verifications.count_documents({'issue_id': ObjectId(issue_id)})
+    
+    @staticmethod
+    def delete_for_issue(issue_id):
+        """Delete all verifications of an issue."""
+        db.verifications.delete_many({'issue_id': ObjectId(issue_id)})
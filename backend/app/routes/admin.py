@@ -1,14 +1,16 @@
 """
 Admin routes - User management, issue moderation, NGO approval, crisis management.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.issue import Issue
 from app.models.ministry import Ministry
 from app.models.ngo import NGO
+from app.models.leaderboard import Leaderboard
 from app.utils.decorators import role_required
 from app.utils.validators import validate_required_fields
+from app.services.autocomplete_service import AutocompleteService
 
 bp = Blueprint('admin', __name__)
 
@@ -77,8 +79,7 @@ def get_users():
     if role:
         filters['role'] = role
     
-    users = User.get_all(filters, skip, limit)
-    total = User.count(filters)
+    users, total, capped = User.page(filters, skip, limit, current_app.config['PAGE_TOTAL_CAP'])
     
     return jsonify({
         'users': users,
@@ -86,7 +87,8 @@ def get_users():
             'page': page,
             'limit': limit,
             'total': total,
-            'pages': (total + limit - 1) // limit
+            'pages': (total + limit - 1) // limit,
+            'total_capped': capped
         }
     }), 200
 
@@ -127,6 +129,7 @@ def delete_issue(issue_id):
     success = Issue.delete(issue_id)
     
     if success:
+        AutocompleteService.remove_issue(issue['_id'])
         return jsonify({'message': 'Issue deleted successfully'}), 200
     else:
         return jsonify({'error': 'Delete failed'}), 500
@@ -142,8 +145,7 @@ def get_pending_ngos():
     
     filters = {'verified': False}
     
-    ngos = NGO.get_all(filters, skip, limit)
-    total = NGO.count(filters)
+    ngos, total, capped = NGO.page(filters, skip, limit, current_app.config['PAGE_TOTAL_CAP'])
     
     return jsonify({
         'ngos': ngos,
@@ -151,7 +153,8 @@ def get_pending_ngos():
             'page': page,
             'limit': limit,
             'total': total,
-            'pages': (total + limit - 1) // limit
+            'pages': (total + limit - 1) // limit,
+            'total_capped': capped
         }
     }), 200
 
@@ -172,6 +175,8 @@ def approve_ngo(ngo_id):
     success = NGO.approve(ngo_id, user_id)
     
     if success:
+        Leaderboard.refresh('ngo', [ngo_id])
+        
         # Notify NGO admin users
         from app.services.notification_service import NotificationService
         for admin_user_id in ngo.get('admin_users', []):
@@ -202,6 +207,7 @@ def delete_ngo(ngo_id):
     success = NGO.delete(ngo_id)
     
     if success:
+        Leaderboard.refresh('ngo', [ngo_id])
         return jsonify({'message': 'NGO deleted successfully'}), 200
     else:
         return jsonify({'error': 'Delete failed'}), 500
@@ -280,6 +286,7 @@ def delete_ministry(ministry_id):
     success = Ministry.delete(ministry_id)
     
     if success:
+        Leaderboard.refresh('ministry', [ministry_id])
         return jsonify({'message': 'Ministry deleted successfully'}), 200
     else:
         return jsonify({'error': 'Delete failed'}), 500
@@ -301,7 +308,7 @@ def activate_crisis_mode():
     result = db.issues.update_many(
         {
             'location.district': {'$in': data['affected_districts']},
-            'status': {'$in': ['pending', 'verified', 'in_progress']}
+            'status': {'$in': Issue.OPEN_STATUSES}
         },
         {'$set': {'is_crisis': True, 'priority': 'critical'}}
     )
@@ -6,8 +6,11 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.issue import Issue
 from app.models.ministry import Ministry
+from app.models.latency import LatencyStats
 from app.utils.decorators import role_required
-from app.services.notification_service import NotificationService
+from app.utils.pagination import issue_list_response
+from app.models.outbox import Outbox
+from app.services.event_bus import EventBus
 
 bp = Blueprint('government', __name__)
 
@@ -23,33 +26,19 @@ def get_dashboard():
         return jsonify({'error': 'Ministry not assigned'}), 403
     
     ministry_id = str(user['ministry_id'])
-    from bson import ObjectId
     
-    # Get ministry stats
+    # Counters kept on the ministry by the outbox dispatcher (see Issue.sync_stats)
     ministry = Ministry.find_by_id(ministry_id)
-    
-    # Get tagged issues count
-    total_issues = Issue.count({'tagged_ministries': ObjectId(ministry_id)})
-    pending_issues = Issue.count({
-        'tagged_ministries': ObjectId(ministry_id),
-        'status': {'$in': ['pending', 'verified']}
-    })
-    in_progress_issues = Issue.count({
-        'tagged_ministries': ObjectId(ministry_id),
-        'status': 'in_progress'
-    })
-    solved_issues = Issue.count({
-        'tagged_ministries': ObjectId(ministry_id),
-        'status': 'solved'
-    })
+    stats = ministry.get('performance_stats', {}) if ministry else {}
+    by_status = stats.get('by_status', {})
     
     return jsonify({
         'ministry': Ministry.to_dict(ministry) if ministry else None,
         'stats': {
-            'total_issues': total_issues,
-            'pending': pending_issues,
-            'in_progress': in_progress_issues,
-            'solved': solved_issues
+            'total_issues': stats.get('total_issues', 0),
+            'pending': by_status.get('pending', 0) + by_status.get('verified', 0),
+            'in_progress': by_status.get('in_progress', 0),
+            'solved': stats.get('solved', 0)
         }
     }), 200
 
@@ -66,9 +55,6 @@ def get_tagged_issues():
     
     ministry_id = str(user['ministry_id'])
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
     status = request.args.get('status')
     
     from bson import ObjectId
@@ -77,18 +63,7 @@ def get_tagged_issues():
     if status:
         filters['status'] = status
     
-    issues = Issue.get_all(filters, skip, limit)
-    total = Issue.count(filters)
-    
-    return jsonify({
-        'issues': issues,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
-    }), 200
+    return issue_list_response(filters)
 
 @bp.route('/issues/<issue_id>/respond', methods=['POST'])
 @jwt_required()
@@ -126,18 +101,11 @@ def respond_to_issue(issue_id):
         data.get('action_taken', '')
     )
     
+    # The owner is notified and ministry stats are updated by the outbox
+    # dispatcher (government_responded and stats_changed events)
     if success:
-        # Notify issue owner
-        NotificationService.notify_government_response(
-            str(issue['user_id']),
-            issue_id,
-            ministry_id
-        )
-        
-        # Update ministry stats
-        Ministry.update_stats(ministry_id)
-        
         updated_issue = Issue.find_by_id(issue_id)
+        EventBus.publish_issue(updated_issue)
         return jsonify({
             'message': 'Response added successfully',
             'issue': Issue.to_dict(updated_issue)
@@ -173,18 +141,16 @@ def update_issue_status(issue_id):
     if ObjectId(ministry_id) not in issue.get('tagged_ministries', []):
         return jsonify({'error': 'Issue not tagged to your ministry'}), 403
     
-    # Update status
-    success = Issue.update(issue_id, {'status': data['status']})
+    # Update status (the owner is notified by the outbox dispatcher)
+    success = Issue.update(
+        issue_id,
+        {'status': data['status']},
+        event=Outbox.event('status_changed', status=data['status'])
+    )
     
     if success:
-        # Notify issue owner
-        NotificationService.notify_status_updated(
-            str(issue['user_id']),
-            issue_id,
-            data['status']
-        )
-        
         updated_issue = Issue.find_by_id(issue_id)
+        EventBus.publish_issue(updated_issue)
         return jsonify({
             'message': 'Status updated successfully',
             'issue': Issue.to_dict(updated_issue)
@@ -209,12 +175,18 @@ def get_performance():
     if not ministry:
         return jsonify({'error': 'Ministry not found'}), 404
     
-    # Update stats before returning
-    Ministry.update_stats(ministry_id)
-    
-    # Get updated ministry data
-    ministry = Ministry.find_by_id(ministry_id)
+    # The counters are kept current by issue writes and the latency sketches
+    # by the outbox dispatcher, so this reads a handful of small documents
+    ministry_dict = Ministry.to_dict(ministry)
+    times = {}
+    for metric in LatencyStats.METRICS:
+        times[metric] = LatencyStats.summary(metric, ministry['_id'])
+        times[metric]['by_district'] = LatencyStats.breakdown(metric, 'district', ministry['_id'])
+        times[metric]['by_category'] = LatencyStats.breakdown(metric, 'category', ministry['_id'])
+    ministry_dict['performance_stats']['avg_response_time'] = times['response']['mean']
     
     return jsonify({
-        'ministry': Ministry.to_dict(ministry)
+        'ministry': ministry_dict,
+        'response_time': times['response'],
+        'resolution_time': times['resolution']
     }), 200
@@ -1,23 +1,24 @@
 """
 Issue routes - Create, read, update, verify issues.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.issue import Issue
 from app.models.user import User
+from app.models.outbox import Outbox
+from app.models.verification import VerificationConflict
 from app.utils.validators import validate_required_fields
+from app.utils.pagination import issue_list_response, get_viewer_id
 from app.services.tagging_service import TaggingService
-from app.services.notification_service import NotificationService
+from app.services.autocomplete_service import AutocompleteService
+from app.services.duplicate_service import DuplicateService
+from app.services.counter_buffer import CounterBuffer
+from app.services.event_bus import EventBus
 
 bp = Blueprint('issues', __name__)
 
-@bp.route('', methods=['POST'])
-@jwt_required()
-def create_issue():
-    """Create a new issue."""
-    user_id = get_jwt_identity()
-    data = request.get_json()
-    
+def _validate_report(data):
+    """Check the fields of a new report. Returns an error response, or None."""
     # Validate required fields
     required_fields = ['title', 'description', 'category', 'location']
     is_valid, message = validate_required_fields(data, required_fields)
@@ -29,35 +30,78 @@ def create_issue():
     is_valid, message = validate_required_fields(data['location'], location_fields)
     if not is_valid:
         return jsonify({'error': f'Location {message}'}), 400
+    return None
+
+@bp.route('/duplicates', methods=['POST'])
+@jwt_required()
+def check_duplicates():
+    """Find issues a report about to be submitted may duplicate (body: the report)."""
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    error = _validate_report(data)
+    if error:
+        return error
+    
+    return jsonify({'possible_duplicates': DuplicateService.check(data, user_id)}), 200
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def create_issue():
+    """Create a new issue, or add the report to an existing one (duplicate_of)."""
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    # The reporter confirmed that an existing issue is the same problem
+    if data and data.get('duplicate_of'):
+        return _merge_duplicate(data['duplicate_of'], user_id, data.get('category'))
     
-    # Auto-tag ministries based on category
-    tagged_ministries = TaggingService.tag_ministries_by_category(data['category'])
-    data['tagged_ministries'] = tagged_ministries
+    error = _validate_report(data)
+    if error:
+        return error
     
-    # Create issue
     try:
+        # Shown to the reporter alongside the new issue, so they can add
+        # their report to one of them instead
+        suggestions = DuplicateService.check(data, user_id)
+        
+        # Auto-tag ministries based on category
+        tagged_ministries = TaggingService.tag_ministries_by_category(data['category'])
+        data['tagged_ministries'] = tagged_ministries
+        
+        # Create issue
         issue = Issue.create(data, user_id)
         issue_dict = Issue.to_dict(issue)
-        
-        # Notify tagged ministries
-        for ministry_id in tagged_ministries:
-            NotificationService.notify_ministry_tagged(ministry_id, str(issue['_id']))
+        AutocompleteService.add_issue(issue)
         
         return jsonify({
             'message': 'Issue created successfully',
-            'issue': issue_dict
+            'issue': issue_dict,
+            'possible_duplicates': suggestions
         }), 201
     except Exception as e:
         return jsonify({'error': f'Failed to create issue: {str(e)}'}), 500
 
+def _merge_duplicate(issue_id, user_id, category=None):
+    """Count a duplicate report as a verification of the existing issue."""
+    issue, _ = Issue.merge_report(
+        issue_id, user_id, current_app.config['MIN_VERIFICATION_COUNT'], category
+    )
+    if not issue:
+        if not Issue.find_by_id(issue_id):
+            return jsonify({'error': 'Issue not found'}), 404
+        return jsonify({'error': 'Reports can only be added to an open issue of the same category'}), 409
+    
+    return jsonify({
+        'message': 'Your report was added to the existing issue',
+        'merged': True,
+        'duplicate_of': issue['_id'],
+        'issue': Issue.to_dict(issue)
+    }), 200
+
 @bp.route('', methods=['GET'])
 def get_issues():
     """Get all issues (public feed)."""
-    # Query parameters
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
     category = request.args.get('category')
     district = request.args.get('district')
     status = request.args.get('status')
@@ -77,27 +121,7 @@ def get_issues():
     if is_crisis:
         filters['is_crisis'] = is_crisis.lower() == 'true'
     
-    # Nearby search
-    lat = request.args.get('lat')
-    lng = request.args.get('lng')
-    radius = request.args.get('radius', 5)
-    
-    if lat and lng:
-        issues = Issue.search_nearby(lat, lng, float(radius), filters)
-        total = len(issues)
-    else:
-        issues = Issue.get_all(filters, skip, limit)
-        total = Issue.count(filters)
-    
-    return jsonify({
-        'issues': issues,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
-    }), 200
+    return issue_list_response(filters)
 
 @bp.route('/<issue_id>', methods=['GET'])
 def get_issue(issue_id):
@@ -109,11 +133,15 @@ def get_issue(issue_id):
     
     issue_dict = Issue.to_dict(issue)
     
+    viewer_id = get_viewer_id()
+    if viewer_id:
+        issue_dict['verified_by_me'] = Issue.is_verified_by(issue, viewer_id)
+    
     # Get user details
     user = User.find_by_id(issue_dict['user_id'])
     if user:
         issue_dict['user'] = {
-            'id': str(user['_id']),
+            'id': user['_id'],
             'full_name': user['full_name'],
             'profile_pic': user.get('profile_pic')
         }
@@ -174,6 +202,7 @@ def delete_issue(issue_id):
     success = Issue.delete(issue_id)
     
     if success:
+        AutocompleteService.remove_issue(issue['_id'])
         return jsonify({'message': 'Issue deleted successfully'}), 200
     else:
         return jsonify({'error': 'Delete failed'}), 500
@@ -184,41 +213,26 @@ def verify_issue(issue_id):
     """Verify/upvote an issue (community verification)."""
     user_id = get_jwt_identity()
     
-    # Find issue
-    issue = Issue.find_by_id(issue_id)
+    # Toggle, recount and promote in a single atomic update (or buffer the
+    # count change when write-behind counters are enabled)
+    try:
+        issue, added, _ = Issue.toggle_verification(
+            issue_id, user_id, current_app.config['MIN_VERIFICATION_COUNT'],
+            buffer=CounterBuffer if CounterBuffer.enabled else None
+        )
+    except VerificationConflict:
+        return jsonify({'error': 'Verification changed concurrently, please retry'}), 409
     if not issue:
         return jsonify({'error': 'Issue not found'}), 404
     
-    # Check if already verified by this user
-    from bson import ObjectId
-    if ObjectId(user_id) in issue.get('verified_by', []):
-        # Remove verification
-        success = Issue.remove_verification(issue_id, user_id)
-        action = 'removed'
-    else:
-        # Add verification
-        success = Issue.add_verification(issue_id, user_id)
-        action = 'added'
-        
-        # Check if issue should be marked as verified
-        updated_issue = Issue.find_by_id(issue_id)
-        if updated_issue['verification_count'] >= 3 and updated_issue['status'] == 'pending':
-            Issue.update(issue_id, {'status': 'verified'})
-            
-            # Notify issue owner
-            NotificationService.notify_issue_verified(
-                str(issue['user_id']),
-                issue_id
-            )
+    EventBus.publish_issue(issue)
+    issue_dict = Issue.to_dict(issue)
+    issue_dict['verified_by_me'] = added
     
-    if success:
-        updated_issue = Issue.find_by_id(issue_id)
-        return jsonify({
-            'message': f'Verification {action} successfully',
-            'issue': Issue.to_dict(updated_issue)
-        }), 200
-    else:
-        return jsonify({'error': 'Verification failed'}), 500
+    return jsonify({
+        'message': f'Verification {"added" if added else "removed"} successfully',
+        'issue': issue_dict
+    }), 200
 
 @bp.route('/<issue_id>/close', methods=['POST'])
 @jwt_required()
@@ -243,20 +257,13 @@ def close_issue(issue_id):
         'verified_at': datetime.utcnow()
     }
     
-    success = Issue.update(issue_id, update_data)
+    # The status change records a stats_changed event: ministry and NGO
+    # stats are updated by the outbox dispatcher (see Issue.sync_stats)
+    success = Issue.update(issue_id, update_data, event=Outbox.event('issue_closed'))
     
     if success:
-        # Update ministry/NGO stats
-        if issue.get('government_response'):
-            from app.models.ministry import Ministry
-            for ministry_id in issue.get('tagged_ministries', []):
-                Ministry.update_stats(str(ministry_id))
-        
-        if issue.get('ngo_claim'):
-            from app.models.ngo import NGO
-            NGO.update_stats(str(issue['ngo_claim']['ngo_id']))
-        
         updated_issue = Issue.find_by_id(issue_id)
+        EventBus.publish_issue(updated_issue)
         return jsonify({
             'message': 'Issue closed successfully',
             'issue': Issue.to_dict(updated_issue)
@@ -270,22 +277,7 @@ def get_my_issues():
     """Get current user's issues."""
     user_id = get_jwt_identity()
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
     from bson import ObjectId
     filters = {'user_id': ObjectId(user_id)}
     
-    issues = Issue.get_all(filters, skip, limit)
-    total = Issue.count(filters)
-    
-    return jsonify({
-        'issues': issues,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
-    }), 200
+    return issue_list_response(filters)
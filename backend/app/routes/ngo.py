@@ -1,14 +1,16 @@
 """
 NGO routes - Register, claim issues, update actions.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.issue import Issue
 from app.models.ngo import NGO
 from app.utils.decorators import role_required
 from app.utils.validators import validate_required_fields
-from app.services.notification_service import NotificationService
+from app.utils.pagination import issue_list_response
+from app.services.event_bus import EventBus
+from app.utils.cache import conditional_json
 
 bp = Blueprint('ngo', __name__)
 
@@ -75,29 +77,17 @@ def get_dashboard():
         return jsonify({'error': 'NGO not assigned'}), 403
     
     ngo_id = str(user['ngo_id'])
-    from bson import ObjectId
     
-    # Get NGO
+    # Counters kept on the NGO by the outbox dispatcher (see Issue.sync_stats)
     ngo = NGO.find_by_id(ngo_id)
-    
-    # Get claimed issues count
-    total_claimed = Issue.count({'ngo_claim.ngo_id': ObjectId(ngo_id)})
-    active_claims = Issue.count({
-        'ngo_claim.ngo_id': ObjectId(ngo_id),
-        'status': 'in_progress'
-    })
-    completed = Issue.count({
-        'ngo_claim.ngo_id': ObjectId(ngo_id),
-        'status': 'solved',
-        'solution_verified': True
-    })
+    stats = ngo.get('performance_stats', {}) if ngo else {}
     
     return jsonify({
         'ngo': NGO.to_dict(ngo) if ngo else None,
         'stats': {
-            'total_claimed': total_claimed,
-            'active': active_claims,
-            'completed': completed
+            'total_claimed': stats.get('total_claimed', 0),
+            'active': stats.get('active', 0),
+            'completed': stats.get('completed', 0)
         }
     }), 200
 
@@ -116,10 +106,6 @@ def get_available_issues():
     if not ngo or not ngo.get('verified'):
         return jsonify({'error': 'NGO not verified'}), 403
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
     # Get issues that are not claimed and match NGO's areas of work
     filters = {
         'ngo_claim': None,
@@ -130,18 +116,7 @@ def get_available_issues():
     if ngo.get('areas_of_work'):
         filters['category'] = {'$in': ngo['areas_of_work']}
     
-    issues = Issue.get_all(filters, skip, limit)
-    total = Issue.count(filters)
-    
-    return jsonify({
-        'issues': issues,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
-    }), 200
+    return issue_list_response(filters)
 
 @bp.route('/issues/<issue_id>/claim', methods=['POST'])
 @jwt_required()
@@ -181,18 +156,11 @@ def claim_issue(issue_id):
         data['action_plan']
     )
     
+    # The owner is notified and NGO stats are updated by the outbox
+    # dispatcher (ngo_claimed and stats_changed events)
     if success:
-        # Notify issue owner
-        NotificationService.notify_ngo_claimed(
-            str(issue['user_id']),
-            issue_id,
-            ngo_id
-        )
-        
-        # Update NGO stats
-        NGO.update_stats(ngo_id)
-        
         updated_issue = Issue.find_by_id(issue_id)
+        EventBus.publish_issue(updated_issue)
         return jsonify({
             'message': 'Issue claimed successfully',
             'issue': Issue.to_dict(updated_issue)
@@ -253,25 +221,10 @@ def get_claimed_issues():
     if not user or not user.get('ngo_id'):
         return jsonify({'error': 'NGO not assigned'}), 403
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
     from bson import ObjectId
     filters = {'ngo_claim.ngo_id': ObjectId(str(user['ngo_id']))}
     
-    issues = Issue.get_all(filters, skip, limit)
-    total = Issue.count(filters)
-    
-    return jsonify({
-        'issues': issues,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
-    }), 200
+    return issue_list_response(filters)
 
 @bp.route('/profile/<ngo_id>', methods=['GET'])
 def get_ngo_profile(ngo_id):
@@ -284,8 +237,5 @@ def get_ngo_profile(ngo_id):
     if not ngo.get('verified'):
         return jsonify({'error': 'NGO not verified'}), 403
     
-    # Update stats before returning
-    NGO.update_stats(ngo_id)
-    ngo = NGO.find_by_id(ngo_id)
-    
-    return jsonify({'ngo': NGO.to_dict(ngo)}), 200
+    # Stats are kept current by the outbox dispatcher (see Issue.sync_stats)
+    return conditional_json({'ngo': NGO.to_dict(ngo)}, max_age=current_app.config['NGO_PROFILE_MAX_AGE'])
@@ -0,0 +1,101 @@
+"""
+Notification routes - List, count and mark notifications as read, register push devices.
+"""
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.notification import Notification
+from app.models.user import User
+from app.services.notification_service import NotificationService
+from app.utils.pagination import get_page_args
+
+bp = Blueprint('notifications', __name__)
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_notifications():
+    """Get current user's notifications, newest first (keyset pagination)."""
+    user_id = get_jwt_identity()
+    _, limit, _ = get_page_args()
+    unread_only = request.args.get('unread_only', 'false').lower() == 'true'
+    
+    try:
+        notifications, next_cursor = NotificationService.get_feed(
+            user_id, limit, request.args.get('cursor'), unread_only
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'notifications': notifications,
+        'pagination': {'limit': limit, 'next_cursor': next_cursor}
+    }), 200
+
+@bp.route('/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Get the number of unread notifications (for the badge)."""
+    user_id = get_jwt_identity()
+    return jsonify({'unread_count': NotificationService.count_unread(user_id)}), 200
+
+@bp.route('/<notification_id>/read', methods=['POST'])
+@jwt_required()
+def mark_as_read(notification_id):
+    """Mark a notification as read."""
+    user_id = get_jwt_identity()
+    
+    if not NotificationService.mark_as_read(user_id, notification_id):
+        return jsonify({'error': 'Notification not found'}), 404
+    
+    return jsonify({
+        'message': 'Notification marked as read',
+        'unread_count': NotificationService.count_unread(user_id)
+    }), 200
+
+@bp.route('/read-all', methods=['POST'])
+@jwt_required()
+def mark_all_as_read():
+    """Mark all notifications as read."""
+    user_id = get_jwt_identity()
+    marked = NotificationService.mark_all_as_read(user_id)
+    
+    return jsonify({
+        'message': 'All notifications marked as read',
+        'marked': marked
+    }), 200
+
+@bp.route('/<notification_id>', methods=['DELETE'])
+@jwt_required()
+def delete_notification(notification_id):
+    """Delete a notification."""
+    user_id = get_jwt_identity()
+    
+    if not Notification.delete(notification_id, user_id):
+        return jsonify({'error': 'Notification not found'}), 404
+    
+    return jsonify({'message': 'Notification deleted successfully'}), 200
+
+@bp.route('/push-tokens', methods=['POST'])
+@jwt_required()
+def register_push_token():
+    """Register the FCM token of the current user's device for push notifications."""
+    data = request.get_json(silent=True) or {}
+    token = data.get('token')
+    if not isinstance(token, str) or not token.strip():
+        return jsonify({'error': 'token is required'}), 400
+    
+    if not User.add_push_token(get_jwt_identity(), token.strip(), current_app.config['PUSH_MAX_TOKENS']):
+        return jsonify({'error': 'Registration failed'}), 500
+    
+    return jsonify({'message': 'Push token registered'}), 200
+
+@bp.route('/push-tokens', methods=['DELETE'])
+@jwt_required()
+def unregister_push_token():
+    """Unregister a device token, e.g. on logout."""
+    data = request.get_json(silent=True) or {}
+    token = data.get('token')
+    if not isinstance(token, str) or not token.strip():
+        return jsonify({'error': 'token is required'}), 400
+    
+    User.remove_push_token(get_jwt_identity(), token.strip())
+    return jsonify({'message': 'Push token removed'}), 200
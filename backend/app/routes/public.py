@@ -1,46 +1,61 @@
 """
 Public routes - Leaderboard, statistics, search, categories (no auth required).
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.issue import Issue
 from app.models.ministry import Ministry
 from app.models.ngo import NGO
+from app.models.leaderboard import Leaderboard
+from app.services.autocomplete_service import AutocompleteService
+from app.utils.pagination import get_page_args, get_field_args, issue_list_response
+from app.utils.validators import DISTRICTS
+from app.utils.cache import snapshot_json
 from app import db
 
 bp = Blueprint('public', __name__)
 
 @bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get performance leaderboard (ministries and NGOs)."""
-    # Get all ministries with stats
-    ministries = Ministry.get_all(limit=100)
-    
-    # Sort by solved issues percentage
-    ministry_leaderboard = sorted(
-        ministries,
-        key=lambda m: (m['performance_stats']['solved'] / m['performance_stats']['total_issues'] * 100
-                      if m['performance_stats']['total_issues'] > 0 else 0),
-        reverse=True
-    )[:10]
-    
-    # Get all verified NGOs with stats
-    ngos = NGO.get_all({'verified': True}, limit=100)
-    
-    # Sort by success rate
-    ngo_leaderboard = sorted(
-        ngos,
-        key=lambda n: n['performance_stats']['success_rate'],
-        reverse=True
-    )[:10]
+    """
+    Get the ministry and NGO leaderboards, all time or over the last 30 or
+    7 days (?window=all|30d|7d), top ?limit= of each.
+    """
+    window = request.args.get('window', 'all')
+    if window not in Leaderboard.WINDOWS:
+        return jsonify({'error': 'Invalid window'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['LEADERBOARD_MAX_LIMIT'])
+    
+    return snapshot_json(f'leaderboard:{window}:{limit}', lambda: {
+        'window': window,
+        'ministries': Leaderboard.top('ministry', window, limit),
+        'ngos': Leaderboard.top('ngo', window, limit)
+    }, current_app.config['PUBLIC_SNAPSHOT_TTL'])
+
+@bp.route('/leaderboard/<kind>/<entity_id>', methods=['GET'])
+def get_leaderboard_rank(kind, entity_id):
+    """Get the rank of one ministry or NGO (kind is ministry or ngo) in a leaderboard window."""
+    window = request.args.get('window', 'all')
+    if kind not in Leaderboard.KINDS:
+        return jsonify({'error': 'Invalid kind'}), 400
+    if window not in Leaderboard.WINDOWS:
+        return jsonify({'error': 'Invalid window'}), 400
+    
+    entry = Leaderboard.rank_of(kind, entity_id, window)
+    if not entry:
+        return jsonify({'error': 'Not ranked'}), 404
     
     return jsonify({
-        'ministries': ministry_leaderboard,
-        'ngos': ngo_leaderboard
+        'window': window,
+        'entry': entry,
+        'ranked': Leaderboard.count(kind, window)
     }), 200
 
 @bp.route('/stats', methods=['GET'])
 def get_stats():
-    """Get public platform statistics."""
+    """Get public platform statistics (a snapshot at most PUBLIC_SNAPSHOT_TTL seconds old)."""
+    return snapshot_json('stats', _stats, current_app.config['PUBLIC_SNAPSHOT_TTL'])
+
+def _stats():
     from app.models.user import User
     
     total_issues = Issue.count()
@@ -60,7 +75,7 @@ def get_stats():
         {'$limit': 10}
     ]))
     
-    return jsonify({
+    return {
         'total_issues': total_issues,
         'solved_issues': solved_issues,
         'active_users': active_users,
@@ -68,24 +83,12 @@ def get_stats():
         'resolution_rate': round((solved_issues / total_issues * 100) if total_issues > 0 else 0, 2),
         'by_category': category_distribution,
         'top_districts': district_distribution
-    }), 200
+    }
 
 @bp.route('/districts', methods=['GET'])
 def get_districts():
     """Get list of Sri Lankan districts."""
-    districts = [
-        "Colombo", "Gampaha", "Kalutara",  # Western
-        "Kandy", "Matale", "Nuwara Eliya",  # Central
-        "Galle", "Matara", "Hambantota",  # Southern
-        "Jaffna", "Kilinochchi", "Mannar", "Vavuniya", "Mullaitivu",  # Northern
-        "Batticaloa", "Ampara", "Trincomalee",  # Eastern
-        "Kurunegala", "Puttalam",  # North Western
-        "Anuradhapura", "Polonnaruwa",  # North Central
-        "Badulla", "Monaragala",  # Uva
-        "Ratnapura", "Kegalle"  # Sabaragamuwa
-    ]
-    
-    return jsonify({'districts': sorted(districts)}), 200
+    return jsonify({'districts': sorted(DISTRICTS)}), 200
 
 @bp.route('/categories', methods=['GET'])
 def get_categories():
@@ -104,48 +107,39 @@ def get_categories():
 @bp.route('/ministries', methods=['GET'])
 def get_ministries():
     """Get all ministries (public)."""
-    ministries = Ministry.get_all(limit=100)
-    return jsonify({'ministries': ministries}), 200
+    return snapshot_json(
+        'ministries', lambda: {'ministries': Ministry.get_all(limit=100)}, current_app.config['PUBLIC_SNAPSHOT_TTL']
+    )
 
 @bp.route('/search', methods=['GET'])
 def search_issues():
-    """Search issues by keyword."""
-    query = request.args.get('q', '')
+    """Search issues by keyword, most relevant first."""
+    query = request.args.get('q', '').strip()
     
-    if not query or len(query) < 3:
+    if len(query) < 3:
         return jsonify({'error': 'Search query must be at least 3 characters'}), 400
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
-    # Search in title and description
-    import re
-    regex = re.compile(re.escape(query), re.IGNORECASE)
-    
-    pipeline = [
-        {
-            '$match': {
-                '$or': [
-                    {'title': {'$regex': regex}},
-                    {'description': {'$regex': regex}}
-                ]
-            }
-        },
-        {'$sort': {'created_at': -1}},
-        {'$skip': skip},
-        {'$limit': limit}
-    ]
-    
-    results = list(db.issues.aggregate(pipeline))
-    total = db.issues.count_documents({
-        '$or': [
-            {'title': {'$regex': regex}},
-            {'description': {'$regex': regex}}
-        ]
-    })
-    
-    issues = [Issue.to_dict(issue) for issue in results]
+    page, limit, skip = get_page_args()
+    try:
+        fields, viewer_id = get_field_args(Issue.FIELDS, Issue.CARD_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filters = {}
+    if request.args.get('category'):
+        filters['category'] = request.args['category']
+    if request.args.get('district'):
+        filters['location.district'] = request.args['district']
+    if request.args.get('status'):
+        filters['status'] = request.args['status']
+    
+    try:
+        issues, total, capped = Issue.search(
+            query, filters, skip, limit, fields, viewer_id,
+            current_app.config['PAGE_TOTAL_CAP']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'issues': issues,
@@ -153,26 +147,103 @@ def search_issues():
             'page': page,
             'limit': limit,
             'total': total,
-            'pages': (total + limit - 1) // limit
+            'pages': (total + limit - 1) // limit,
+            'total_capped': capped
         }
     }), 200
 
+@bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Get typeahead suggestions (issue titles, districts, places) for a prefix."""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    
+    if not query or limit < 1:
+        return jsonify({'suggestions': []}), 200
+    
+    return jsonify({'suggestions': AutocompleteService.suggest(query, limit)}), 200
+
 @bp.route('/crisis-map', methods=['GET'])
 def get_crisis_map():
-    """Get crisis issues for heatmap."""
-    # Get all crisis issues
-    filters = {'is_crisis': True, 'status': {'$in': ['pending', 'verified', 'in_progress']}}
+    """
+    Get open crisis issue counts for the heatmap.
+    Pass breakdown=true for per-category and per-priority counts as well.
+    """
+    breakdown = request.args.get('breakdown', 'false').lower() == 'true'
+    counts = Issue.crisis_counts(breakdown)
+    
+    response = {
+        'district_counts': counts['district'],
+        'total_crisis': sum(counts['district'].values())
+    }
+    if breakdown:
+        response['category_counts'] = counts['category']
+        response['priority_counts'] = counts['priority']
+    
+    return jsonify(response), 200
+
+@bp.route('/crisis-map/issues', methods=['GET'])
+def get_crisis_issues():
+    """Get open crisis issues (paginated, card view by default)."""
+    filters = dict(Issue.OPEN_CRISIS)
     
-    crisis_issues = Issue.get_all(filters, limit=1000)
+    if request.args.get('district'):
+        filters['location.district'] = request.args['district']
+    if request.args.get('category'):
+        filters['category'] = request.args['category']
     
-    # Group by district
-    district_counts = {}
-    for issue in crisis_issues:
-        district = issue['location']['district']
-        district_counts[district] = district_counts.get(district, 0) + 1
+    return issue_list_response(filters, default_view='card')
+
+@bp.route('/map', methods=['GET'])
+def get_map():
+    """
+    Get issues in a map viewport.
+    Returns grid clusters, or individual points once zoomed in far enough.
+    Query: bbox=west,south,east,north (degrees), zoom=0-22. The bbox may be
+    at most MAP_MAX_VIEWPORT_TILES map tiles wide or high at that zoom.
+    """
+    try:
+        west, south, east, north = [float(v) for v in request.args.get('bbox', '').split(',')]
+        zoom = int(request.args.get('zoom', 10))
+    except ValueError:
+        return jsonify({'error': 'bbox must be west,south,east,north and zoom an integer'}), 400
+    
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90) or not 0 <= zoom <= 22:
+        return jsonify({'error': 'Invalid bbox or zoom'}), 400
+    
+    # A map tile spans 360 / 2^zoom degrees of longitude
+    tile = 360 / (2 ** zoom)
+    max_span = tile * current_app.config['MAP_MAX_VIEWPORT_TILES']
+    if east - west > max_span or north - south > max_span:
+        return jsonify({'error': 'bbox too large for this zoom'}), 400
+    
+    filters = {}
+    for arg, field in [('category', 'category'), ('status', 'status'), ('priority', 'priority')]:
+        if request.args.get(arg):
+            filters[field] = request.args[arg]
+    if request.args.get('is_crisis'):
+        filters['is_crisis'] = request.args['is_crisis'].lower() == 'true'
+    
+    bbox = (west, south, east, north)
+    config = current_app.config
+    
+    if zoom >= config['MAP_POINTS_MIN_ZOOM']:
+        points, truncated = Issue.map_points(bbox, filters, config['MAP_MAX_POINTS'])
+        return jsonify({
+            'mode': 'points',
+            'zoom': zoom,
+            'points': points,
+            'truncated': truncated
+        }), 200
+    
+    cell_size = tile / config['MAP_GRID_SIZE']
+    clusters, total, truncated = Issue.map_clusters(bbox, cell_size, filters, config['MAP_MAX_CLUSTERS'])
     
     return jsonify({
-        'crisis_issues': crisis_issues,
-        'district_counts': district_counts,
-        'total_crisis': len(crisis_issues)
+        'mode': 'clusters',
+        'zoom': zoom,
+        'cell_size': cell_size,
+        'clusters': clusters,
+        'total': total,
+        'truncated': truncated
     }), 200
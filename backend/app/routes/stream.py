@@ -0,0 +1,83 @@
+"""
+Stream routes - Server-sent events for notifications and issue updates.
+"""
+import queue
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.models.user import User
+from app.services.event_bus import EventBus
+
+bp = Blueprint('stream', __name__)
+
+@bp.route('', methods=['GET'])
+def stream():
+    """
+    Stream events as text/event-stream.
+    
+    Signed-in users (Authorization header, or ?token= since EventSource
+    cannot set headers) receive their notifications, and officers also their
+    ministry's inbox. ?issues=<id>,<id> adds updates of those issues, which
+    needs no sign-in.
+    """
+    # Same checks as jwt_required (access token, revocation), with the token
+    # also accepted as ?token= (JWT_QUERY_STRING_NAME)
+    verify_jwt_in_request(optional=True, locations=['headers', 'query_string'])
+    user_id = get_jwt_identity()
+    
+    topics = []
+    if user_id:
+        user = User.find_by_id(user_id)
+        if not user or user.get('status') != 'active':
+            return jsonify({'error': 'Account is not active'}), 401
+        topics.append(f'user:{user_id}')
+        if user.get('ministry_id'):
+            topics.append(f'ministry:{user["ministry_id"]}')
+    
+    issue_ids = [i for i in request.args.get('issues', '').split(',') if i]
+    if len(issue_ids) > current_app.config['EVENT_MAX_ISSUE_SUBSCRIPTIONS']:
+        return jsonify({'error': 'Too many issues'}), 400
+    try:
+        topics += [f'issue:{ObjectId(i)}' for i in issue_ids]
+    except InvalidId:
+        return jsonify({'error': 'Invalid issue id'}), 400
+    
+    if not topics:
+        return jsonify({'error': 'Sign in or pass issues to subscribe to'}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription, missed = EventBus.subscribe(topics, last_event_id)
+    keepalive = current_app.config['EVENT_KEEPALIVE_SECONDS']
+    json = current_app.json
+    
+    def format_event(event):
+        event_id, _, event_type, data = event
+        return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if missed is None:
+                # Too far behind to replay: the client should refetch over REST
+                yield 'event: resync\ndata: {}\n\n'
+            else:
+                for event in missed:
+                    yield format_event(event)
+            
+            while not subscription.overflowed:
+                try:
+                    event = subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(event)
+            
+            yield 'event: resync\ndata: {}\n\n'
+        finally:
+            EventBus.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
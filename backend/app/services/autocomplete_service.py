@@ -0,0 +1,232 @@
+"""
+Autocomplete service - In-memory prefix index over issue titles, districts and addresses.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import deque
+from app import db
+from app.utils.text import normalize, tokenize
+from app.utils.validators import DISTRICTS
+
+class AutocompleteService:
+    """
+    Sorted prefix index for typeahead suggestions.
+    
+    Every suggestion is indexed under each of its word positions, so
+    "pipe" matches "Water pipe burst". Lookups are a binary search plus a
+    short scan and never touch the database. The index is loaded lazily and
+    rebuilt in the background every AUTOCOMPLETE_REFRESH_SECONDS to pick up
+    changes made by other workers and new verification counts.
+    
+    Issues created in between go into a small sorted delta that lookups
+    search alongside the main index, so a create costs O(delta) rather than
+    a copy of the whole index. The delta is folded into the main index once
+    it holds MAX_DELTA keys, and dropped by the next rebuild.
+    """
+    
+    MAX_WORDS = 6  # Word positions indexed per suggestion
+    MAX_SCAN = 2000  # Index keys examined per lookup
+    MAX_DELTA = 2000  # Delta keys before they are merged into the main index
+    DISTRICT_SCORE = 1000000  # Districts rank above any issue or address
+    
+    _lock = threading.Lock()
+    _keys = []  # Sorted (key, suggestion_id) pairs
+    _suggestions = {}  # suggestion_id -> {'text', 'type', 'score', ...}
+    _delta_keys = []  # Sorted (key, suggestion_id) pairs added since the last rebuild
+    _delta = {}  # Suggestions added or rescored since the last rebuild (take precedence)
+    _removed = {}  # suggestion_id -> time deleted, since the last rebuild
+    _recent = deque(maxlen=1000)  # (time, issue) created lately, replayed after a rebuild
+    _built_at = None
+    _refreshing = False
+    
+    refresh_seconds = 300
+    max_issues = 50000
+    
+    @staticmethod
+    def init_app(app):
+        """Read autocomplete settings from the app config."""
+        AutocompleteService.refresh_seconds = app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+        AutocompleteService.max_issues = app.config['AUTOCOMPLETE_MAX_ISSUES']
+    
+    @staticmethod
+    def suggest(prefix, limit=8):
+        """Get the most popular suggestions starting with (a word of) prefix."""
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+        
+        AutocompleteService._ensure_fresh()
+        
+        with AutocompleteService._lock:
+            indexes = (AutocompleteService._keys, AutocompleteService._delta_keys)
+            suggestions, delta = AutocompleteService._suggestions, AutocompleteService._delta
+            removed = AutocompleteService._removed
+        
+        seen = set()
+        for keys in indexes:
+            start = bisect.bisect_left(keys, (prefix,))
+            for key, suggestion_id in keys[start:start + AutocompleteService.MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                seen.add(suggestion_id)
+        
+        found = (delta.get(s) or suggestions.get(s) for s in seen if s not in removed)
+        best = heapq.nlargest(limit, (s for s in found if s), key=lambda s: s['score'])
+        return [{k: v for k, v in s.items() if k != 'score'} for s in best]
+    
+    @staticmethod
+    def add_issue(issue):
+        """Index a newly created issue (and its address) in the delta."""
+        if AutocompleteService._built_at is None:
+            return  # Not loaded yet; the first lookup loads everything
+        
+        with AutocompleteService._lock:
+            AutocompleteService._recent.append((time.monotonic(), issue))
+            AutocompleteService._add_to_delta(issue)
+            if len(AutocompleteService._delta_keys) > AutocompleteService.MAX_DELTA:
+                AutocompleteService._merge_delta()
+    
+    @staticmethod
+    def remove_issue(issue_id):
+        """Stop suggesting a deleted issue. Its stale keys are dropped on the next rebuild."""
+        with AutocompleteService._lock:
+            removed = dict(AutocompleteService._removed)
+            removed[f'issue:{issue_id}'] = time.monotonic()
+            AutocompleteService._removed = removed
+    
+    @staticmethod
+    def rebuild():
+        """Rebuild the whole index from the database and swap it in."""
+        started = time.monotonic()
+        keys = []
+        suggestions = {}
+        
+        for district in DISTRICTS:
+            AutocompleteService._index(keys, suggestions, f'district:{district}', {
+                'text': district,
+                'type': 'district',
+                'score': AutocompleteService.DISTRICT_SCORE
+            })
+        
+        cursor = db.issues.find(
+            {},
+            {'title': 1, 'location.address': 1, 'location.district': 1, 'verification_count': 1}
+        ).sort('verification_count', -1).limit(AutocompleteService.max_issues)
+        
+        for issue in cursor:
+            AutocompleteService._add(keys, suggestions, issue)
+        
+        keys.sort()
+        with AutocompleteService._lock:
+            AutocompleteService._keys = keys
+            AutocompleteService._suggestions = suggestions
+            AutocompleteService._built_at = time.monotonic()
+            
+            # Creates and deletes made while the database was read may be
+            # missing from it; keep them on top of the new index
+            AutocompleteService._delta_keys, AutocompleteService._delta = [], {}
+            AutocompleteService._removed = {
+                s: at for s, at in AutocompleteService._removed.items() if at >= started
+            }
+            for at, issue in AutocompleteService._recent:
+                if at >= started:
+                    AutocompleteService._add_to_delta(issue)
+    
+    @staticmethod
+    def _add_to_delta(issue):
+        """Add an issue to copies of the delta and swap them in (caller holds _lock)."""
+        delta_keys = list(AutocompleteService._delta_keys)
+        delta = dict(AutocompleteService._delta)
+        
+        # An address already in the main index is rescored in the delta
+        place_id = AutocompleteService._place_id(issue)
+        if place_id and place_id not in delta and place_id in AutocompleteService._suggestions:
+            delta[place_id] = AutocompleteService._suggestions[place_id]
+        
+        AutocompleteService._add(delta_keys, delta, issue, keep_sorted=True)
+        AutocompleteService._delta_keys = delta_keys
+        AutocompleteService._delta = delta
+    
+    @staticmethod
+    def _merge_delta():
+        """Fold the delta into copies of the main index and swap them in (caller holds _lock)."""
+        suggestions = dict(AutocompleteService._suggestions)
+        suggestions.update(AutocompleteService._delta)
+        AutocompleteService._keys = list(heapq.merge(AutocompleteService._keys, AutocompleteService._delta_keys))
+        AutocompleteService._suggestions = suggestions
+        AutocompleteService._delta_keys, AutocompleteService._delta = [], {}
+    
+    @staticmethod
+    def _ensure_fresh():
+        """Load the index on first use and refresh it in the background when stale."""
+        if AutocompleteService._built_at is None:
+            with AutocompleteService._lock:
+                loaded = AutocompleteService._built_at is not None
+            if not loaded:
+                AutocompleteService.rebuild()
+            return
+        
+        age = time.monotonic() - AutocompleteService._built_at
+        if age < AutocompleteService.refresh_seconds or AutocompleteService._refreshing:
+            return
+        
+        AutocompleteService._refreshing = True
+        
+        def refresh():
+            try:
+                AutocompleteService.rebuild()
+            finally:
+                AutocompleteService._refreshing = False
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    @staticmethod
+    def _add(keys, suggestions, issue, keep_sorted=False):
+        """Add an issue title and its address to the index structures."""
+        score = issue.get('verification_count', 0)
+        location = issue.get('location') or {}
+        
+        AutocompleteService._index(keys, suggestions, f"issue:{issue['_id']}", {
+            'text': issue.get('title', ''),
+            'type': 'issue',
+            'id': issue['_id'],
+            'score': score
+        }, keep_sorted)
+        
+        place_id = AutocompleteService._place_id(issue)
+        if not place_id:
+            return
+        
+        # Addresses are shared by many issues; rank them by combined popularity
+        if place_id in suggestions:
+            suggestions[place_id] = dict(suggestions[place_id], score=suggestions[place_id]['score'] + score + 1)
+            return
+        
+        AutocompleteService._index(keys, suggestions, place_id, {
+            'text': location['address'],
+            'type': 'place',
+            'district': location.get('district'),
+            'score': score + 1
+        }, keep_sorted)
+    
+    @staticmethod
+    def _place_id(issue):
+        address = (issue.get('location') or {}).get('address')
+        return f'place:{normalize(address)}' if address else None
+    
+    @staticmethod
+    def _index(keys, suggestions, suggestion_id, suggestion, keep_sorted=False):
+        """Register a suggestion under each of its word positions."""
+        words = tokenize(suggestion['text'])
+        if not words:
+            return
+        
+        suggestions[suggestion_id] = suggestion
+        for i in range(min(len(words), AutocompleteService.MAX_WORDS)):
+            key = (' '.join(words[i:]), suggestion_id)
+            if keep_sorted:
+                bisect.insort(keys, key)
+            else:
+                keys.append(key)
@@ -0,0 +1,202 @@
+"""
+Counter buffer service - Write-behind buffering of verification counts for hot issues.
+"""
+import atexit
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from app.models.issue import Issue
+from app.utils import metrics
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; the journal is then single-process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class CounterBuffer:
+    """
+    Write-behind buffer for issue verification_count deltas.
+    
+    When COUNTER_WRITE_BEHIND is on, verification taps only touch the
+    verifications collection; the per-issue count changes are summed in
+    memory and flushed every COUNTER_FLUSH_INTERVAL seconds as one bulk
+    write, so a viral issue takes one update per interval instead of one
+    per tap.
+    
+    Every delta is appended to a journal segment before it is acknowledged.
+    A flush fsyncs and seals the segment as a batch file, applies it and
+    deletes it. Batches are applied idempotently (see
+    Issue.apply_counter_batch), so files left behind by a crash are simply
+    replayed at the next start. Appends are flushed to the OS on every tap,
+    which survives a process crash; machine crashes can lose the deltas of
+    the last interval.
+    
+    Enable it only after migrate.py has drained legacy verified_by arrays.
+    """
+    
+    enabled = False
+    interval = 0.5
+    journal_dir = None
+    min_count = 3
+    
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _deltas = {}  # issue_id -> summed delta
+    _oldest = None  # monotonic time of the oldest unflushed delta
+    _failed = []  # (batch_id, deltas, path, oldest) batches to retry
+    _segment = None
+    _segment_id = None
+    
+    @staticmethod
+    def init_app(app):
+        """Start write-behind buffering if enabled in the app config."""
+        CounterBuffer.enabled = app.config['COUNTER_WRITE_BEHIND']
+        if not CounterBuffer.enabled:
+            return
+        
+        CounterBuffer.interval = app.config['COUNTER_FLUSH_INTERVAL']
+        CounterBuffer.journal_dir = app.config['COUNTER_JOURNAL_DIR']
+        CounterBuffer.min_count = app.config['MIN_VERIFICATION_COUNT']
+        os.makedirs(CounterBuffer.journal_dir, exist_ok=True)
+        
+        CounterBuffer.replay()
+        CounterBuffer._open_segment()
+        
+        metrics.gauge('verification_counter_flush_lag_seconds', CounterBuffer.lag,
+                      'Age of the oldest verification count change not yet written to the database')
+        metrics.gauge('verification_counter_pending_issues', lambda: len(CounterBuffer._deltas),
+                      'Issues with buffered verification count changes')
+        
+        threading.Thread(target=CounterBuffer._run, daemon=True).start()
+        atexit.register(CounterBuffer.flush)
+    
+    @staticmethod
+    def add(issue_id, delta):
+        """Buffer a verification_count change for an issue."""
+        issue_id = str(issue_id)
+        with CounterBuffer._lock:
+            CounterBuffer._segment.write(f'{issue_id} {delta}\n')
+            CounterBuffer._segment.flush()
+            CounterBuffer._deltas[issue_id] = CounterBuffer._deltas.get(issue_id, 0) + delta
+            if CounterBuffer._oldest is None:
+                CounterBuffer._oldest = time.monotonic()
+    
+    @staticmethod
+    def pending(issue_id):
+        """Get the buffered (not yet flushed) change for an issue."""
+        return CounterBuffer._deltas.get(str(issue_id), 0)
+    
+    @staticmethod
+    def lag():
+        """Seconds since the oldest unflushed change was buffered (0 when empty)."""
+        oldest = [CounterBuffer._oldest] + [batch[3] for batch in CounterBuffer._failed]
+        oldest = [t for t in oldest if t is not None]
+        return round(time.monotonic() - min(oldest), 3) if oldest else 0
+    
+    @staticmethod
+    def flush():
+        """Write buffered changes to the database. Returns the number of issues updated."""
+        with CounterBuffer._flush_lock:
+            with CounterBuffer._lock:
+                batches = CounterBuffer._failed
+                CounterBuffer._failed = []
+                if CounterBuffer._deltas:
+                    path = CounterBuffer._seal_segment()
+                    batches.append((CounterBuffer._batch_id(path), CounterBuffer._deltas,
+                                    path, CounterBuffer._oldest))
+                    CounterBuffer._deltas = {}
+                    CounterBuffer._oldest = None
+                    CounterBuffer._open_segment()
+            
+            updated = 0
+            for batch in batches:
+                try:
+                    updated += CounterBuffer._apply(*batch[:3])
+                except Exception:
+                    logger.exception('Verification count flush failed; will retry')
+                    CounterBuffer._failed.append(batch)
+                    metrics.inc('verification_counter_flush_errors_total', 1,
+                                'Failed verification count flushes')
+            
+            return updated
+    
+    @staticmethod
+    def replay():
+        """Apply batches and segments left behind by processes that stopped before flushing."""
+        paths = sorted(glob.glob(os.path.join(CounterBuffer.journal_dir, 'batch-*.log')))
+        paths += sorted(glob.glob(os.path.join(CounterBuffer.journal_dir, 'segment-*.log')))
+        
+        for path in paths:
+            with open(path, 'a+') as f:
+                # A segment still locked belongs to a live process
+                if fcntl and os.path.basename(path).startswith('segment-'):
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                f.seek(0)
+                deltas = CounterBuffer._read(f)
+            CounterBuffer._apply(CounterBuffer._batch_id(path), deltas, path)
+            logger.info('Replayed verification count journal %s (%d issues)', path, len(deltas))
+    
+    @staticmethod
+    def _apply(batch_id, deltas, path):
+        """Apply one batch and delete its file."""
+        Issue.apply_counter_batch(deltas, batch_id, CounterBuffer.min_count)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Replayed concurrently by another process starting up
+        return len(deltas)
+    
+    @staticmethod
+    def _run():
+        while True:
+            time.sleep(CounterBuffer.interval)
+            try:
+                CounterBuffer.flush()
+            except Exception:
+                logger.exception('Verification count flusher error')
+    
+    @staticmethod
+    def _open_segment():
+        CounterBuffer._segment_id = uuid.uuid4().hex
+        path = os.path.join(CounterBuffer.journal_dir, f'segment-{CounterBuffer._segment_id}.log')
+        CounterBuffer._segment = open(path, 'a')
+        if fcntl:
+            fcntl.flock(CounterBuffer._segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    
+    @staticmethod
+    def _seal_segment():
+        """fsync the current segment and rename it to a batch file. Returns the new path."""
+        segment = CounterBuffer._segment
+        segment.flush()
+        os.fsync(segment.fileno())
+        path = os.path.join(CounterBuffer.journal_dir, f'batch-{CounterBuffer._segment_id}.log')
+        os.replace(segment.name, path)
+        segment.close()
+        return path
+    
+    @staticmethod
+    def _batch_id(path):
+        # segment-<id>.log and batch-<id>.log share the id, so a replay is recognised
+        return os.path.basename(path).split('-', 1)[1][:-len('.log')]
+    
+    @staticmethod
+    def _read(f):
+        """Sum the deltas in a journal file, ignoring a torn last line."""
+        deltas = {}
+        for line in f:
+            parts = line.split()
+            if len(parts) != 2 or not line.endswith('\n'):
+                continue
+            try:
+                deltas[parts[0]] = deltas.get(parts[0], 0) + int(parts[1])
+            except ValueError:
+                continue
+        return deltas
@@ -0,0 +1,324 @@
+"""
+Delivery service - Sends queued push, email and SMS messages with per-channel worker pools.
+"""
+import logging
+import random
+import smtplib
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from email.message import EmailMessage
+import firebase_admin
+import requests
+from firebase_admin import credentials, exceptions, messaging
+from app.models.delivery import Delivery
+from app.models.user import User
+from app.utils import metrics
+from app.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class DeliveryError(Exception):
+    """A failed send. Permanent failures (bad address, unknown token) are not retried."""
+    
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+def _http_error(response):
+    # Client errors other than throttling will fail the same way next time
+    permanent = 400 <= response.status_code < 500 and response.status_code != 429
+    return DeliveryError(f'HTTP {response.status_code}: {response.text[:200]}', permanent)
+
+class EmailChannel:
+    """
+    Sends email over one SMTP session per worker, kept open between batches
+    and reconnected when the server drops it.
+    
+    Channels call hold(jobs) right before sending jobs, which renews their
+    lease and returns those still held (see Delivery.renew); the others are
+    skipped, as another worker has claimed them.
+    """
+    
+    def __init__(self, config):
+        self.host = config['EMAIL_HOST']
+        self.port = config['EMAIL_PORT']
+        self.user = config['EMAIL_USER']
+        self.password = config['EMAIL_PASSWORD']
+        self.use_tls = config['EMAIL_USE_TLS']
+        self.sender = config['EMAIL_FROM'] or config['EMAIL_USER']
+        self.timeout = config['DELIVERY_TIMEOUT']
+        self._smtp = None
+    
+    def send_batch(self, jobs, hold):
+        """Send jobs over the worker's session. Returns [(job, error or None)]."""
+        results = []
+        for job in jobs:
+            if not hold([job]):
+                continue
+            message = EmailMessage()
+            message['From'] = self.sender
+            message['To'] = job['to']
+            message['Subject'] = job['title']
+            message.set_content(job['body'])
+            try:
+                self._send(message)
+                results.append((job, None))
+            except smtplib.SMTPRecipientsRefused as e:
+                results.append((job, DeliveryError(str(e), permanent=True)))
+            except (smtplib.SMTPException, OSError) as e:
+                self.close()
+                results.append((job, DeliveryError(f'{type(e).__name__}: {e}')))
+        return results
+    
+    def _send(self, message):
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Idle sessions get dropped by the server; reconnect once
+            self.close()
+            self._connection().send_message(message)
+    
+    def _connection(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            self._smtp = smtp
+        return self._smtp
+    
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+class SmsChannel:
+    """Sends SMS through the gateway over a keep-alive HTTP session."""
+    
+    def __init__(self, config):
+        self.url = config['SMS_API_URL']
+        self.api_key = config['SMS_API_KEY']
+        self.timeout = config['DELIVERY_TIMEOUT']
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {self.api_key}'
+    
+    def send_batch(self, jobs, hold):
+        """Send jobs one request each (the gateway takes one recipient per request)."""
+        results = []
+        for job in jobs:
+            if not hold([job]):
+                continue
+            try:
+                response = self.session.post(
+                    self.url, json={'to': job['to'], 'message': job['body']}, timeout=self.timeout
+                )
+                results.append((job, None if response.ok else _http_error(response)))
+            except requests.RequestException as e:
+                results.append((job, DeliveryError(f'{type(e).__name__}: {e}')))
+        return results
+    
+    def close(self):
+        self.session.close()
+
+class PushChannel:
+    """
+    Sends push notifications with the Firebase Admin SDK (FCM v1 API). Jobs
+    with the same title and body go out as one send_each_for_multicast call
+    of up to PUSH_BATCH_SIZE device tokens.
+    """
+    
+    APP_NAME = 'delivery'
+    
+    # Errors that will fail the same way for that token next time (e.g. the
+    # app was uninstalled); any other error is retried
+    PERMANENT = (messaging.UnregisteredError, messaging.SenderIdMismatchError, exceptions.InvalidArgumentError)
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, config):
+        self.app = PushChannel.firebase_app(config)
+        self.batch_size = config['PUSH_BATCH_SIZE']
+    
+    @staticmethod
+    def firebase_app(config):
+        """
+        The Firebase app push is sent with, initialised on first use from the
+        service account file in FIREBASE_CREDENTIALS (or the application
+        default credentials). An app already initialised under APP_NAME is used as is.
+        """
+        with PushChannel._lock:
+            try:
+                return firebase_admin.get_app(PushChannel.APP_NAME)
+            except ValueError:
+                pass
+            
+            path = config['FIREBASE_CREDENTIALS']
+            credential = credentials.Certificate(path) if path else credentials.ApplicationDefault()
+            options = {'httpTimeout': config['DELIVERY_TIMEOUT']}
+            if config['FIREBASE_PROJECT_ID']:
+                options['projectId'] = config['FIREBASE_PROJECT_ID']
+            return firebase_admin.initialize_app(credential, options, name=PushChannel.APP_NAME)
+    
+    def send_batch(self, jobs, hold):
+        """Send jobs as multicast calls. Returns [(job, error or None)]."""
+        groups = defaultdict(list)
+        for job in jobs:
+            groups[(job['title'], job['body'])].append(job)
+        
+        results = []
+        for (title, body), group in groups.items():
+            for i in range(0, len(group), self.batch_size):
+                chunk = hold(group[i:i + self.batch_size])
+                if chunk:
+                    results += self._multicast(title, body, chunk)
+        return results
+    
+    def _multicast(self, title, body, jobs):
+        message = messaging.MulticastMessage(
+            tokens=[job['to'] for job in jobs],
+            notification=messaging.Notification(title=title, body=body)
+        )
+        try:
+            response = messaging.send_each_for_multicast(message, app=self.app)
+        except (exceptions.FirebaseError, ValueError) as e:
+            error = DeliveryError(f'{type(e).__name__}: {e}', permanent=isinstance(e, ValueError))
+            return [(job, error) for job in jobs]
+        
+        # One response per token, in request order
+        results = []
+        for job, sent in zip(jobs, response.responses):
+            if sent.success:
+                results.append((job, None))
+            else:
+                error = sent.exception
+                results.append((job, DeliveryError(
+                    f'{type(error).__name__}: {error}', permanent=isinstance(error, PushChannel.PERMANENT)
+                )))
+        return results
+    
+    def close(self):
+        pass
+
+class DeliveryService:
+    """
+    Per-channel worker pools draining the deliveries queue (see Delivery).
+    
+    Each worker owns a channel instance, so SMTP sessions and HTTP
+    connections are reused across batches. The lease on each job is renewed
+    right before it is sent, so DELIVERY_LEASE_SECONDS only has to cover one
+    send, however long the batch takes. A token bucket per channel keeps
+    all workers of the process under the provider's rate limit. Failed
+    sends are retried with exponential backoff. Permanent failures, and jobs
+    that fail DELIVERY_MAX_ATTEMPTS times, move to delivery_dead.
+    """
+    
+    CHANNEL_CLASSES = {
+        'push': PushChannel,
+        'email': EmailChannel,
+        'sms': SmsChannel
+    }
+    
+    channels = set()  # Enabled channel names
+    config = None
+    _buckets = {}
+    
+    @staticmethod
+    def init_app(app, workers=None):
+        """Enable the configured channels and start DELIVERY_WORKERS threads for each (unless workers is given)."""
+        DeliveryService.config = app.config
+        DeliveryService.channels = {c for c in app.config['DELIVERY_CHANNELS'] if c in Delivery.CHANNELS}
+        DeliveryService._buckets = {
+            channel: TokenBucket(app.config[f'{channel.upper()}_RATE_PER_SECOND'])
+            for channel in DeliveryService.channels
+        }
+        
+        metrics.gauge('delivery_lag_seconds', DeliveryService.lag,
+                      'Age of the oldest push/email/SMS message not yet sent')
+        
+        workers = app.config['DELIVERY_WORKERS'] if workers is None else workers
+        threads = []
+        for channel in sorted(DeliveryService.channels):
+            for i in range(workers):
+                thread = threading.Thread(
+                    target=DeliveryService._run, args=(channel,), name=f'delivery-{channel}-{i}', daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        return threads
+    
+    @staticmethod
+    def enqueue(user, title, body):
+        """Queue a message to a user on every enabled channel they can be reached on."""
+        targets = []
+        if 'email' in DeliveryService.channels and user.get('email'):
+            targets.append(('email', user['email']))
+        if 'sms' in DeliveryService.channels and user.get('phone'):
+            targets.append(('sms', user['phone']))
+        if 'push' in DeliveryService.channels:
+            targets += [('push', token) for token in user.get('fcm_tokens', [])]
+        
+        return Delivery.enqueue_many([
+            {'channel': channel, 'user_id': user['_id'], 'to': to, 'title': title, 'body': body}
+            for channel, to in targets
+        ])
+    
+    @staticmethod
+    def deliver_once(channel, sender):
+        """Claim and send one batch of a channel. Returns the number of jobs handled."""
+        config = DeliveryService.config
+        lease = config['DELIVERY_LEASE_SECONDS']
+        jobs = Delivery.claim(channel, config['DELIVERY_BATCH_SIZE'], lease)
+        if not jobs:
+            return 0
+        
+        DeliveryService._buckets[channel].take(len(jobs))
+        sent = []
+        for job, error in sender.send_batch(jobs, lambda held: Delivery.renew(held, lease)):
+            if error is None:
+                sent.append(job['_id'])
+            else:
+                DeliveryService._failed(channel, job, error)
+        Delivery.ack(sent)
+        metrics.inc(f'delivery_{channel}_sent_total', len(sent), f'{channel} messages sent')
+        return len(jobs)
+    
+    @staticmethod
+    def lag():
+        """Seconds since the oldest queued message was created (0 when empty)."""
+        oldest = Delivery.oldest_pending()
+        return round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0
+    
+    @staticmethod
+    def _failed(channel, job, error):
+        config = DeliveryService.config
+        metrics.inc(f'delivery_{channel}_failures_total', 1, f'Failed {channel} sends')
+        
+        if error.permanent or job['attempts'] >= config['DELIVERY_MAX_ATTEMPTS']:
+            logger.error('Giving up on %s delivery %s after %d attempts: %s',
+                         channel, job['_id'], job['attempts'], error)
+            Delivery.dead_letter(job, str(error))
+            if channel == 'push' and error.permanent:
+                User.remove_push_token(job['user_id'], job['to'])
+            metrics.inc(f'delivery_{channel}_dead_letters_total', 1, f'{channel} messages moved to delivery_dead')
+            return
+        
+        delay = min(config['DELIVERY_BACKOFF_BASE'] * 2 ** (job['attempts'] - 1), config['DELIVERY_BACKOFF_MAX'])
+        delay *= random.uniform(0.5, 1.0)
+        Delivery.retry(job['_id'], delay, str(error))
+    
+    @staticmethod
+    def _run(channel):
+        sender = DeliveryService.CHANNEL_CLASSES[channel](DeliveryService.config)
+        while True:
+            try:
+                if DeliveryService.deliver_once(channel, sender):
+                    continue
+            except Exception:
+                logger.exception('%s delivery worker error', channel)
+            time.sleep(DeliveryService.config['DELIVERY_POLL_INTERVAL'])
@@ -0,0 +1,29 @@
+"""
+Duplicate detection service - Catch repeat reports of the same problem at creation.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models.issue import Issue
+
+class DuplicateService:
+    """Service for matching new reports against recent nearby issues."""
+    
+    @staticmethod
+    def check(data, user_id):
+        """
+        Compare a new report with open issues of the same category reported
+        nearby in the last DUPLICATE_WINDOW_HOURS.
+        Returns card dicts of the similar issues, with similarity and
+        distance_m, most similar first. Nothing is merged here: the reporter
+        decides (see create_issue's duplicate_of).
+        """
+        config = current_app.config
+        since = datetime.utcnow() - timedelta(hours=config['DUPLICATE_WINDOW_HOURS'])
+        matches = Issue.find_similar(data, config['DUPLICATE_RADIUS_M'], since, user_id)
+        
+        similar = [(issue, score) for issue, score in matches if score >= config['DUPLICATE_SUGGEST_THRESHOLD']]
+        suggestions = Issue.serialize_many([issue for issue, _ in similar], Issue.CARD_FIELDS, user_id)
+        for card, (issue, score) in zip(suggestions, similar):
+            card['similarity'] = round(score, 2)
+            card['distance_m'] = round(issue['distance_m'], 1)
+        return suggestions
@@ -0,0 +1,208 @@
+"""
+Event bus - Publish/subscribe of notification and issue-update events for the SSE stream.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from pymongo.errors import OperationFailure, PyMongoError
+from app import db
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One stream client: the topics it follows and a bounded queue of events for it."""
+    
+    def __init__(self, topics, max_queued):
+        self.topics = set(topics)
+        self.queue = queue.Queue(max_queued)
+        self.overflowed = False  # Events were dropped; the client must resync
+
+class EventBus:
+    """
+    In-process pub/sub for server-sent events.
+    
+    Topics are 'user:<id>', 'ministry:<id>' and 'issue:<id>'. Events carry
+    an id. The last EVENT_BUFFER_SIZE events are kept so that a client that
+    reconnects with Last-Event-ID gets what it missed.
+    
+    Sources:
+    - change_stream: a MongoDB change stream on notifications, ministry_inbox
+      and issues feeds the bus. Every process sees every write, whichever
+      process made it. Event ids are resume tokens, so they are the same in
+      all processes and a client can resume on any of them. Requires a
+      replica set.
+    - local: services call publish() after their writes. Only clients of the
+      process that made the write see the event, so this suits single-process
+      deployments and development. Event ids are '<process>-<seq>', so an id
+      from another process (or before a restart) is never mistaken for one
+      of ours and the client is told to resync.
+    """
+    
+    # Issue fields sent with issue_updated events
+    ISSUE_FIELDS = [
+        'status', 'verification_count', 'priority', 'is_crisis',
+        'government_response', 'ngo_claim', 'solution_verified', 'updated_at'
+    ]
+    
+    mode = 'local'
+    buffer_size = 2000
+    max_queued = 500
+    
+    _lock = threading.Lock()
+    _buffer = deque()  # (event_id, topic, event_type, data)
+    _subscribers = defaultdict(set)  # topic -> subscriptions
+    _seq = 0
+    _process = None  # Prefix of local event ids, unique to this process
+    _pid = None
+    
+    @staticmethod
+    def init_app(app, source=None):
+        """Choose the event source (EVENT_STREAM_SOURCE unless source is given: auto, change_stream or local)."""
+        EventBus.buffer_size = app.config['EVENT_BUFFER_SIZE']
+        EventBus.max_queued = app.config['EVENT_MAX_QUEUED']
+        EventBus._buffer = deque(maxlen=EventBus.buffer_size)
+        
+        source = source or app.config['EVENT_STREAM_SOURCE']
+        if source == 'change_stream' or (source == 'auto' and EventBus._replica_set()):
+            EventBus.mode = 'change_stream'
+            threading.Thread(target=EventBus._watch, name='event-bus-watch', daemon=True).start()
+        else:
+            EventBus.mode = 'local'
+        
+        metrics.gauge('event_stream_subscribers', EventBus.subscriber_count,
+                      'Open server-sent event streams')
+    
+    @staticmethod
+    def publish(topic, event_type, data):
+        """Publish an event from a service. Ignored when the change stream is the source."""
+        if EventBus.mode != 'local':
+            return
+        with EventBus._lock:
+            if EventBus._pid != os.getpid():
+                # First event of this process (workers may fork after import)
+                EventBus._pid, EventBus._process, EventBus._seq = os.getpid(), uuid.uuid4().hex[:12], 0
+            EventBus._seq += 1
+            event_id = f'{EventBus._process}-{EventBus._seq}'
+        EventBus._deliver(event_id, topic, event_type, data)
+    
+    @staticmethod
+    def publish_issue(issue):
+        """Publish the current state of an issue's tracked fields to its subscribers."""
+        EventBus.publish(f'issue:{issue["_id"]}', 'issue_updated', EventBus._issue_data(issue))
+    
+    @staticmethod
+    def subscribe(topics, last_event_id=None):
+        """
+        Open a subscription. Returns (subscription, missed): missed holds the
+        buffered events after last_event_id, or is None when that event is no
+        longer buffered and the client has to resync.
+        """
+        subscription = Subscription(topics, EventBus.max_queued)
+        missed = []
+        with EventBus._lock:
+            if last_event_id:
+                ids = [event[0] for event in EventBus._buffer]
+                if last_event_id in ids:
+                    start = ids.index(last_event_id) + 1
+                    missed = [e for e in list(EventBus._buffer)[start:] if e[1] in subscription.topics]
+                else:
+                    missed = None
+            for topic in subscription.topics:
+                EventBus._subscribers[topic].add(subscription)
+        return subscription, missed
+    
+    @staticmethod
+    def unsubscribe(subscription):
+        """Close a subscription."""
+        with EventBus._lock:
+            for topic in subscription.topics:
+                subscribers = EventBus._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del EventBus._subscribers[topic]
+    
+    @staticmethod
+    def subscriber_count():
+        """Number of open subscriptions."""
+        with EventBus._lock:
+            return len({s for subscribers in EventBus._subscribers.values() for s in subscribers})
+    
+    @staticmethod
+    def _deliver(event_id, topic, event_type, data):
+        event = (event_id, topic, event_type, data)
+        with EventBus._lock:
+            EventBus._buffer.append(event)
+            subscribers = list(EventBus._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # A stalled client must not hold events in memory forever
+                subscription.overflowed = True
+    
+    @staticmethod
+    def _issue_data(issue):
+        data = {'id': issue['_id']}
+        data.update({field: issue.get(field) for field in EventBus.ISSUE_FIELDS})
+        return data
+    
+    @staticmethod
+    def _replica_set():
+        try:
+            return 'setName' in db.client.admin.command('hello')
+        except:
+            return False
+    
+    @staticmethod
+    def _watch():
+        tracked = [{f'updateDescription.updatedFields.{field}': {'$exists': True}}
+                   for field in EventBus.ISSUE_FIELDS if field != 'updated_at']
+        pipeline = [{'$match': {'$or': [
+            {'ns.coll': {'$in': ['notifications', 'ministry_inbox']}, 'operationType': 'insert'},
+            # Notifications rewritten in place (replaced, or count bumped) are
+            # sent again; marking read is not an event
+            {'ns.coll': 'notifications', 'operationType': 'replace'},
+            {'ns.coll': 'notifications', 'operationType': 'update',
+             'updateDescription.updatedFields.count': {'$exists': True}},
+            {'ns.coll': 'issues', 'operationType': 'update', '$or': tracked}
+        ]}}]
+        
+        resume_after = None
+        while True:
+            try:
+                with db.watch(pipeline, full_document='updateLookup', resume_after=resume_after) as stream:
+                    for change in stream:
+                        resume_after = change['_id']
+                        EventBus._from_change(change)
+            except OperationFailure as e:
+                logger.exception('Event stream watcher error; reconnecting')
+                if e.code == 286:  # ChangeStreamHistoryLost: the oplog moved past our token
+                    resume_after = None
+                time.sleep(1)
+            except PyMongoError:
+                logger.exception('Event stream watcher error; reconnecting')
+                time.sleep(1)
+    
+    @staticmethod
+    def _from_change(change):
+        from app.models.notification import Notification
+        from app.models.ministry_inbox import MinistryInbox
+        
+        event_id = change['_id']['_data']
+        doc = change.get('fullDocument')
+        if not doc:
+            return  # Deleted before the lookup
+        
+        collection = change['ns']['coll']
+        if collection == 'notifications':
+            EventBus._deliver(event_id, f'user:{doc["user_id"]}', 'notification', Notification.to_dict(doc))
+        elif collection == 'ministry_inbox':
+            EventBus._deliver(event_id, f'ministry:{doc["ministry_id"]}', 'notification', MinistryInbox.to_event(doc))
+        else:
+            EventBus._deliver(event_id, f'issue:{doc["_id"]}', 'issue_updated', EventBus._issue_data(doc))
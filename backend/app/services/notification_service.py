@@ -1,18 +1,51 @@
 """
 Notification service - Create and send notifications to users.
 """
+import heapq
 from app.models.notification import Notification
+from app.models.ministry_inbox import MinistryInbox
 from app.models.user import User
 from app.models.ministry import Ministry
 from app.models.ngo import NGO
+from app.models.delivery import Delivery
+from app.services.delivery_service import DeliveryService
+from app.services.event_bus import EventBus
+from app.utils.pagination import encode_cursor, decode_cursor
 
 class NotificationService:
     """Service for managing notifications."""
     
+    # Types collapsed per user and issue (see Notification.digest)
+    digest_types = set()
+    digest_window = 0
+    
+    @staticmethod
+    def init_app(app):
+        """Enable digests for NOTIFICATION_DIGEST_TYPES (off when NOTIFICATION_DIGEST_WINDOW is 0)."""
+        NotificationService.digest_window = app.config['NOTIFICATION_DIGEST_WINDOW']
+        NotificationService.digest_types = set(app.config['NOTIFICATION_DIGEST_TYPES'])
+    
     @staticmethod
     def create_notification(user_id, notification_type, title, message, issue_id=None):
-        """Create a notification for a user."""
-        return Notification.create(user_id, notification_type, title, message, issue_id)
+        """
+        Create a notification for a user and queue it on the enabled delivery
+        channels. Types in digest_types are folded into the user's open digest
+        for the issue; those are only delivered again when the user had read
+        the digest.
+        """
+        if NotificationService.digest_window and notification_type in NotificationService.digest_types:
+            notification, added = Notification.digest(
+                user_id, notification_type, title, message, issue_id, NotificationService.digest_window
+            )
+        else:
+            notification, added = Notification.create(user_id, notification_type, title, message, issue_id), True
+        
+        EventBus.publish(f'user:{user_id}', 'notification', Notification.to_dict(notification))
+        if added and DeliveryService.channels:
+            user = User.find_by_id(user_id)
+            if user:
+                DeliveryService.enqueue(user, title, message)
+        return notification
     
     @staticmethod
     def notify_issue_verified(user_id, issue_id):
@@ -67,20 +100,99 @@ class NotificationService:
     @staticmethod
     def notify_ministry_tagged(ministry_id, issue_id):
         """Notify ministry users about a tagged issue."""
-        ministry = Ministry.find_by_id(ministry_id)
-        
-        if not ministry:
-            return
+        return NotificationService.notify_ministries_tagged([ministry_id], issue_id)
+    
+    @staticmethod
+    def notify_ministries_tagged(ministry_ids, issue_id):
+        """
+        Notify the tagged ministries. One entry is written to each ministry's
+        inbox, however many officers it has. Returns the number of ministries
+        notified.
+        """
+        entries = MinistryInbox.add_many(
+            ministry_ids,
+            'issue_tagged',
+            'New Issue Tagged',
+            'A new issue has been tagged to your ministry.',
+            issue_id
+        )
+        for entry in entries:
+            EventBus.publish(f'ministry:{entry["ministry_id"]}', 'notification', MinistryInbox.to_event(entry))
+        return len(entries)
+    
+    @staticmethod
+    def get_feed(user_id, limit=20, cursor=None, unread_only=False):
+        """
+        Get a newest-first page of a user's notifications, merged with their
+        ministry's inbox, following an opaque cursor.
+        Returns (notifications, next_cursor); raises ValueError for a malformed cursor.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        user = User.find_by_id(user_id)
+        if not user:
+            return [], None
         
-        # Notify all assigned users
-        for user_id in ministry.get('assigned_users', []):
-            NotificationService.create_notification(
-                str(user_id),
-                'issue_tagged',
-                'New Issue Tagged',
-                'A new issue has been tagged to your ministry.',
-                issue_id
+        # Fetch one extra item to know whether another page exists
+        personal = Notification.get_after(user_id, after, limit + 1, unread_only)
+        inbox = []
+        if user.get('ministry_id'):
+            read_seq = MinistryInbox.read_seq(user)
+            entries = MinistryInbox.find_for_ministry(
+                user['ministry_id'], limit + 1, after, read_seq if unread_only else None
             )
+            inbox = [MinistryInbox.to_dict(entry, user['_id'], read_seq) for entry in entries]
+        
+        merged = list(heapq.merge(
+            personal, inbox, key=lambda n: (n['created_at'], n['id']), reverse=True
+        ))
+        
+        next_cursor = None
+        if len(merged) > limit:
+            merged = merged[:limit]
+            next_cursor = encode_cursor(merged[-1]['created_at'], merged[-1]['id'])
+        return merged, next_cursor
+    
+    @staticmethod
+    def count_unread(user_id):
+        """
+        Count a user's unread notifications, including their ministry's inbox.
+        Reads only counters: the user's, plus the ministry's for officers.
+        """
+        user = User.find_by_id(user_id)
+        if not user:
+            return 0
+        
+        if 'unread_notifications' in user:
+            unread = max(user['unread_notifications'], 0)
+        else:
+            unread = Notification.recount_unread(user_id)
+        if user.get('ministry_id'):
+            unread += MinistryInbox.unread_count(user)
+        return unread
+    
+    @staticmethod
+    def mark_as_read(user_id, notification_id):
+        """
+        Mark one of the user's notifications as read. For a ministry inbox
+        entry this moves the user's read watermark up to it, which also marks
+        older entries read. Returns False if there is no such notification.
+        """
+        if Notification.mark_as_read(notification_id, user_id):
+            return True
+        
+        entry = MinistryInbox.find_by_id(notification_id)
+        user = User.find_by_id(user_id)
+        if not entry or not user or entry['ministry_id'] != user.get('ministry_id'):
+            return False
+        return MinistryInbox.mark_read(user_id, entry.get('seq', 0))
+    
+    @staticmethod
+    def mark_all_as_read(user_id):
+        """Mark all of a user's notifications and ministry inbox entries as read."""
+        user = User.find_by_id(user_id)
+        if user and user.get('ministry_id'):
+            MinistryInbox.mark_all_read(user)
+        return Notification.mark_all_as_read(user_id)
     
     @staticmethod
     def notify_status_updated(user_id, issue_id, new_status):
@@ -105,33 +217,33 @@ class NotificationService:
     
     @staticmethod
     def send_push_notification(user_id, title, message):
-        """
-        Send push notification via Firebase Cloud Messaging.
-        This is a placeholder - implement actual Firebase integration.
-        """
-        # TODO: Implement Firebase Cloud Messaging
-        # 1. Get user's FCM token from database
-        # 2. Send notification via Firebase Admin SDK
-        pass
+        """Queue a push notification to all of the user's devices (sent by DeliveryService)."""
+        user = User.find_by_id(user_id)
+        if not user:
+            return 0
+        return NotificationService._queue(
+            'push', user, user.get('fcm_tokens', []), title, message
+        )
     
     @staticmethod
     def send_email_notification(user_id, subject, body):
-        """
-        Send email notification.
-        This is a placeholder - implement actual email sending.
-        """
-        # TODO: Implement email sending
-        # 1. Get user email
-        # 2. Send via SMTP or service like SendGrid
-        pass
+        """Queue an email to the user (sent by DeliveryService)."""
+        user = User.find_by_id(user_id)
+        if not user or not user.get('email'):
+            return 0
+        return NotificationService._queue('email', user, [user['email']], subject, body)
     
     @staticmethod
     def send_sms_notification(user_id, message):
-        """
-        Send SMS notification.
-        This is a placeholder - implement actual SMS sending.
-        """
-        # TODO: Implement SMS sending
-        # 1. Get user phone number
-        # 2. Send via SMS gateway (Dialog/Mobitel API)
-        pass
+        """Queue an SMS to the user (sent by DeliveryService)."""
+        user = User.find_by_id(user_id)
+        if not user or not user.get('phone'):
+            return 0
+        return NotificationService._queue('sms', user, [user['phone']], 'CivikLink', message)
+    
+    @staticmethod
+    def _queue(channel, user, recipients, title, body):
+        return Delivery.enqueue_many([
+            {'channel': channel, 'user_id': user['_id'], 'to': to, 'title': title, 'body': body}
+            for to in recipients
+        ])
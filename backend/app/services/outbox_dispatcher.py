@@ -0,0 +1,171 @@
+"""
+Outbox dispatcher - Runs the side effects recorded in issue outboxes in the background.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from app.models.outbox import Outbox
+from app.models.issue import Issue
+from app.models.latency import LatencyStats
+from app.services.notification_service import NotificationService
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+def _issue_created(issue, event):
+    NotificationService.notify_ministries_tagged(issue.get('tagged_ministries', []), str(issue['_id']))
+
+def _issue_verified(issue, event):
+    NotificationService.notify_issue_verified(str(issue['user_id']), str(issue['_id']))
+
+def _government_responded(issue, event):
+    ministry_id = str(event['payload']['ministry_id'])
+    NotificationService.notify_government_response(str(issue['user_id']), str(issue['_id']), ministry_id)
+    
+    # Time to first response: only the response that set first_responded_at counts
+    responded_at = event['payload'].get('responded_at')
+    if responded_at and responded_at == issue.get('first_responded_at'):
+        _observe('response', issue, responded_at, [event['payload']['ministry_id']])
+
+def _ngo_claimed(issue, event):
+    ngo_id = str(event['payload']['ngo_id'])
+    NotificationService.notify_ngo_claimed(str(issue['user_id']), str(issue['_id']), ngo_id)
+
+def _status_changed(issue, event):
+    NotificationService.notify_status_updated(
+        str(issue['user_id']), str(issue['_id']), event['payload']['status']
+    )
+    if event['payload']['status'] == 'solved':
+        _observe_resolution(issue)
+
+def _issue_closed(issue, event):
+    _observe_resolution(issue)
+
+def _observe_resolution(issue):
+    # Time to resolution runs to the first solve (resolved_at), once per issue
+    # however many solved and closed events follow
+    if issue.get('resolved_at'):
+        _observe('resolution', issue, issue['resolved_at'], issue.get('tagged_ministries', []))
+
+def _stats_changed(issue, event):
+    # Idempotent: a retry finds the counters already in step (see Issue.sync_stats)
+    Issue.sync_stats(issue['_id'])
+
+def _observe(metric, issue, at, ministry_ids):
+    if not issue.get('created_at') or not Issue.claim_latency(issue['_id'], metric):
+        return
+    LatencyStats.observe(
+        metric, (at - issue['created_at']).total_seconds(), ministry_ids,
+        (issue.get('location') or {}).get('district'), issue.get('category')
+    )
+
+class OutboxDispatcher:
+    """
+    Drains issue outboxes (see Outbox) with a pool of worker threads.
+    
+    Delivery is at-least-once: an event is removed only after its handler
+    returns, and an event claimed by a worker that dies is retried once its
+    lease expires, so handlers may run more than once for the same event.
+    Failed events are retried with exponential backoff and moved to the
+    outbox_dead collection after OUTBOX_MAX_ATTEMPTS attempts.
+    """
+    
+    HANDLERS = {
+        'issue_created': _issue_created,
+        'issue_verified': _issue_verified,
+        'government_responded': _government_responded,
+        'ngo_claimed': _ngo_claimed,
+        'status_changed': _status_changed,
+        'issue_closed': _issue_closed,
+        'stats_changed': _stats_changed
+    }
+    
+    poll_interval = 1.0
+    lease_seconds = 60
+    max_attempts = 8
+    backoff_base = 2.0
+    backoff_max = 600
+    
+    @staticmethod
+    def init_app(app, workers=None):
+        """Start dispatcher threads (OUTBOX_WORKERS unless workers is given)."""
+        OutboxDispatcher.poll_interval = app.config['OUTBOX_POLL_INTERVAL']
+        OutboxDispatcher.lease_seconds = app.config['OUTBOX_LEASE_SECONDS']
+        OutboxDispatcher.max_attempts = app.config['OUTBOX_MAX_ATTEMPTS']
+        OutboxDispatcher.backoff_base = app.config['OUTBOX_BACKOFF_BASE']
+        OutboxDispatcher.backoff_max = app.config['OUTBOX_BACKOFF_MAX']
+        
+        metrics.gauge('outbox_lag_seconds', OutboxDispatcher.lag,
+                      'Age of the oldest outbox event not yet dispatched')
+        
+        workers = app.config['OUTBOX_WORKERS'] if workers is None else workers
+        threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=OutboxDispatcher._run, name=f'outbox-{i}', daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+    
+    @staticmethod
+    def dispatch_once():
+        """Claim and handle one due event. Returns False when there was nothing to do."""
+        claimed = Outbox.claim(OutboxDispatcher.lease_seconds)
+        if not claimed:
+            return False
+        issue, event = claimed
+        
+        try:
+            handler = OutboxDispatcher.HANDLERS[event['type']]
+            handler(issue, event)
+        except Exception as e:
+            OutboxDispatcher._failed(issue, event, e)
+            return True
+        
+        Outbox.ack(issue['_id'], event['id'])
+        metrics.inc('outbox_dispatched_total', 1, 'Outbox events handled')
+        return True
+    
+    @staticmethod
+    def drain():
+        """Dispatch events until none is due. Returns the number handled."""
+        handled = 0
+        while OutboxDispatcher.dispatch_once():
+            handled += 1
+        return handled
+    
+    @staticmethod
+    def lag():
+        """Seconds since the oldest pending event was recorded (0 when empty)."""
+        oldest = Outbox.oldest_pending()
+        return round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0
+    
+    @staticmethod
+    def _failed(issue, event, error):
+        error = f'{type(error).__name__}: {error}'
+        metrics.inc('outbox_failures_total', 1, 'Outbox event handler failures')
+        
+        if event['attempts'] >= OutboxDispatcher.max_attempts:
+            logger.error('Outbox event %s (%s) failed %d times, giving up: %s',
+                         event['id'], event['type'], event['attempts'], error)
+            Outbox.dead_letter(issue['_id'], event, error)
+            metrics.inc('outbox_dead_letters_total', 1, 'Outbox events moved to outbox_dead')
+            return
+        
+        # Exponential backoff with jitter so failing events do not retry in lockstep
+        delay = min(OutboxDispatcher.backoff_base * 2 ** (event['attempts'] - 1), OutboxDispatcher.backoff_max)
+        delay *= random.uniform(0.5, 1.0)
+        logger.warning('Outbox event %s (%s) failed, retrying in %.1fs: %s',
+                       event['id'], event['type'], delay, error)
+        Outbox.retry(issue['_id'], event['id'], delay, error)
+    
+    @staticmethod
+    def _run():
+        while True:
+            try:
+                if OutboxDispatcher.dispatch_once():
+                    continue
+            except Exception:
+                logger.exception('Outbox dispatcher error')
+            time.sleep(OutboxDispatcher.poll_interval)
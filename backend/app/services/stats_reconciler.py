@@ -0,0 +1,66 @@
+"""
+Stats reconciler - Periodically recounts the denormalized counters, repairs drift and rebuilds the leaderboard.
+"""
+import logging
+import threading
+import time
+from app.models.issue import Issue
+from app.models.ministry import Ministry
+from app.models.ngo import NGO
+from app.models.leaderboard import Leaderboard
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+class StatsReconciler:
+    """
+    Recounts ministry and NGO performance counters and issue verification
+    counts every STATS_RECONCILE_INTERVAL seconds (see
+    Ministry.reconcile_stats, NGO.reconcile_stats and
+    Issue.reconcile_verifications).
+    
+    The counters are adjusted by the issue and verification writes
+    themselves, in a separate write, so a process dying between the two
+    leaves them off by one. Drift found by a run is logged, counted in the
+    stats_drift_fields_total metric and corrected. The leaderboard is then rebuilt from the corrected
+    counters, which also moves its 30 and 7 day windows along.
+    """
+    
+    interval = 0
+    
+    @staticmethod
+    def init_app(app, interval=None):
+        """Start the reconcile thread (every STATS_RECONCILE_INTERVAL seconds unless interval is given; 0 disables)."""
+        StatsReconciler.interval = app.config['STATS_RECONCILE_INTERVAL'] if interval is None else interval
+        if not StatsReconciler.interval:
+            return None
+        
+        thread = threading.Thread(target=StatsReconciler._run, name='stats-reconciler', daemon=True)
+        thread.start()
+        return thread
+    
+    @staticmethod
+    def reconcile():
+        """Run one reconciliation. Returns the drift that was corrected, by collection."""
+        drift = {
+            'ministries': Ministry.reconcile_stats(),
+            'ngos': NGO.reconcile_stats(),
+            'issues': Issue.reconcile_verifications()
+        }
+        for collection, corrected in drift.items():
+            fields = sum(len(diff) for diff in corrected.values())
+            if fields:
+                logger.warning('Corrected %d drifted counters on %d %s: %s', fields, len(corrected), collection, corrected)
+                metrics.inc('stats_drift_fields_total', fields, 'Performance counters found wrong and corrected')
+        Leaderboard.rebuild()
+        metrics.inc('stats_reconcile_runs_total', 1, 'Performance counter reconciliations run')
+        return drift
+    
+    @staticmethod
+    def _run():
+        while True:
+            time.sleep(StatsReconciler.interval)
+            try:
+                StatsReconciler.reconcile()
+            except Exception:
+                logger.exception('Stats reconciliation failed')
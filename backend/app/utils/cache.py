@@ -0,0 +1,83 @@
+"""
+HTTP caching helpers.
+"""
+import logging
+import threading
+import time
+from flask import request, jsonify, current_app
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_snapshots = {}  # key -> {'lock', 'payload', 'expires_at', 'refreshing'}
+
+def conditional_json(payload, max_age=0, public=True, stale_while_revalidate=0):
+    """
+    JSON response with an ETag of its body and a Cache-Control header.
+    Answers 304 Not Modified, without a body, when the client's
+    If-None-Match matches.
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if stale_while_revalidate:
+        response.cache_control['stale-while-revalidate'] = stale_while_revalidate
+    return response.make_conditional(request)
+
+def snapshot(key, compute, ttl):
+    """
+    The payload compute() returned for key, computed at most once every ttl
+    seconds per process (0 disables caching).
+    
+    Once a snapshot is older than ttl it is still served, and a single
+    background thread computes the next one (stale-while-revalidate). Only
+    the first request for a key waits, and concurrent first requests share
+    one computation. Payloads are shared between requests: do not modify them.
+    """
+    if not ttl:
+        return compute()
+    
+    with _lock:
+        entry = _snapshots.setdefault(key, {'lock': threading.Lock(), 'refreshing': False})
+        if 'payload' in entry:
+            if time.monotonic() >= entry['expires_at'] and not entry['refreshing']:
+                entry['refreshing'] = True
+                threading.Thread(
+                    target=_refresh, args=(current_app._get_current_object(), key, compute, ttl),
+                    name=f'snapshot-{key}', daemon=True
+                ).start()
+            return entry['payload']
+    
+    with entry['lock']:
+        if 'payload' not in entry:
+            _store(entry, compute(), ttl)
+        return entry['payload']
+
+def snapshot_json(key, compute, ttl):
+    """snapshot() as a conditional JSON response that browsers and proxies may also cache for ttl seconds."""
+    return conditional_json(snapshot(key, compute, ttl), max_age=ttl, stale_while_revalidate=ttl)
+
+def _refresh(app, key, compute, ttl):
+    entry = _snapshots[key]
+    try:
+        with app.app_context():
+            payload = compute()
+        _store(entry, payload, ttl)
+        metrics.inc('snapshot_refreshes_total', 1, 'Cached snapshots recomputed in the background')
+    except Exception:
+        # Keep serving the stale snapshot; the next request retries
+        logger.exception('Refreshing snapshot %s failed', key)
+        metrics.inc('snapshot_refresh_failures_total', 1, 'Background snapshot refreshes that failed')
+    finally:
+        with _lock:
+            entry['refreshing'] = False
+
+def _store(entry, payload, ttl):
+    # expires_at first: readers take the presence of payload to mean both are set
+    entry['expires_at'] = time.monotonic() + ttl
+    entry['payload'] = payload
@@ -0,0 +1,55 @@
+"""
+JSON provider - Fast response serialization with native MongoDB type support.
+"""
+from datetime import date
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+def _default(value):
+    """Encode types the JSON encoder does not handle natively."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes ObjectId as a hex string and datetimes as
+    ISO 8601, so documents can be returned without per-field conversion.
+    Uses orjson when it is installed.
+    """
+    
+    ensure_ascii = False
+    sort_keys = False
+    
+    def dumps(self, obj, **kwargs):
+        """Serialize data as a JSON string."""
+        if orjson is None:
+            kwargs.setdefault('default', _default)
+            return super().dumps(obj, **kwargs)
+        
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys'):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    
+    def response(self, *args, **kwargs):
+        """Serialize the arguments as JSON and wrap them in a response."""
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        
+        body = orjson.dumps(obj, default=_default, option=option)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,44 @@
+"""
+Metrics - In-process counters and gauges, exported in the Prometheus text format.
+"""
+import threading
+
+_lock = threading.Lock()
+_counters = {}  # name -> [help, value]
+_gauges = {}  # name -> (help, fn)
+
+def inc(name, amount=1, help_text=''):
+    """Increment a counter."""
+    with _lock:
+        counter = _counters.setdefault(name, [help_text, 0])
+        counter[1] += amount
+
+def gauge(name, fn, help_text=''):
+    """Register a gauge whose value is read from fn() when metrics are scraped."""
+    with _lock:
+        _gauges[name] = (help_text, fn)
+
+def value(name):
+    """Get the current value of a counter or gauge (None if unknown)."""
+    with _lock:
+        if name in _counters:
+            return _counters[name][1]
+        gauge_entry = _gauges.get(name)
+    return gauge_entry[1]() if gauge_entry else None
+
+def render():
+    """Render all metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = [(name, help_text, v) for name, (help_text, v) in _counters.items()]
+        gauges = list(_gauges.items())
+    
+    lines = []
+    for name, help_text, v in sorted(counters):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {v}']
+    for name, (help_text, fn) in sorted(gauges):
+        try:
+            v = fn()
+        except Exception:
+            continue  # A broken gauge must not take down the endpoint
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {v}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,45 @@
+"""
+MinHash utilities - Compact text signatures for near-duplicate detection.
+"""
+import random
+import zlib
+from app.utils.text import tokenize
+
+NUM_HASHES = 64
+BANDS = 32  # LSH bands of NUM_HASHES // BANDS rows; catches most pairs above ~0.4 similarity
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored, so the hash family must never change between runs
+_rng = random.Random(20240611)
+_HASHES = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+def shingles(text):
+    """Character shingles of the normalized text, so word order and inflection matter less."""
+    joined = ' '.join(tokenize(text))
+    if len(joined) <= SHINGLE_SIZE:
+        return {joined} if joined else set()
+    return {joined[i:i + SHINGLE_SIZE] for i in range(len(joined) - SHINGLE_SIZE + 1)}
+
+def signature(text):
+    """Compute the MinHash signature of text (NUM_HASHES integers), or None if it has no words."""
+    # crc32 rather than hash(): str hashes are randomized per process
+    values = [zlib.crc32(s.encode('utf-8')) for s in shingles(text)]
+    if not values:
+        return None
+    return [min((a * v + b) % _PRIME for v in values) for a, b in _HASHES]
+
+def bands(sig):
+    """LSH band keys of a signature, for indexed candidate lookup."""
+    rows = NUM_HASHES // BANDS
+    keys = []
+    for band in range(BANDS):
+        chunk = ','.join(map(str, sig[band * rows:(band + 1) * rows]))
+        keys.append((band << 32) | zlib.crc32(chunk.encode('ascii')))
+    return keys
+
+def similarity(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_HASHES
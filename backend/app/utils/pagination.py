@@ -0,0 +1,198 @@
+"""
+Pagination utilities - page/limit parsing, opaque keyset cursors and sparse fieldsets.
+"""
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+def get_page_args():
+    """Parse page/limit query args. Returns (page, limit, skip)."""
+    page = max(int(request.args.get('page', 1)), 1)
+    limit = int(request.args.get('limit', current_app.config['DEFAULT_PAGE_SIZE']))
+    limit = min(max(limit, 1), current_app.config['MAX_PAGE_SIZE'])
+    return page, limit, (page - 1) * limit
+
+def include_total():
+    """Whether the client asked for a total count in cursor mode (?total=true)."""
+    return request.args.get('total', 'false').lower() == 'true'
+
+def get_viewer_id():
+    """
+    Identity of the signed-in viewer, or None. Public endpoints treat an
+    expired or invalid token like no token instead of rejecting the request.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return get_jwt_identity()
+
+def get_field_args(allowed_fields, card_fields, default_view='full'):
+    """
+    Parse the `view` (card|full) and `fields` query args.
+    Returns (fields, viewer_id); fields is None for the full view.
+    Raises ValueError for an unknown view or field.
+    """
+    view = request.args.get('view', default_view)
+    fields_arg = request.args.get('fields')
+    
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    elif view == 'card':
+        fields = list(card_fields)
+    elif view == 'full':
+        fields = None
+    else:
+        raise ValueError('View must be card or full')
+    
+    return fields, get_viewer_id()
+
+def encode_cursor(created_at, doc_id):
+    """Encode a (created_at, _id) position as an opaque URL-safe token."""
+    payload = json.dumps([created_at.isoformat(), str(doc_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """
+    Decode a token produced by encode_cursor.
+    Returns (created_at, ObjectId); raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except (TypeError, ValueError, InvalidId):
+        raise ValueError('Invalid cursor')
+
+def keyset_filter(filters, after):
+    """
+    Extend filters so only documents after the (created_at, _id) position
+    match, assuming a newest-first (created_at, _id) sort.
+    """
+    if after is None:
+        return dict(filters)
+    
+    created_at, doc_id = after
+    condition = {
+        '$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': doc_id}}
+        ]
+    }
+    
+    if '$or' in filters:
+        return {'$and': [filters, condition]}
+    return {**filters, **condition}
+
+def facet_page(collection, filters, sort, skip, limit, projection=None, total_cap=None):
+    """
+    Fetch one page of documents and the matching total in a single round trip.
+    
+    The total is counted with $facet alongside the page. With total_cap the
+    scan stops after that many matches and the total is a lower bound.
+    Unfiltered totals come from the collection metadata instead.
+    Returns (docs, total, capped).
+    """
+    if not filters:
+        cursor = collection.find({}, projection).sort(sort).skip(skip).limit(limit)
+        return list(cursor), collection.estimated_document_count(), False
+    
+    pipeline = [{'$match': filters}, {'$sort': dict(sort)}]
+    if total_cap:
+        total_cap = max(total_cap, skip + limit)
+        pipeline.append({'$limit': total_cap})
+    
+    items = [{'$skip': skip}, {'$limit': limit}]
+    if projection:
+        items.append({'$project': projection})
+    
+    pipeline.append({
+        '$facet': {
+            'items': items,
+            'total': [{'$count': 'n'}]
+        }
+    })
+    
+    result = next(collection.aggregate(pipeline))
+    total = result['total'][0]['n'] if result['total'] else 0
+    return result['items'], total, bool(total_cap) and total >= total_cap
+
+def issue_list_response(filters, default_view='full'):
+    """
+    Build the paginated JSON response for an issue list endpoint.
+    
+    Passing `cursor` (empty for the first page) switches to keyset mode, which
+    returns `next_cursor` and only counts the total when `total=true`.
+    Passing `lat`/`lng` (and optionally `radius` in km) returns the nearest
+    issues first. Otherwise classic page/limit pagination is used.
+    `view`/`fields` select a sparse fieldset that is pushed down as a projection.
+    """
+    from app.models.issue import Issue
+    
+    page, limit, skip = get_page_args()
+    
+    try:
+        fields, viewer_id = get_field_args(Issue.FIELDS, Issue.CARD_FIELDS, default_view)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    lat = request.args.get('lat')
+    lng = request.args.get('lng')
+    
+    if lat and lng:
+        try:
+            radius = float(request.args.get('radius', 5))
+            issues, total = Issue.search_nearby(
+                lat, lng, radius, filters, skip, limit, fields, viewer_id,
+                current_app.config['PAGE_TOTAL_CAP']
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid coordinates or radius'}), 400
+        
+        return jsonify({
+            'issues': issues,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total,
+                'pages': (total + limit - 1) // limit
+            }
+        }), 200
+    
+    if 'cursor' in request.args:
+        try:
+            issues, next_cursor = Issue.get_after(
+                filters, request.args['cursor'], limit, fields, viewer_id
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        pagination = {'limit': limit, 'next_cursor': next_cursor}
+        if include_total():
+            pagination['total'] = Issue.count(filters)
+        
+        return jsonify({'issues': issues, 'pagination': pagination}), 200
+    
+    issues, total, capped = Issue.page(
+        filters, skip, limit, fields, viewer_id, current_app.config['PAGE_TOTAL_CAP']
+    )
+    
+    return jsonify({
+        'issues': issues,
+        'pagination': {
+            'page': page,
+            'limit': limit,
+            'total': total,
+            'pages': (total + limit - 1) // limit,
+            'total_capped': capped
+        }
+    }), 200
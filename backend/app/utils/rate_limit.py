@@ -0,0 +1,33 @@
+"""
+Rate limiting helpers.
+"""
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to
+    `capacity`. take() blocks until the tokens are available.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def take(self, tokens=1):
+        """Take tokens, sleeping as long as needed. Returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Go into debt instead of waiting for a full batch to fit, so
+            # batches larger than the capacity still get through at `rate`
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        
+        if wait:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,51 @@
+"""
+Quantile sketch utilities - Mergeable log-bucket histograms (DDSketch) for latency quantiles.
+
+A value v > 1 is counted in bucket ceil(log(v) / log(GAMMA)) and values up
+to 1 in bucket 0. Any quantile read back from the buckets is within
+RELATIVE_ACCURACY of the true value. Buckets are plain counters, so a sketch
+can be updated with a single $inc per value and sketches merge by adding
+their buckets: concurrent writers and roll-ups lose no accuracy.
+"""
+import math
+from collections import Counter
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+def bucket(value):
+    """Bucket key of a value (as a string, for use in a field name)."""
+    if value <= 1:
+        return '0'
+    return str(math.ceil(math.log(value) / _LOG_GAMMA))
+
+def bucket_value(key):
+    """Representative value of a bucket, within RELATIVE_ACCURACY of anything counted in it."""
+    key = int(key)
+    if key <= 0:
+        return 1.0
+    return 2 * GAMMA ** key / (GAMMA + 1)
+
+def merge(*sketches):
+    """Add sketches' bucket counts together."""
+    merged = Counter()
+    for buckets in sketches:
+        for key, n in (buckets or {}).items():
+            merged[key] += n
+    return dict(merged)
+
+def quantile(buckets, q):
+    """Estimate the q-quantile (0 <= q <= 1) of the values in buckets, or None if empty."""
+    keys = sorted((int(key), n) for key, n in (buckets or {}).items() if n > 0)
+    total = sum(n for _, n in keys)
+    if not total:
+        return None
+    
+    rank = q * (total - 1)
+    seen = 0
+    for key, n in keys:
+        seen += n
+        if seen > rank:
+            return bucket_value(key)
+    return bucket_value(keys[-1][0])
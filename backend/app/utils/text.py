@@ -0,0 +1,34 @@
+"""
+Text utilities - Unicode-aware normalization and tokenization for
+English, Sinhala and Tamil text.
+"""
+import unicodedata
+
+# Zero-width joiners/non-joiners appear inside Sinhala and Tamil conjuncts
+# depending on the input method; drop them so both spellings match.
+_IGNORABLE = dict.fromkeys(map(ord, '\u200b\u200c\u200d\ufeff'))
+
+def normalize(text):
+    """NFKC-normalize, case-fold and strip zero-width characters."""
+    if not text:
+        return ''
+    return unicodedata.normalize('NFKC', str(text)).translate(_IGNORABLE).casefold()
+
+def _is_word_char(ch):
+    # Letters, numbers and combining marks. Sinhala/Tamil vowel signs and the
+    # virama are marks (Mn/Mc), so a plain \w split would cut words apart.
+    return unicodedata.category(ch)[0] in ('L', 'M', 'N')
+
+def tokenize(text):
+    """Split text into normalized word tokens."""
+    tokens = []
+    current = []
+    for ch in normalize(text):
+        if _is_word_char(ch):
+            current.append(ch)
+        elif current:
+            tokens.append(''.join(current))
+            current = []
+    if current:
+        tokens.append(''.join(current))
+    return tokens
@@ -3,6 +3,19 @@ Validation utilities.
 """
 import re
 
+# Sri Lankan districts, grouped by province
+DISTRICTS = [
+    "Colombo", "Gampaha", "Kalutara",  # Western
+    "Kandy", "Matale", "Nuwara Eliya",  # Central
+    "Galle", "Matara", "Hambantota",  # Southern
+    "Jaffna", "Kilinochchi", "Mannar", "Vavuniya", "Mullaitivu",  # Northern
+    "Batticaloa", "Ampara", "Trincomalee",  # Eastern
+    "Kurunegala", "Puttalam",  # North Western
+    "Anuradhapura", "Polonnaruwa",  # North Central
+    "Badulla", "Monaragala",  # Uva
+    "Ratnapura", "Kegalle"  # Sabaragamuwa
+]
+
 def validate_email(email):
     """Validate email format."""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -97,18 +110,7 @@ def validate_category(category):
 
 def validate_district(district):
     """Validate Sri Lankan district."""
-    valid_districts = [
-        "Colombo", "Gampaha", "Kalutara",
-        "Kandy", "Matale", "Nuwara Eliya",
-        "Galle", "Matara", "Hambantota",
-        "Jaffna", "Kilinochchi", "Mannar", "Vavuniya", "Mullaitivu",
-        "Batticaloa", "Ampara", "Trincomalee",
-        "Kurunegala", "Puttalam",
-        "Anuradhapura", "Polonnaruwa",
-        "Badulla", "Monaragala",
-        "Ratnapura", "Kegalle"
-    ]
-    return district in valid_districts
+    return district in DISTRICTS
 
 def validate_status(status):
     """Validate issue status."""
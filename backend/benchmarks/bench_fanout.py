@@ -0,0 +1,89 @@
+"""
+Benchmark: notifying the staff of the ministries tagged to a new issue.
+
+Compares three paths:
+- per_user: find_by_id per ministry, then one insert_one per assigned user.
+- batched: one $in query, then one unordered insert_many of a copy per user.
+- inbox: NotificationService.notify_ministries_tagged, which writes one
+  ministry inbox entry per ministry.
+Runs against the database in MONGO_URI using throwaway ministries. The
+documents created are deleted afterwards.
+
+Usage: python benchmarks/bench_fanout.py [ministries] [staff_per_ministry] [rounds]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+
+def main():
+    ministries = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    staff = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    
+    app = create_app(start_workers=False)
+    with app.app_context():
+        from app import db
+        from app.models.ministry import Ministry
+        from app.models.notification import Notification
+        from app.services.notification_service import NotificationService
+        
+        ministry_ids = db.ministries.insert_many([
+            {'name_en': f'bench_fanout {i}', 'assigned_users': [ObjectId() for _ in range(staff)]}
+            for i in range(ministries)
+        ]).inserted_ids
+        issue_ids = []
+        
+        def per_user(issue_id):
+            for ministry_id in ministry_ids:
+                ministry = Ministry.find_by_id(ministry_id)
+                for user_id in ministry.get('assigned_users', []):
+                    Notification.create(str(user_id), 'issue_tagged', 'New Issue Tagged',
+                                        'A new issue has been tagged to your ministry.', issue_id)
+        
+        def batched(issue_id):
+            ministries = db.ministries.find({'_id': {'$in': ministry_ids}}, {'assigned_users': 1})
+            recipients = [u for ministry in ministries for u in ministry['assigned_users']]
+            now = datetime.utcnow()
+            db.notifications.insert_many([{
+                'user_id': user_id, 'type': 'issue_tagged', 'title': 'New Issue Tagged',
+                'message': 'A new issue has been tagged to your ministry.',
+                'issue_id': ObjectId(issue_id), 'read': False, 'created_at': now
+            } for user_id in recipients], ordered=False)
+            db.users.update_many({'_id': {'$in': recipients}}, {'$inc': {'unread_notifications': 1}})
+        
+        def inbox(issue_id):
+            NotificationService.notify_ministries_tagged(ministry_ids, issue_id)
+        
+        def written(issue_id):
+            return (db.notifications.count_documents({'issue_id': issue_id})
+                    + db.ministry_inbox.count_documents({'issue_id': issue_id}))
+        
+        try:
+            results = {}
+            for name, fn in [('per_user', per_user), ('batched', batched), ('inbox', inbox)]:
+                timings = []
+                for _ in range(rounds):
+                    issue_id = ObjectId()
+                    issue_ids.append(issue_id)
+                    started = time.perf_counter()
+                    fn(str(issue_id))
+                    timings.append(time.perf_counter() - started)
+                    docs = written(issue_id)
+                results[name] = (sorted(timings)[len(timings) // 2], docs)
+        finally:
+            db.ministries.delete_many({'_id': {'$in': ministry_ids}})
+            db.notifications.delete_many({'issue_id': {'$in': issue_ids}})
+            db.ministry_inbox.delete_many({'issue_id': {'$in': issue_ids}})
+        
+        print(f'{ministries} ministries x {staff} staff, median of {rounds} rounds')
+        for name, (elapsed, docs) in results.items():
+            print(f'  {name:<9} {elapsed * 1000:9.1f} ms  {docs:6d} documents')
+
+if __name__ == '__main__':
+    main()
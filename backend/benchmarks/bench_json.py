@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: serializing a 100-issue feed page.
+
+Compares the previous path (to_dict with per-field str()/isoformat(), then
+the stdlib provider) with the MongoJSONProvider path.
+No database is needed; documents are generated in memory.
+
+Usage: python benchmarks/bench_json.py [iterations]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.issue import Issue
+from app.utils.json_provider import MongoJSONProvider, orjson
+
+PAGE_SIZE = 100
+
+def make_issue(i):
+    """Build a realistic issue document."""
+    now = datetime.utcnow()
+    return {
+        '_id': ObjectId(),
+        'user_id': ObjectId(),
+        'title': f'Water pipe burst near junction {i}',
+        'description': 'No water supply in the area since yesterday morning. ' * 4,
+        'category': 'water',
+        'location': {
+            'address': f'{i} Galle Road, Colombo 03',
+            'district': 'Colombo',
+            'coordinates': [6.9 + i / 1000, 79.85]
+        },
+        'images': [f'https://res.cloudinary.com/civiklink/image/{i}.jpg'],
+        'tagged_ministries': [ObjectId(), ObjectId()],
+        'verification_count': 25,
+        'status': 'in_progress',
+        'priority': 'high',
+        'is_crisis': False,
+        'government_response': {
+            'ministry_id': ObjectId(),
+            'message': 'Repair crew dispatched',
+            'action_taken': 'Crew assigned',
+            'responded_at': now
+        },
+        'ngo_claim': None,
+        'solution_verified': False,
+        'verified_at': None,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now
+    }
+
+def legacy_to_dict(issue):
+    """Issue.to_dict as it was before the JSON provider."""
+    response = issue.get('government_response')
+    if response:
+        # The stdlib encoder cannot handle the nested ObjectId/datetime
+        response = dict(response, ministry_id=str(response['ministry_id']),
+                        responded_at=response['responded_at'].isoformat())
+    return {
+        'id': str(issue['_id']),
+        'user_id': str(issue['user_id']),
+        'title': issue['title'],
+        'description': issue['description'],
+        'category': issue['category'],
+        'location': issue['location'],
+        'images': issue.get('images', []),
+        'tagged_ministries': [str(m) for m in issue.get('tagged_ministries', [])],
+        'verification_count': issue.get('verification_count', 0),
+        'status': issue['status'],
+        'priority': issue.get('priority', 'medium'),
+        'is_crisis': issue.get('is_crisis', False),
+        'government_response': response,
+        'ngo_claim': issue.get('ngo_claim'),
+        'solution_verified': issue.get('solution_verified', False),
+        'verified_at': issue['verified_at'].isoformat() if issue.get('verified_at') else None,
+        'created_at': issue['created_at'].isoformat(),
+        'updated_at': issue['updated_at'].isoformat()
+    }
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    docs = [make_issue(i) for i in range(PAGE_SIZE)]
+    
+    legacy_app = Flask('legacy')
+    legacy_app.json = DefaultJSONProvider(legacy_app)
+    fast_app = Flask('fast')
+    fast_app.json = MongoJSONProvider(fast_app)
+    
+    def legacy():
+        with legacy_app.app_context():
+            return legacy_app.json.response({'issues': [legacy_to_dict(d) for d in docs]}).data
+    
+    def fast():
+        with fast_app.app_context():
+            return fast_app.json.response({'issues': [Issue.to_dict(d) for d in docs]}).data
+    
+    # Both paths must produce the same document
+    assert legacy_app.json.loads(legacy()) == fast_app.json.loads(fast())
+    
+    print(f'{PAGE_SIZE}-issue page, {iterations} iterations '
+          f'(orjson {"enabled" if orjson else "not installed"})')
+    results = {}
+    for name, fn in [('legacy', legacy), ('provider', fast)]:
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        results[name] = seconds
+        print(f'  {name:<9} {seconds / iterations * 1000:8.3f} ms/page  '
+              f'{len(fn()) / 1024:7.1f} KiB')
+    print(f'  speedup   {results["legacy"] / results["provider"]:8.2f}x')
+
+if __name__ == '__main__':
+    main()
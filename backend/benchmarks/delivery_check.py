@@ -0,0 +1,210 @@
+"""
+End-to-end check of push/email/SMS delivery against local stand-ins.
+
+Starts a local SMTP sink and a local HTTP stub, which acts as both the SMS
+gateway and the FCM v1 endpoint (the Firebase Admin SDK is pointed at it
+with anonymous credentials). The DeliveryService workers are pointed at
+them and a batch of messages is queued on each channel. The stub fails a
+share of the requests with 503 and rejects device tokens starting with
+"bad". The check then verifies:
+- every good message is delivered exactly once;
+- rejected tokens end up in delivery_dead;
+- transient failures are retried;
+- the workers reused their connections.
+Runs against the database in MONGO_URI; the jobs it creates are deleted
+afterwards.
+
+Usage: python benchmarks/delivery_check.py [messages_per_channel] [workers] [failure_rate]
+"""
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bson import ObjectId
+import firebase_admin
+from firebase_admin import credentials, messaging
+from google.auth.credentials import AnonymousCredentials
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import Config
+
+stats = Counter()
+received = Counter()
+stats_lock = threading.Lock()
+
+def count(counter, key, amount=1):
+    with stats_lock:
+        counter[key] += amount
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail; counts sessions and messages."""
+    
+    def handle(self):
+        count(stats, 'smtp_connections')
+        self.reply('220 sink ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 sink')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().strip() != b'.':
+                    pass
+                for recipient in recipients:
+                    count(received, ('email', recipient))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+    
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+class StubCredential(credentials.Base):
+    """No OAuth tokens: the stub does not check them."""
+    
+    def get_credential(self):
+        return AnonymousCredentials()
+
+class HTTPStub(BaseHTTPRequestHandler):
+    """SMS gateway (/sms) and FCM v1 (/v1/projects/...) stand-in with injected failures."""
+    
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    failure_rate = 0.0
+    
+    def setup(self):
+        super().setup()
+        count(stats, 'http_connections')
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        count(stats, 'http_requests')
+        if random.random() < HTTPStub.failure_rate:
+            count(stats, 'http_503')
+            return self.respond(503, {'error': 'try again'})
+        
+        if self.path == '/sms':
+            count(received, ('sms', body['to']))
+            return self.respond(200, {'status': 'queued'})
+        
+        # FCM v1 takes one token per request
+        token = body['message']['token']
+        count(stats, 'push_requests')
+        if token.startswith('bad'):
+            return self.respond(404, {'error': {
+                'code': 404, 'status': 'NOT_FOUND', 'message': 'Requested entity was not found.',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError', 'errorCode': 'UNREGISTERED'}]
+            }})
+        count(received, ('push', token))
+        self.respond(200, {'name': f'projects/check/messages/{ObjectId()}'})
+    
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    HTTPStub.failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    smtp_port = serve(socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPSink))
+    http_port = serve(ThreadingHTTPServer(('127.0.0.1', 0), HTTPStub))
+    
+    class CheckConfig(Config):
+        DELIVERY_CHANNELS = ['push', 'email', 'sms']
+        EMAIL_HOST = '127.0.0.1'
+        EMAIL_PORT = smtp_port
+        EMAIL_USER = ''
+        EMAIL_FROM = 'check@civiklink.lk'
+        EMAIL_USE_TLS = False
+        SMS_API_URL = f'http://127.0.0.1:{http_port}/sms'
+        EMAIL_RATE_PER_SECOND = 1000
+        SMS_RATE_PER_SECOND = 1000
+        PUSH_RATE_PER_SECOND = 5000
+        DELIVERY_POLL_INTERVAL = 0.05
+        DELIVERY_BACKOFF_BASE = 0.05
+        DELIVERY_BACKOFF_MAX = 0.5
+        DELIVERY_MAX_ATTEMPTS = 20
+    
+    app = create_app(CheckConfig, start_workers=False)  # The delivery workers are started below
+    with app.app_context():
+        from app import db
+        from app.models.delivery import Delivery
+        from app.services.delivery_service import DeliveryService, PushChannel
+        
+        messaging._MessagingService.FCM_URL = f'http://127.0.0.1:{http_port}/v1/projects/{{0}}/messages:send'
+        firebase_admin.initialize_app(StubCredential(), {'projectId': 'check', 'httpTimeout': 10}, name=PushChannel.APP_NAME)
+        
+        user_id = ObjectId()
+        jobs = []
+        for i in range(messages):
+            jobs.append({'channel': 'email', 'to': f'user{i}@example.lk', 'body': 'Your issue was verified'})
+            jobs.append({'channel': 'sms', 'to': f'+9477{i:07d}', 'body': 'Your issue was verified'})
+            token = f'bad-{i}' if i % 50 == 0 else f'token-{i}'
+            jobs.append({'channel': 'push', 'to': token, 'body': 'Your issue was verified'})
+        for job in jobs:
+            job.update({'user_id': user_id, 'title': 'Issue Verified'})
+        expected = {(job['channel'], job['to']) for job in jobs if not job['to'].startswith('bad')}
+        bad = len(jobs) - len(expected)
+        
+        try:
+            Delivery.enqueue_many(jobs)
+            started = time.perf_counter()
+            DeliveryService.init_app(app, workers=workers)
+            while db.deliveries.count_documents({'user_id': user_id}) and time.perf_counter() - started < 120:
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - started
+            dead = db.delivery_dead.count_documents({'user_id': user_id})
+            left = db.deliveries.count_documents({'user_id': user_id})
+        finally:
+            db.deliveries.delete_many({'user_id': user_id})
+            db.delivery_dead.delete_many({'user_id': user_id})
+    
+    duplicates = sum(n - 1 for n in received.values() if n > 1)
+    print(f'{len(jobs)} messages ({messages} per channel), {workers} workers per channel, '
+          f'{HTTPStub.failure_rate:.0%} injected HTTP failures')
+    print(f'  delivered      {len(set(received) & expected)}/{len(expected)} in {elapsed:.2f}s '
+          f'({len(expected) / elapsed:.0f} msg/s)')
+    print(f'  duplicates     {duplicates}')
+    print(f'  dead letters   {dead}/{bad} rejected tokens, {left} still queued')
+    print(f'  smtp sessions  {stats["smtp_connections"]} for {messages} emails')
+    print(f'  http           {stats["http_connections"]} connections, {stats["http_requests"]} requests '
+          f'({stats["push_requests"]} push), {stats["http_503"]} failed and retried')
+    
+    ok = set(received) >= expected and dead == bad and left == 0
+    print('OK' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Concurrency stress test: verification toggles never let verification_count
+drift from the verifications stored for the issue.
+
+Hammers one issue with concurrent toggles from a pool of users (each user
+tapping repeatedly, like a double-tapping client), then checks that the
+stored count equals the number of verifications, that exactly the users
+with an odd number of taps remain, and that the issue was promoted to
+verified at most once.
+Runs against the database in MONGO_URI using a throwaway issue.
+
+Usage: python benchmarks/stress_verify.py [users] [taps_per_user] [threads]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    taps = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    
+    app = create_app(start_workers=False)
+    with app.app_context():
+        from app import db
+        from app.models.issue import Issue
+        from app.models.verification import VerificationConflict
+        
+        min_count = app.config['MIN_VERIFICATION_COUNT']
+        issue_id = db.issues.insert_one({
+            'title': 'stress_verify', 'status': 'pending', 'verification_count': 0
+        }).inserted_id
+        
+        user_ids = [ObjectId() for _ in range(users)]
+        schedule = [u for u in user_ids for _ in range(taps)]
+        random.shuffle(schedule)
+        
+        def tap(user_id):
+            try:
+                issue, added, promoted = Issue.toggle_verification(issue_id, user_id, min_count)
+            except VerificationConflict:
+                return None
+            assert issue is not None
+            return user_id, promoted
+        
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(threads) as pool:
+                results = [r for r in pool.map(tap, schedule) if r]
+            promotions = sum(promoted for _, promoted in results)
+            elapsed = time.perf_counter() - started
+            
+            issue = db.issues.find_one({'_id': issue_id})
+            actual = [v['user_id'] for v in db.verifications.find({'issue_id': issue_id})]
+        finally:
+            Issue.delete(issue_id)
+        
+        # Taps that reported a conflict did not toggle
+        expected = {u for u, n in Counter(u for u, _ in results).items() if n % 2}
+        
+        print(f'{len(schedule)} toggles from {users} users on {threads} threads '
+              f'in {elapsed:.2f}s ({len(schedule) / elapsed:.0f}/s)')
+        print(f'  verification_count {issue["verification_count"]}, '
+              f'verifications {len(actual)}, expected {len(expected)}, promotions {promotions}')
+        
+        assert len(actual) == len(set(actual)), 'duplicate verifications'
+        assert issue['verification_count'] == len(actual), 'count drifted from verifications'
+        assert set(actual) == expected, 'verifications do not match the toggles applied'
+        assert promotions <= 1, 'issue promoted more than once'
+        assert (issue['status'] == 'verified') == (promotions == 1), 'promotion not reported'
+        print('  OK: no drift')
+
+if __name__ == '__main__':
+    main()
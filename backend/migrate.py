@@ -0,0 +1,116 @@
+"""
+Data migrations for CivikLink SL.
+Safe to run against a live database and to re-run; each step only touches
+documents that have not been migrated yet.
+
+Usage: python migrate.py [batch_size]
+"""
+import sys
+from pymongo.errors import OperationFailure
+
+from app import create_app
+
+app = create_app(start_workers=False)
+
+with app.app_context():
+    from app import db
+    from app.models.issue import Issue
+    from app.models.notification import Notification
+    from app.models.ministry import Ministry
+    from app.models.ngo import NGO
+    from app.models.latency import LatencyStats
+    from app.models.leaderboard import Leaderboard
+    
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    
+    print("🌍 Backfilling GeoJSON points on issues...")
+    updated = Issue.backfill_geo(batch_size=batch_size, pause=0.05)
+    print(f"✓ Updated {updated} issues")
+    
+    remaining = db.issues.count_documents({'geo': {'$exists': False}})
+    if remaining:
+        print(f"⚠ {remaining} issues have missing or malformed coordinates")
+    
+    # The legacy 2d index on [lat, lng] is no longer used
+    try:
+        db.issues.drop_index('location.coordinates_2d')
+        print("✓ Dropped legacy 2d index")
+    except OperationFailure:
+        pass
+    
+    print("🔎 Backfilling search terms on issues...")
+    updated = Issue.backfill_search(batch_size=batch_size, pause=0.05)
+    print(f"✓ Updated {updated} issues")
+    
+    print("🧬 Backfilling duplicate-detection fingerprints on issues...")
+    updated = Issue.backfill_dedupe(batch_size=batch_size, pause=0.05)
+    print(f"✓ Updated {updated} issues")
+    
+    print("✔️ Moving verifications into their own collection...")
+    moved = Issue.drain_verifications(batch_size=batch_size, pause=0.05)
+    print(f"✓ Moved {moved} verifications")
+    
+    print("🔢 Recounting verifications on issues...")
+    drift = Issue.reconcile_verifications()
+    print(f"✓ Corrected {len(drift)} issues")
+    
+    print("🔔 Counting unread notifications per user...")
+    updated = Notification.backfill_unread_counts()
+    print(f"✓ Updated {updated} users")
+    
+    # Replaced by the (user_id, read, created_at) index
+    try:
+        db.notifications.drop_index('read_1')
+        print("✓ Dropped standalone notifications read index")
+    except OperationFailure:
+        pass
+    
+    print("🗑️ Stamping read_at on read notifications so they expire...")
+    updated = Notification.backfill_read_at()
+    print(f"✓ Updated {updated} notifications")
+    
+    # The heatmap index used to cover closed crisis issues too; create_index
+    # does not change the filter of an existing index
+    heatmap = db.issues.index_information().get('open_crisis_heatmap')
+    if heatmap and 'status' not in heatmap.get('partialFilterExpression', {}):
+        db.issues.drop_index('open_crisis_heatmap')
+        db.issues.create_index(heatmap['key'], name='open_crisis_heatmap', partialFilterExpression=Issue.OPEN_CRISIS)
+        print("✓ Limited the crisis heatmap index to open issues")
+    
+    # create_index does not change the expiry of an existing TTL index
+    db.command('collMod', 'notifications', index={
+        'name': 'read_ttl',
+        'expireAfterSeconds': app.config['NOTIFICATION_READ_TTL_DAYS'] * 86400
+    })
+    
+    # avg_response_time is derived from the latency sketches, not stored
+    db.ministries.update_many(
+        {'performance_stats.avg_response_time': {'$exists': True}},
+        {'$unset': {'performance_stats.avg_response_time': ''}}
+    )
+    
+    print("📊 Recounting ministry and NGO performance counters...")
+    drift = Ministry.reconcile_stats()
+    print(f"✓ Updated {len(drift)} ministries")
+    drift = NGO.reconcile_stats()
+    print(f"✓ Updated {len(drift)} NGOs")
+    
+    print("⏱️ Recording first response times on answered issues...")
+    updated = Issue.backfill_first_response(batch_size=batch_size, pause=0.05)
+    print(f"✓ Updated {updated} issues")
+    
+    print("⏱️ Recording resolution times on solved issues...")
+    updated = Issue.backfill_resolved_at(batch_size=batch_size, pause=0.05)
+    print(f"✓ Updated {updated} issues")
+    
+    print("⏱️ Building response and resolution time sketches from history...")
+    observed = LatencyStats.seed()
+    print(f"✓ Recorded {observed} durations")
+    
+    print("🏆 Building the leaderboard...")
+    written = Leaderboard.seed()
+    print(f"✓ Wrote {written} daily counters")
+    ranked = Leaderboard.rebuild()
+    print(f"✓ Ranked {ranked['ministry']} ministries and {ranked['ngo']} NGOs")
+    
+    print("✅ Migration complete")
@@ -0,0 +1,30 @@
+"""
+Worker entry point - Dispatches notifications and stats updates, sends
+push/email/SMS and reconciles performance counters outside the web processes
+(run those with OUTBOX_WORKERS=0, DELIVERY_WORKERS=0 and
+STATS_RECONCILE_INTERVAL=0).
+"""
+import os
+import threading
+from app import create_app
+from app.services.outbox_dispatcher import OutboxDispatcher
+from app.services.delivery_service import DeliveryService
+from app.services.stats_reconciler import StatsReconciler
+
+# Threads are started below
+app = create_app(start_workers=False)
+
+if __name__ == '__main__':
+    workers = int(os.getenv('OUTBOX_WORKER_THREADS', 4))
+    OutboxDispatcher.init_app(app, workers=workers)
+    print(f'Outbox worker running with {workers} threads')
+    
+    delivery_workers = int(os.getenv('DELIVERY_WORKER_THREADS', 4))
+    DeliveryService.init_app(app, workers=delivery_workers)
+    print(f'Delivery channels {sorted(DeliveryService.channels)} running with '
+          f'{delivery_workers} threads each')
+    
+    reconcile_interval = app.config['STATS_RECONCILE_INTERVAL']
+    StatsReconciler.init_app(app, interval=reconcile_interval)
+    print(f'Reconciling performance counters every {reconcile_interval}s')
+    threading.Event().wait()
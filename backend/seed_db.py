@@ -139,7 +139,7 @@ else:
     print(f"⚠ Database already has {existing_count} ministries. Skipping ministry seed.")
 
 # Create indexes for performance
-db.issues.create_index([("location", "2dsphere")])
+db.issues.create_index([("geo", "2dsphere"), ("is_crisis", 1), ("category", 1), ("status", 1)])
 db.issues.create_index([("category", 1)])
 db.issues.create_index([("status", 1)])
 db.issues.create_index([("created_at", -1)])
@@ -0,0 +1,32 @@
+"""
+Shared fixtures. The tests run against the MongoDB server in
+TestingConfig.MONGO_URI (TEST_MONGO_URI) and are skipped when there is
+none. The test database is dropped afterwards.
+"""
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from app import create_app
+from app.config import TestingConfig
+
+@pytest.fixture(scope='session')
+def app():
+    """The application, on a fresh test database."""
+    client = MongoClient(TestingConfig.MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip(f'No MongoDB server at {TestingConfig.MONGO_URI}')
+    client.drop_database(client.get_database().name)
+    
+    application = create_app(TestingConfig)
+    yield application
+    
+    from app import db_client, db
+    db_client.drop_database(db.name)
+
+@pytest.fixture
+def db(app):
+    """The test database."""
+    from app import db
+    return db
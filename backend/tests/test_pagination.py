@@ -0,0 +1,20 @@
+"""
+Public issue lists (see app.utils.pagination).
+"""
+from datetime import timedelta
+import pytest
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+
+def _expired_token(app):
+    with app.app_context():
+        return create_access_token(identity=str(ObjectId()), expires_delta=timedelta(seconds=-1))
+
+@pytest.mark.parametrize('token', [_expired_token, lambda app: 'not-a-token'])
+def test_public_list_ignores_stale_token(app, token):
+    """An expired or malformed token is treated as anonymous, not rejected."""
+    headers = {'Authorization': f'Bearer {token(app)}'}
+    response = app.test_client().get('/api/issues?view=card', headers=headers)
+    
+    assert response.status_code == 200
+    assert 'issues' in response.get_json()
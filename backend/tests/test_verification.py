@@ -0,0 +1,86 @@
+"""
+Verification toggles under concurrency (see Issue.toggle_verification).
+Models are imported inside the tests: they bind the database when imported,
+which has to be after the app fixture created it.
+"""
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from bson import ObjectId
+
+def _new_issue(db):
+    return db.issues.insert_one({
+        'title': 'test_verification', 'status': 'pending', 'verification_count': 0, 'outbox': []
+    }).inserted_id
+
+def test_concurrent_toggles_count_each_verifier_once(app, db):
+    """Users tapping verify repeatedly from many threads leave one verification each, counted once."""
+    from app.models.issue import Issue
+    from app.models.verification import VerificationConflict
+    
+    min_count = app.config['MIN_VERIFICATION_COUNT']
+    issue_id = _new_issue(db)
+    user_ids = [ObjectId() for _ in range(40)]
+    schedule = [user_id for user_id in user_ids for _ in range(5)]
+    random.shuffle(schedule)
+    
+    def tap(user_id):
+        try:
+            issue, _, promoted = Issue.toggle_verification(issue_id, user_id, min_count)
+        except VerificationConflict:
+            return user_id, False, False
+        assert issue is not None
+        return user_id, True, promoted
+    
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(tap, schedule))
+    
+    # Every tap toggles exactly once, except one that keeps losing races with
+    # the same user's other taps: that one reports a conflict without writing
+    applied = Counter(user_id for user_id, toggled, _ in results if toggled)
+    assert sum(applied.values()) > len(results) // 2
+    
+    verifiers = [v['user_id'] for v in db.verifications.find({'issue_id': issue_id})]
+    issue = db.issues.find_one({'_id': issue_id})
+    assert len(verifiers) == len(set(verifiers))
+    assert set(verifiers) == {user_id for user_id, taps in applied.items() if taps % 2}
+    assert issue['verification_count'] == len(set(verifiers))
+    
+    # Promotion happens once, when the count first reaches min_count
+    promotions = sum(promoted for _, _, promoted in results)
+    assert promotions <= 1
+    if len(verifiers) >= min_count:
+        assert promotions == 1
+
+def test_toggle_conflict_changes_nothing(app, db, monkeypatch):
+    """When every attempt loses its race, the toggle raises a conflict and changes nothing."""
+    from app.models.issue import Issue
+    from app.models.verification import Verification, VerificationConflict
+    
+    issue_id = _new_issue(db)
+    monkeypatch.setattr(Verification, 'add', staticmethod(lambda issue_id, user_id: False))
+    monkeypatch.setattr(Verification, 'remove', staticmethod(lambda issue_id, user_id: False))
+    
+    with pytest.raises(VerificationConflict):
+        Issue.toggle_verification(issue_id, ObjectId(), app.config['MIN_VERIFICATION_COUNT'])
+    assert db.issues.find_one({'_id': issue_id})['verification_count'] == 0
+    assert db.verifications.count_documents({'issue_id': issue_id}) == 0
+
+def test_reconcile_corrects_drifted_counts(app, db):
+    """A count left wrong by a lost write is recounted from the verifications."""
+    from app.models.issue import Issue
+    from app.models.verification import Verification
+    
+    drifted, correct = _new_issue(db), _new_issue(db)
+    for _ in range(2):
+        Verification.add(drifted, ObjectId())
+    Verification.add(correct, ObjectId())
+    db.issues.update_one({'_id': drifted}, {'$set': {'verification_count': 5}})
+    db.issues.update_one({'_id': correct}, {'$set': {'verification_count': 1}})
+    
+    drift = Issue.reconcile_verifications(settle=0)
+    
+    assert drift[str(drifted)] == {'verification_count': (5, 2)}
+    assert str(correct) not in drift
+    assert db.issues.find_one({'_id': drifted})['verification_count'] == 2
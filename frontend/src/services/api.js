@@ -51,6 +51,8 @@ export const issueAPI = {
   getAll: (params) => api.get('/issues', { params }),
   getById: (id) => api.get(`/issues/${id}`),
   create: (data) => api.post('/issues', data),
+  checkDuplicates: (data) => api.post('/issues/duplicates', data),
+  addToExisting: (id, category) => api.post('/issues', { duplicate_of: id, category }),
   update: (id, data) => api.put(`/issues/${id}`, data),
   delete: (id) => api.delete(`/issues/${id}`),
   verify: (id) => api.post(`/issues/${id}/verify`),